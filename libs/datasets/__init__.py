@@ -1,19 +1,16 @@
-from .kitti import KittiOdom, KittiRaw
-from .tum import TUM
-from .adelaide import Adelaide
-from .kinect import Kinect
-from .oxford_robotcar import OxfordRobotCar
-from .devon_island import DevonIsland
+from libs.general.registry import Registry
 
-datasets = {
-            "kitti_odom": KittiOdom,
-            "kitti_raw": KittiRaw,
-            "tum-1": TUM,
-            "tum-2": TUM,
-            "tum-3": TUM,
-            "adelaide1": Adelaide,
-            "adelaide2": Adelaide,
-            "kinect": Kinect,
-            'robotcar': OxfordRobotCar,
-            "devon_island" : DevonIsland
-        }
+# dataset loaders are imported when they are selected
+datasets = Registry("dataset", {
+            "kitti_odom": "libs.datasets.kitti:KittiOdom",
+            "kitti_raw": "libs.datasets.kitti:KittiRaw",
+            "tum-1": "libs.datasets.tum:TUM",
+            "tum-2": "libs.datasets.tum:TUM",
+            "tum-3": "libs.datasets.tum:TUM",
+            "adelaide1": "libs.datasets.adelaide:Adelaide",
+            "adelaide2": "libs.datasets.adelaide:Adelaide",
+            "kinect": "libs.datasets.kinect:Kinect",
+            'robotcar': "libs.datasets.oxford_robotcar:OxfordRobotCar",
+            "devon_island": "libs.datasets.devon_island:DevonIsland",
+            "video": "libs.datasets.video:Video"
+        })
@@ -38,6 +38,14 @@ class Adelaide(Dataset):
             self.rgb_d_pose_pair[i]['depth'] = i
             self.rgb_d_pose_pair[i]['pose'] = i
     
+    def get_manifest_sources(self):
+        """Get the files/directories the sequence index (timestamps, gt poses) is built from
+
+        Returns:
+            sources (list): file/directory paths
+        """
+        return [self.data_dir['img']]
+
     def get_timestamp(self, img_id):
         """Get timestamp for the query img_id
 
@@ -9,7 +9,10 @@
 '''
 
 import numpy as np
+import os
 
+from .manifest import get_manifest_path, get_mtimes, load_manifest, save_manifest
+from .packed_sequence import PackedSequence, get_packed_seq_dir
 from libs.geometry.camera_modules import Intrinsics
 
 class Dataset():
@@ -30,18 +33,70 @@ class Dataset():
         # get data directories
         self.data_dir = self.get_data_dir()
         
+        # sequence manifest (directory.manifest_dir); synchronized timestamps and
+        # gt poses are loaded from the manifest if its sources are not modified
+        manifest, manifest_path = None, None
+        manifest_sources = self.get_manifest_sources()
+        if self.cfg.directory.get('manifest_dir') is not None and manifest_sources is not None:
+            manifest_path = get_manifest_path(self.cfg.directory.manifest_dir, self.get_manifest_key())
+            manifest_mtimes = get_mtimes(manifest_sources)
+            manifest = load_manifest(manifest_path, manifest_sources)
+
         # synchronize timestamps
-        self.synchronize_timestamps()
+        if manifest is not None:
+            self.rgb_d_pose_pair = manifest['rgb_d_pose_pair']
+        else:
+            self.synchronize_timestamps()
+
+        # rgb timestamps in ascending order, i.e. indexed by img_id
+        self.sorted_timestamps = sorted(self.rgb_d_pose_pair.keys())
+
+        # packed image sequence (tools/pack_sequence.py);
+        # images are sliced from the memory-mapped sequence instead of decoded from the image files
+        self.packed_images = None
+        packed_seq_dir = get_packed_seq_dir(self.cfg)
+        if packed_seq_dir is not None:
+            assert os.path.isfile(os.path.join(packed_seq_dir, "meta.json")), \
+                "Packed sequence [{}] is not found.".format(packed_seq_dir)
+            self.packed_images = PackedSequence(packed_seq_dir)
+            assert self.packed_images.is_complete(), \
+                "Packed sequence [{}] is incomplete, resume the conversion.".format(packed_seq_dir)
+            self.get_image = self.packed_images.get_image
 
         # get gt poses (for visualization comparison purpose)
         if self.cfg.directory.gt_pose_dir is not None:
-            self.gt_poses = self.get_gt_poses()
+            if manifest is not None and manifest['gt_poses'] is not None:
+                self.gt_poses = manifest['gt_poses']
+            else:
+                self.gt_poses = self.get_gt_poses()
         else:
             self.gt_poses = {0: np.eye(4)}
 
+        if manifest_path is not None and manifest is None:
+            gt_poses = self.gt_poses if self.cfg.directory.gt_pose_dir is not None else None
+            save_manifest(manifest_path, manifest_sources, manifest_mtimes, self.rgb_d_pose_pair, gt_poses)
+
     def __len__(self):
         return len(self.rgb_d_pose_pair)
 
+    def get_manifest_sources(self):
+        """Get the files/directories the sequence index (timestamps, gt poses) is built from;
+        the manifest is rebuilt when one of them is modified
+
+        Returns:
+            sources (list): file/directory paths; None if the dataset does not use manifest
+        """
+        return None
+
+    def get_manifest_key(self):
+        """Get the items identifying the sequence index
+
+        Returns:
+            key (list): dataset, seq, data directories and options the index depends on
+        """
+        return [self.cfg.dataset, str(self.cfg.seq), type(self).__name__,
+                self.data_dir['img'], self.cfg.image.ext, self.cfg.directory.gt_pose_dir]
+
     def get_intrinsics_param(self):
         """Read intrinsics parameters for each dataset
 
@@ -89,6 +144,19 @@ class Dataset():
         """
         raise NotImplementedError
 
+    def get_timestamps(self, img_ids=None):
+        """Get timestamps for a list of img_ids
+
+        Args:
+            img_ids (list): query image ids; all images if None
+
+        Returns:
+            timestamps (list): timestamps for the query images
+        """
+        if img_ids is None:
+            img_ids = range(len(self))
+        return [self.get_timestamp(i) for i in img_ids]
+
     def get_image(self, timestamp):
         """Get image data given the image timestamp
 
@@ -8,7 +8,6 @@
 @Description: Dataset loaders for Kinect captures (TUM RBG-D format)
 '''
 
-import copy
 from glob import glob
 import os
 
@@ -21,6 +20,7 @@ from libs.general.utils import *
 class Kinect(Dataset):
     """Dataset loader for Kinect RBG-D dataset
     """
+    pose_file_name = 'keyframe_trajectory_mono.txt'
 
     def __init__(self, *args, **kwargs):
         super(Kinect, self).__init__(*args, **kwargs)
@@ -36,7 +36,6 @@ class Kinect(Dataset):
             a dictionary containing
                 - **rgb_timestamp** : {'depth': depth_timestamp, 'pose': pose_timestamp}
         """
-        self.pose_file_name = 'keyframe_trajectory_mono.txt'
         self.rgb_d_pose_pair = {}
 
         # associate rgb-depth-pose timestamp pair
@@ -73,22 +72,11 @@ class Kinect(Dataset):
             pose_stamp = match[1]
             self.rgb_d_pose_pair[rgb_stamp]['pose'] = pose_stamp
         
-        # Clear pairs without depth
-        to_del_pair = []
-        for rgb_stamp in self.rgb_d_pose_pair:
-            if self.rgb_d_pose_pair[rgb_stamp].get('depth', -1) == -1:
-                to_del_pair.append(rgb_stamp)
-        for rgb_stamp in to_del_pair:
-            del(self.rgb_d_pose_pair[rgb_stamp])
-        
-        # # Clear pairs without pose
-        to_del_pair = []
-        tmp_rgb_d_pose_pair = copy.deepcopy(self.rgb_d_pose_pair)
-        for rgb_stamp in tmp_rgb_d_pose_pair:
-            if self.rgb_d_pose_pair[rgb_stamp].get('pose', -1) == -1:
-                to_del_pair.append(rgb_stamp)
-        for rgb_stamp in to_del_pair:
-            del(self.rgb_d_pose_pair[rgb_stamp])
+        # Clear pairs without depth or pose
+        self.rgb_d_pose_pair = {
+            rgb_stamp: pair for rgb_stamp, pair in self.rgb_d_pose_pair.items()
+            if 'depth' in pair and 'pose' in pair
+        }
         
         # timestep
         timestep = 1
@@ -115,7 +103,7 @@ class Kinect(Dataset):
             else:
                 self.tmp_gt_poses[i] = np.eye(4)
             i += 1
-        self.gt_poses = copy.deepcopy(self.tmp_gt_poses)
+        self.gt_poses = self.tmp_gt_poses
     
     def get_intrinsics_param(self):
         """Read intrinsics parameters for each dataset
@@ -189,6 +177,17 @@ class Kinect(Dataset):
         gt_poses = load_poses_from_txt_tum(annotations)
         return gt_poses
     
+    def get_manifest_sources(self):
+        """Get the files/directories the sequence index (timestamps, gt poses) is built from
+
+        Returns:
+            sources (list): file/directory paths
+        """
+        sources = [os.path.join(self.data_dir['img'], "..", f) for f in ['rgb.txt', 'depth.txt', self.pose_file_name]]
+        if self.cfg.directory.gt_pose_dir is not None:
+            sources.append(os.path.join(self.cfg.directory.gt_pose_dir, self.cfg.seq, self.pose_file_name))
+        return sources
+
     def get_timestamp(self, img_id):
         """Get timestamp for the query img_id
 
@@ -198,7 +197,7 @@ class Kinect(Dataset):
         Returns:
             timestamp (int): timestamp for query image
         """
-        return sorted(list(self.rgb_d_pose_pair.keys()))[img_id]
+        return self.sorted_timestamps[img_id]
     
     def get_image(self, timestamp):
         """Get image data given the image timestamp
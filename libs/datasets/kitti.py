@@ -38,6 +38,17 @@ class KITTI(Dataset):
             self.rgb_d_pose_pair[i]['depth'] = i
             self.rgb_d_pose_pair[i]['pose'] = i
     
+    def get_manifest_sources(self):
+        """Get the files/directories the sequence index (timestamps, gt poses) is built from
+
+        Returns:
+            sources (list): file/directory paths
+        """
+        sources = [self.data_dir['img']]
+        if self.cfg.directory.gt_pose_dir is not None:
+            sources.append(self.get_gt_pose_source())
+        return sources
+
     def get_timestamp(self, img_id):
         """Get timestamp for the query img_id
 
@@ -121,12 +132,17 @@ class KittiOdom(KITTI):
         Returns:
             gt_poses (dict): each pose is a [4x4] array
         """
-        annotations = os.path.join(
-                            self.cfg.directory.gt_pose_dir,
-                            "{}.txt".format(self.cfg.seq)
-                            )
+        annotations = self.get_gt_pose_source()
         gt_poses = load_poses_from_txt(annotations)
         return gt_poses
+
+    def get_gt_pose_source(self):
+        """Get ground-truth pose file
+
+        Returns:
+            path (str): ground-truth pose file path
+        """
+        return os.path.join(self.cfg.directory.gt_pose_dir, "{}.txt".format(self.cfg.seq))
     
     def get_image(self, timestamp):
         """Get image data given the image timestamp
@@ -231,16 +247,18 @@ class KittiRaw(KITTI):
         Returns:
             gt_poses (dict): each pose is a [4x4] array
         """
-        seq_date = self.cfg.seq[:10]
-        gps_info_dir =  os.path.join(
-                            self.cfg.directory.gt_pose_dir,
-                            seq_date,
-                            self.cfg.seq,
-                            "oxts/data"
-                            )
+        gps_info_dir = self.get_gt_pose_source()
         gt_poses = load_poses_from_oxts(gps_info_dir)
         return gt_poses
 
+    def get_gt_pose_source(self):
+        """Get oxts data directory
+
+        Returns:
+            path (str): oxts data directory
+        """
+        return os.path.join(self.cfg.directory.gt_pose_dir, self.cfg.seq[:10], self.cfg.seq, "oxts/data")
+
     def get_image(self, timestamp):
         """Get image data given the image timestamp
 
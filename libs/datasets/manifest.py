@@ -0,0 +1,101 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: Manifest caches the index of a sequence (synchronized timestamps and ground-truth poses)
+'''
+
+import hashlib
+import json
+import numpy as np
+import os
+
+
+# manifest format version; manifests of other versions are rebuilt
+MANIFEST_VERSION = 1
+
+
+def get_mtimes(sources):
+    """Get the modification times of the source files/directories
+
+    Args:
+        sources (list): file/directory paths
+
+    Returns:
+        mtimes (array, [N]): modification times; -1 for missing paths
+    """
+    return np.array([os.path.getmtime(p) if os.path.exists(p) else -1. for p in sources])
+
+
+def get_manifest_path(manifest_dir, key):
+    """Get the manifest path of a sequence
+
+    Args:
+        manifest_dir (str): manifest directory
+        key (list): json-serializable items identifying the sequence index, e.g. dataset, seq, data directories
+
+    Returns:
+        path (str): manifest path
+    """
+    digest = hashlib.md5(json.dumps(key).encode()).hexdigest()[:16]
+    name = "_".join(str(k) for k in key[:2]).replace(os.sep, "-")
+    return os.path.join(manifest_dir, "{}_{}.npz".format(name, digest))
+
+
+def load_manifest(path, sources):
+    """Load a manifest; it is valid if none of the sources is modified after it is built
+
+    Args:
+        path (str): manifest path
+        sources (list): file/directory paths the manifest is built from
+
+    Returns:
+        a dictionary containing (None if the manifest is missing or outdated)
+            - **rgb_d_pose_pair** (dict): {rgb_timestamp: {'depth': depth_timestamp, 'pose': pose_timestamp}}
+            - **gt_poses** (dict): each pose is a [4x4] array; None if not cached
+    """
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as data:
+        if int(data['version']) != MANIFEST_VERSION or \
+                data['sources'].tolist() != list(sources) or \
+                not np.array_equal(data['mtimes'], get_mtimes(sources)):
+            return None
+        timestamps = data['timestamps'].tolist()
+        pairs = zip(data['depth'].tolist(), data['pose'].tolist())
+        manifest = {
+            'rgb_d_pose_pair': {ts: {'depth': d, 'pose': p} for ts, (d, p) in zip(timestamps, pairs)},
+            'gt_poses': None
+            }
+        if bool(data['has_gt']):
+            manifest['gt_poses'] = dict(zip(data['gt_keys'].tolist(), data['gt_poses']))
+    return manifest
+
+
+def save_manifest(path, sources, mtimes, rgb_d_pose_pair, gt_poses=None):
+    """Save a manifest; the mtimes of the sources are recorded for invalidation.
+    The manifest directory can be shared by several processes, the file is replaced atomically.
+
+    Args:
+        path (str): manifest path
+        sources (list): file/directory paths the manifest is built from
+        mtimes (array, [N]): modification times of the sources, taken before the manifest is built
+        rgb_d_pose_pair (dict): {rgb_timestamp: {'depth': depth_timestamp, 'pose': pose_timestamp}}
+        gt_poses (dict): each pose is a [4x4] array; None if not cached
+    """
+    timestamps = list(rgb_d_pose_pair.keys())
+    gt_keys = [] if gt_poses is None else list(gt_poses.keys())
+    gt_arr = np.zeros((0, 4, 4)) if len(gt_keys) == 0 else np.stack([gt_poses[k] for k in gt_keys])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path[:-len(".npz")] + ".{}.tmp.npz".format(os.getpid())
+    np.savez(tmp_path,
+             version=MANIFEST_VERSION,
+             sources=np.array(sources, dtype=str),
+             mtimes=mtimes,
+             timestamps=np.asarray(timestamps),
+             depth=np.asarray([rgb_d_pose_pair[ts]['depth'] for ts in timestamps]),
+             pose=np.asarray([rgb_d_pose_pair[ts]['pose'] for ts in timestamps]),
+             has_gt=gt_poses is not None,
+             gt_keys=np.asarray(gt_keys),
+             gt_poses=gt_arr)
+    os.replace(tmp_path, path)
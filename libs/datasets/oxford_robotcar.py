@@ -53,6 +53,19 @@ class OxfordRobotCar(Dataset):
             self.rgb_d_pose_pair[timestamps[i]]['depth'] = i
             self.rgb_d_pose_pair[timestamps[i]]['pose'] = i
     
+    def get_manifest_sources(self):
+        """Get the files/directories the sequence index (timestamps, gt poses) is built from
+
+        Returns:
+            sources (list): file/directory paths
+        """
+        sources = [self.data_dir['img'],
+                   os.path.join(self.cfg.directory.img_seq_dir, self.cfg.seq, "stereo.timestamps")]
+        if self.cfg.directory.gt_pose_dir is not None:
+            sources.append(os.path.join(self.cfg.directory.gt_pose_dir, self.cfg.seq, "stereo.timestamps"))
+            sources.append(os.path.join(self.cfg.directory.gt_pose_dir, self.cfg.seq, "vo/vo.csv"))
+        return sources
+
     def get_timestamp(self, img_id):
         """Get timestamp for the query img_id
 
@@ -62,7 +75,7 @@ class OxfordRobotCar(Dataset):
         Returns:
             timestamp (int): timestamp for query image
         """
-        return sorted(list(self.rgb_d_pose_pair.keys()))[img_id]
+        return self.sorted_timestamps[img_id]
 
     def save_result_traj(self, traj_txt, poses):
         """Save trajectory (absolute poses) as KITTI odometry file format
@@ -124,11 +137,11 @@ class OxfordRobotCar(Dataset):
         """
         data_dir = {"depth": None, "depth_src": None}
 
-        # get image data directory
+        # get image data directory; raw images are undistorted on the fly if robotcar.undistort is set
         img_seq_dir = os.path.join(
                             self.cfg.directory.img_seq_dir,
                             self.cfg.seq,
-                            "undistorted_stereo",
+                            "stereo" if self.cfg.robotcar.undistort else "undistorted_stereo",
                             "centre"
                             )
         data_dir['img'] = os.path.join(img_seq_dir)
@@ -148,22 +161,17 @@ class OxfordRobotCar(Dataset):
                             "{:016d}.{}".format(timestamp, self.cfg.image.ext)
                             )
         
-        # load undistorted image
-        
         crop = np.zeros((2,2))
         crop[0] = self.y_crop
         crop[1] = self.x_crop
 
-        # img = load_image(img_path, self.model)
-        
-        # # crop and resize
-        # img_h, img_w, _ = img.shape
-        # y0, y1 = int(img_h * crop[0][0]), int(img_h * crop[0][1])
-        # x0, x1 = int(img_w * crop[1][0]), int(img_w * crop[1][1])
-        # img = img[y0:y1, x0:x1]
-
-        # img = cv2.resize(img, (self.cfg.image.width, self.cfg.image.height))
-        img = read_image(img_path, self.cfg.image.height, self.cfg.image.width, crop)
+        if self.cfg.robotcar.undistort:
+            # demosaic raw image; undistortion, crop and resize are one remap
+            img = load_image(img_path, self.model, crop, (self.cfg.image.height, self.cfg.image.width))
+        else:
+            # load undistorted image
+            # cropped and resized before the colour conversion; decoded at a reduced size if possible
+            img = read_image(img_path, self.cfg.image.height, self.cfg.image.width, crop)
         return img
     
     ''' 
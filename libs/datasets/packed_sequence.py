@@ -0,0 +1,132 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: PackedSequence stores the images of a sequence as one memory-mapped uint8 array
+'''
+
+import json
+import numpy as np
+import os
+
+
+class PackedSequence():
+    """PackedSequence stores the images of a sequence, resized to the target resolution,
+    as one memory-mapped uint8 array [NxHxWx3] with an index of the image timestamps.
+    Reading an image is a slice of the mapped array; no decoding and no copy.
+
+    Directory layout
+
+        - images.npy: uint8 array [NxHxWx3]
+        - timestamps.npy: timestamps of the images, in frame order
+        - done.npy: bool array [N], written frames; used to resume a conversion
+        - meta.json: height, width and number of frames
+    """
+    def __init__(self, seq_dir, mode='r', flush_every=64):
+        """
+        Args:
+            seq_dir (str): packed sequence directory
+            mode (str): mmap mode; r for reading, r+ for writing
+            flush_every (int): written frames are flushed (and marked done) every flush_every frames
+        """
+        self.seq_dir = seq_dir
+        self.flush_every = flush_every
+        self.unflushed = []
+        with open(os.path.join(seq_dir, "meta.json"), 'r') as f:
+            self.meta = json.load(f)
+        self.images = np.load(os.path.join(seq_dir, "images.npy"), mmap_mode=mode)
+        self.timestamps = np.load(os.path.join(seq_dir, "timestamps.npy"))
+        self.done = np.load(os.path.join(seq_dir, "done.npy"), mmap_mode=mode)
+        self.index = {ts: i for i, ts in enumerate(self.timestamps.tolist())}
+
+    @staticmethod
+    def create(seq_dir, timestamps, height, width):
+        """Create an empty packed sequence; an existing one with the same shape is kept for resuming
+
+        Args:
+            seq_dir (str): packed sequence directory
+            timestamps (list): timestamps of the images, in frame order
+            height (int): image height
+            width (int): image width
+        """
+        meta = {'height': height, 'width': width, 'num_frames': len(timestamps)}
+        meta_path = os.path.join(seq_dir, "meta.json")
+        if os.path.isfile(meta_path):
+            with open(meta_path, 'r') as f:
+                if json.load(f) == meta:
+                    return
+
+        os.makedirs(seq_dir, exist_ok=True)
+        images = np.lib.format.open_memmap(
+                    os.path.join(seq_dir, "images.npy"), mode='w+',
+                    dtype=np.uint8, shape=(len(timestamps), height, width, 3))
+        del images
+        done = np.lib.format.open_memmap(
+                    os.path.join(seq_dir, "done.npy"), mode='w+',
+                    dtype=bool, shape=(len(timestamps),))
+        done[:] = False
+        del done
+        np.save(os.path.join(seq_dir, "timestamps.npy"), np.asarray(timestamps))
+        # meta is written last; a sequence without meta is incomplete and recreated
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def is_complete(self):
+        return bool(self.done.all())
+
+    def write(self, idx, img):
+        """Write an image; the sequence should be opened with mode r+.
+        The frame is marked done when it is flushed, see flush().
+
+        Args:
+            idx (int): frame index
+            img (array, [HxWx3]): RGB image
+        """
+        self.images[idx] = img
+        self.unflushed.append(idx)
+        if len(self.unflushed) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Flush the written images, then mark them done; a frame is never marked done
+        before its image is on disk, so that an interrupted conversion is resumed correctly
+        """
+        if len(self.unflushed) == 0:
+            return
+        self.images.flush()
+        self.done[self.unflushed] = True
+        self.done.flush()
+        self.unflushed = []
+
+    def close(self):
+        """Flush the written images
+        """
+        self.flush()
+
+    def get_image(self, timestamp):
+        """Get image data given the image timestamp
+
+        Args:
+            timestamp (int/float): timestamp for the image
+
+        Returns:
+            img (array, [HxWx3]): read-only view of the packed image
+        """
+        return self.images[self.index[timestamp]]
+
+
+def get_packed_seq_dir(cfg):
+    """Get the packed sequence directory of the configured dataset and sequence
+
+    Args:
+        cfg (edict): configuration
+
+    Returns:
+        seq_dir (str): packed sequence directory; None if packed images are not used
+    """
+    if cfg.directory.get('packed_img_dir') is None:
+        return None
+    return os.path.join(cfg.directory.packed_img_dir, cfg.dataset, str(cfg.seq),
+                        "{}x{}".format(cfg.image.height, cfg.image.width))
@@ -8,7 +8,6 @@
 @Description: Dataset loaders for TUM RGB-D Sequence
 '''
 
-import copy
 from glob import glob
 import os
 
@@ -71,22 +70,11 @@ class TUM(Dataset):
             pose_stamp = match[1]
             self.rgb_d_pose_pair[rgb_stamp]['pose'] = pose_stamp
         
-        # Clear pairs without depth
-        to_del_pair = []
-        for rgb_stamp in self.rgb_d_pose_pair:
-            if self.rgb_d_pose_pair[rgb_stamp].get('depth', -1) == -1:
-                to_del_pair.append(rgb_stamp)
-        for rgb_stamp in to_del_pair:
-            del(self.rgb_d_pose_pair[rgb_stamp])
-        
-        # # Clear pairs without pose
-        to_del_pair = []
-        tmp_rgb_d_pose_pair = copy.deepcopy(self.rgb_d_pose_pair)
-        for rgb_stamp in tmp_rgb_d_pose_pair:
-            if self.rgb_d_pose_pair[rgb_stamp].get('pose', -1) == -1:
-                to_del_pair.append(rgb_stamp)
-        for rgb_stamp in to_del_pair:
-            del(self.rgb_d_pose_pair[rgb_stamp])
+        # Clear pairs without depth or pose
+        self.rgb_d_pose_pair = {
+            rgb_stamp: pair for rgb_stamp, pair in self.rgb_d_pose_pair.items()
+            if 'depth' in pair and 'pose' in pair
+        }
         
         # timestep
         timestep = 1
@@ -113,7 +101,7 @@ class TUM(Dataset):
             else:
                 self.tmp_gt_poses[i] = np.eye(4)
             i += 1
-        self.gt_poses = copy.deepcopy(self.tmp_gt_poses)
+        self.gt_poses = self.tmp_gt_poses
     
     def get_intrinsics_param(self):
         """Read intrinsics parameters for each dataset
@@ -175,6 +163,17 @@ class TUM(Dataset):
         gt_poses = load_poses_from_txt_tum(annotations)
         return gt_poses
     
+    def get_manifest_sources(self):
+        """Get the files/directories the sequence index (timestamps, gt poses) is built from
+
+        Returns:
+            sources (list): file/directory paths
+        """
+        sources = [os.path.join(self.data_dir['img'], "..", f) for f in ['rgb.txt', 'depth.txt', 'groundtruth.txt']]
+        if self.cfg.directory.gt_pose_dir is not None:
+            sources.append(os.path.join(self.cfg.directory.gt_pose_dir, self.cfg.seq, 'groundtruth.txt'))
+        return sources
+
     def get_timestamp(self, img_id):
         """Get timestamp for the query img_id
 
@@ -184,7 +183,7 @@ class TUM(Dataset):
         Returns:
             timestamp (int): timestamp for query image
         """
-        return sorted(list(self.rgb_d_pose_pair.keys()))[img_id]
+        return self.sorted_timestamps[img_id]
     
     def get_image(self, timestamp):
         """Get image data given the image timestamp
@@ -0,0 +1,236 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: Dataset loader for video files (e.g. H.264/MP4) with sequential streaming decode
+'''
+
+import cv2
+import numpy as np
+import os
+import queue
+import threading
+
+from .dataset import Dataset
+from libs.general.utils import *
+
+
+class VideoReader():
+    """VideoReader decodes a video sequentially in a background thread.
+    Frames are resized and converted to RGB as they are decoded, and up to read_ahead frames are queued.
+    Reading forward skips frames without restarting; reading backward restarts the decoder with a seek.
+    """
+    def __init__(self, path, height, width, read_ahead=8):
+        """
+        Args:
+            path (str): video file path
+            height (int): output image height
+            width (int): output image width
+            read_ahead (int): maximum number of decoded frames queued
+        """
+        self.path = path
+        self.height = height
+        self.width = width
+        self.read_ahead = read_ahead
+        self.thread = None
+        self.next_idx = 0
+
+    def start(self, frame_idx):
+        """(Re)start the decoder at a frame
+
+        Args:
+            frame_idx (int): index of the first decoded frame
+        """
+        self.stop()
+        self.queue = queue.Queue(maxsize=self.read_ahead)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.decode, args=(frame_idx,), daemon=True)
+        self.thread.start()
+        self.next_idx = frame_idx
+
+    def decode(self, frame_idx):
+        """Decoder loop, run in the background thread
+
+        Args:
+            frame_idx (int): index of the first decoded frame
+        """
+        cap = cv2.VideoCapture(self.path)
+        if frame_idx > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        idx = frame_idx
+        while not self.stop_event.is_set():
+            ok, frame = cap.read()
+            img = None
+            if ok:
+                # resize before the colour conversion, which then works on the smaller image
+                if frame.shape[:2] != (self.height, self.width):
+                    frame = cv2.resize(frame, (self.width, self.height))
+                img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put((idx, img), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if not ok:
+                break
+            idx += 1
+        cap.release()
+
+    def stop(self):
+        """Stop the decoder
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def read(self, frame_idx):
+        """Read a frame
+
+        Args:
+            frame_idx (int): frame index
+
+        Returns:
+            img (array, [HxWx3]): RGB image
+        """
+        if self.thread is None or frame_idx < self.next_idx:
+            self.start(frame_idx)
+        while True:
+            idx, img = self.queue.get()
+            assert img is not None, "Frame [{}] cannot be decoded from [{}].".format(frame_idx, self.path)
+            if idx == frame_idx:
+                self.next_idx = idx + 1
+                return img
+
+
+class Video(Dataset):
+    """Dataset loader for a video file, directory.img_seq_dir/seq.image.ext (e.g. dataset/videos/drive_01.mp4).
+    Frames are indexed by frame number (as KITTI), and streamed by VideoReader.
+    The frame times (s) are kept in self.frame_times.
+    """
+    def __init__(self, *args, **kwargs):
+        super(Video, self).__init__(*args, **kwargs)
+        self.reader = VideoReader(
+                        self.data_dir['img'],
+                        self.cfg.image.height,
+                        self.cfg.image.width,
+                        self.cfg.video.read_ahead)
+
+    def get_video_path(self):
+        return os.path.join(
+                    self.cfg.directory.img_seq_dir,
+                    "{}.{}".format(self.cfg.seq, self.cfg.image.ext))
+
+    def get_intrinsics_param(self):
+        """Read intrinsics parameters from the intrinsics file (fx fy cx cy at the video resolution).
+        Without intrinsics file, a pinhole camera with 60 degree horizontal field of view is assumed.
+
+        Returns:
+            intrinsics_param (list): [cx, cy, fx, fy]
+        """
+        cap = cv2.VideoCapture(self.get_video_path())
+        assert cap.isOpened(), "Video [{}] cannot be opened.".format(self.get_video_path())
+        video_w = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        video_h = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        cap.release()
+
+        if self.cfg.video.intrinsics_file is not None:
+            fx, fy, cx, cy = np.loadtxt(self.cfg.video.intrinsics_file).reshape(-1)[:4]
+        else:
+            fx = fy = video_w / 2 / np.tan(np.deg2rad(30))
+            cx, cy = video_w / 2, video_h / 2
+
+        # scale to the image size
+        x_scale = self.cfg.image.width / video_w
+        y_scale = self.cfg.image.height / video_h
+        return [cx * x_scale, cy * y_scale, fx * x_scale, fy * y_scale]
+
+    def get_data_dir(self):
+        """Get data directory
+
+        Returns:
+            a dictionary containing
+                - **img** (str) : video file path
+                - (optional) **depth** (str) : depth data direcotry or None
+                - (optional) **depth_src** (str) : depth data type [gt/None]
+        """
+        assert self.cfg.depth.depth_src is None, "Depth source [{}] is not supported by video dataset.".format(
+                                                        self.cfg.depth.depth_src)
+        return {'img': self.get_video_path(), 'depth': None, 'depth_src': None}
+
+    def synchronize_timestamps(self):
+        """Read the frame times; the container timestamps are scanned without decoding to RGB,
+        or computed from the frame rate if video.scan_timestamps is False.
+        Some containers/backends report zero or repeated timestamps; the frame rate is used
+        if the scanned timestamps are not strictly increasing.
+
+        Returns:
+            a dictionary containing
+                - **rgb_timestamp** : {'depth': depth_timestamp, 'pose': pose_timestamp}
+        """
+        cap = cv2.VideoCapture(self.data_dir['img'])
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if self.cfg.video.scan_timestamps:
+            self.frame_times = []
+            while cap.grab():
+                self.frame_times.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.)
+            if np.any(np.diff(self.frame_times) <= 0):
+                assert fps > 0, "Video [{}] has neither valid timestamps nor frame rate.".format(self.data_dir['img'])
+                self.frame_times = [i / fps for i in range(len(self.frame_times))]
+        else:
+            num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.frame_times = [i / fps for i in range(num_frames)]
+        cap.release()
+
+        self.rgb_d_pose_pair = {}
+        for i in range(len(self.frame_times)):
+            self.rgb_d_pose_pair[i] = {'depth': i, 'pose': i}
+
+    def get_timestamp(self, img_id):
+        """Get timestamp for the query img_id
+
+        Args:
+            img_id (int): query image id
+
+        Returns:
+            timestamp (int): frame number of the query image; its time (s) is self.frame_times[timestamp]
+        """
+        return img_id
+
+    def get_gt_poses(self):
+        """Get ground-truth poses, directory.gt_pose_dir/seq.txt in KITTI format
+
+        Returns:
+            gt_poses (dict): each pose is a [4x4] array
+        """
+        annotations = os.path.join(
+                            self.cfg.directory.gt_pose_dir,
+                            "{}.txt".format(self.cfg.seq)
+                            )
+        return load_poses_from_txt(annotations)
+
+    def get_image(self, timestamp):
+        """Get image data given the image timestamp
+
+        Args:
+            timestamp (int): frame number of the image
+
+        Returns:
+            img (array, [HxWx3]): image data
+        """
+        return self.reader.read(timestamp)
+
+    def get_depth(self, timestamp):
+        """Depth is not available for video dataset
+        """
+        raise NotImplementedError
+
+    def save_result_traj(self, traj_txt, poses):
+        """Save trajectory (absolute poses) as KITTI odometry file format
+
+        Args:
+            txt (str): pose text file path
+            poses (dict): poses, each pose is a [4x4] array
+        """
+        global_poses_arr = convert_SE3_to_arr(poses)
+        save_traj(traj_txt, global_poses_arr, format='kitti')
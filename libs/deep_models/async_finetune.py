@@ -0,0 +1,198 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This file contains the asynchronous online finetuning of the deep models on a background worker
+'''
+
+import copy
+import queue
+import threading
+import torch
+
+
+def get_module_names(net):
+    """Get the names of the modules of a network interface
+
+    Args:
+        net (DeepFlow/DeepDepth/DeepPose): network interface
+
+    Returns:
+        names (list): module names, e.g. [encoder, depth_decoder, model]
+    """
+    return sorted(set(net.inference_modules) | {'model'})
+
+
+def clone_modules(net):
+    """Deep copy the modules of a network interface.
+    The modules are copied together so that shared modules (e.g. model = Sequential(encoder, decoder)) stay shared.
+
+    Args:
+        net (DeepFlow/DeepDepth/DeepPose): network interface
+
+    Returns:
+        modules (dict): module name -> copied module
+    """
+    return copy.deepcopy({name: getattr(net, name) for name in get_module_names(net)})
+
+
+def clone_network(net):
+    """Copy a network interface with its own modules
+
+    Args:
+        net (DeepFlow/DeepDepth/DeepPose): network interface
+
+    Returns:
+        clone (DeepFlow/DeepDepth/DeepPose): network interface sharing the configuration but not the modules
+    """
+    clone = copy.copy(net)
+    for name, module in clone_modules(net).items():
+        setattr(clone, name, module)
+    return clone
+
+
+class AsyncFinetuner():
+    """AsyncFinetuner runs online finetuning on a background worker.
+
+    The worker trains copies of the networks with (ref, cur, pose) samples from a bounded queue
+    while the networks used for inference stay in eval mode and are never trained.
+    The inference weights are double-buffered: every swap_interval training steps, the worker
+    copies the training weights into the back buffer, which is swapped with the inference
+    weights by the main thread at a frame boundary (update_inference_weights).
+    finalize() waits for the queued samples and loads the final training weights for inference.
+    """
+    def __init__(self, deep_model, cfg):
+        """
+        Args:
+            deep_model (DeepModel): DeepModel interface object
+            cfg (edict): asynchronous finetuning configuration
+                - **queue_size** (int): maximum number of queued samples; the oldest sample is dropped when full
+                - **swap_interval** (int): training steps between inference weight updates
+        """
+        self.deep_model = deep_model
+        self.swap_interval = cfg.swap_interval
+        self.queue_size = cfg.queue_size
+        self.samples = queue.Queue()
+
+        # networks: inference (front buffer), back buffer, training
+        self.infer_nets = {}
+        self.back_buffers = {}
+        self.train_nets = {}
+        for name in deep_model.get_finetune_networks():
+            net = getattr(deep_model, name)
+            self.train_nets[name] = clone_network(net)
+            self.back_buffers[name] = clone_modules(net)
+            self.infer_nets[name] = net
+            for module in list(self.back_buffers[name].values()) + \
+                    [getattr(net, i) for i in get_module_names(net)]:
+                module.eval()
+            net.enable_finetune = False
+
+        # worker state
+        self.steps = 0
+        self.num_dropped = 0
+        self.error = None
+        self.finishing = False
+        self.finalized = False
+        self.swap_ready = threading.Event()
+        self.stream = torch.cuda.Stream() if torch.cuda.is_available() else None
+        self.worker = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """Start the worker
+        """
+        self.worker.start()
+
+    def push(self, img1, img2, pose, K, inv_K):
+        """Queue a training sample. The oldest sample is dropped if the queue is full,
+        so that tracking never waits for the worker.
+
+        Args:
+            img1 (array, [HxWx3]): image 1 (reference)
+            img2 (array, [HxWx3]): image 2 (current)
+            pose (array, [4x4]): relative pose from view-2 to view-1 (from DF-VO)
+            K (array, [3x3]): camera intrinsics
+            inv_K (array, [3x3]): inverse camera intrinsics
+        """
+        if self.error is not None:
+            raise self.error
+        while self.samples.qsize() >= self.queue_size:
+            try:
+                self.samples.get_nowait()
+                self.num_dropped += 1
+            except queue.Empty:
+                break
+        self.samples.put((img1.copy(), img2.copy(), pose.copy(), K, inv_K))
+
+    def finish(self):
+        """Let the worker stop after training the queued samples
+        """
+        if not self.finishing:
+            self.finishing = True
+            self.samples.put(None)
+
+    def finalize(self):
+        """Wait until the worker stops, then load the final training weights for inference
+        """
+        if self.finalized:
+            return
+        self.finish()
+        self.worker.join()
+        if self.error is not None:
+            raise self.error
+        self.update_inference_weights()
+        self.publish_weights()
+        self.update_inference_weights()
+        self.finalized = True
+        print("==> Asynchronous finetuning: {} steps, {} samples dropped".format(self.steps, self.num_dropped))
+
+    def update_inference_weights(self):
+        """Swap the inference weights with the back buffer if the worker has published new weights.
+        This is called by the main thread between frames, so no inference is running on the swapped weights.
+        """
+        if not self.swap_ready.is_set():
+            return
+        for name, net in self.infer_nets.items():
+            back = self.back_buffers[name]
+            front = {i: getattr(net, i) for i in back}
+            for i, module in back.items():
+                setattr(net, i, module)
+            self.back_buffers[name] = front
+        self.swap_ready.clear()
+
+    @torch.no_grad()
+    def publish_weights(self):
+        """Copy the training weights into the back buffer and mark it ready for swapping.
+        Skipped if the previous back buffer has not been swapped in yet.
+        """
+        if self.swap_ready.is_set():
+            return
+        for name, net in self.train_nets.items():
+            for i, module in self.back_buffers[name].items():
+                if i == 'model' and len(self.back_buffers[name]) > 1:
+                    # model wraps the other modules
+                    continue
+                train_state = getattr(net, i).state_dict()
+                for key, value in module.state_dict().items():
+                    value.copy_(train_state[key])
+        if self.stream is not None:
+            self.stream.synchronize()
+        self.swap_ready.set()
+
+    def run(self):
+        """Worker loop
+        """
+        try:
+            with torch.cuda.stream(self.stream):
+                while True:
+                    sample = self.samples.get()
+                    if sample is None:
+                        return
+                    losses = self.deep_model.finetune_sample(*sample, nets=self.train_nets)
+                    if losses is None:
+                        # sample is stored in the replay buffer only
+                        continue
+                    self.steps += 1
+                    if self.steps % self.swap_interval == 0:
+                        self.publish_weights()
+        except Exception as e:
+            self.error = e
@@ -0,0 +1,179 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This file contains the export (TorchScript/ONNX) and the compiled runtime of the deep models
+'''
+
+import os
+import torch
+import torch.nn as nn
+
+from libs.general.utils import mkdir_if_not_exists
+
+
+# file extension of the exported models
+BACKEND_EXT = {
+    'torchscript': 'pt',
+    'onnx': 'onnx',
+}
+
+
+class FlowInferenceGraph(nn.Module):
+    """Wrap the inference of a DeepFlow interface as a module with tensor inputs/outputs,
+    including the resizing done by the interface, so that it can be traced
+    """
+    def __init__(self, flow_net):
+        """
+        Args:
+            flow_net (DeepFlow): optical flow interface with an initialized model
+        """
+        super(FlowInferenceGraph, self).__init__()
+        self.model = flow_net.model
+        self.flow_net = flow_net
+
+    def forward(self, img1, img2):
+        """
+        Args:
+            img1 (tensor, [1x3xHxW]): image 1; intensity [0-1]
+            img2 (tensor, [1x3xHxW]): image 2; intensity [0-1]
+
+        Returns:
+            flow (tensor, [1x2xHxW]): flow from img1 to img2
+        """
+        return self.flow_net.inference(img1, img2)[1]
+
+
+class DepthInferenceGraph(nn.Module):
+    """Wrap the inference of a DeepDepth interface as a module with tensor inputs/outputs,
+    including the resizing done by the interface, so that it can be traced
+    """
+    def __init__(self, depth_net):
+        """
+        Args:
+            depth_net (DeepDepth): depth interface with an initialized model
+        """
+        super(DepthInferenceGraph, self).__init__()
+        self.model = depth_net.model
+        self.depth_net = depth_net
+
+    def forward(self, img):
+        """
+        Args:
+            img (tensor, [1x3xHxW]): image; intensity [0-1]
+
+        Returns:
+            depth (tensor, [1x1xHxW]): depth prediction at scale-0 (before any dataset specific scaling)
+        """
+        return self.depth_net.inference(img)['depth'][0]
+
+
+def get_compiled_model_path(model_dir, name, height, width, backend):
+    """Get the path of an exported model.
+    Models are traced with a fixed input size, which is part of the file name.
+
+    Args:
+        model_dir (str): directory storing exported models
+        name (str): network name, e.g. liteflow
+        height (int): input height
+        width (int): input width
+        backend (str): runtime backend [torchscript, onnx]
+
+    Returns:
+        path (str): exported model path
+    """
+    return os.path.join(model_dir, "{}_{}x{}.{}".format(name, height, width, BACKEND_EXT[backend]))
+
+
+@torch.no_grad()
+def export_model(graph, example_inputs, input_names, output_names, path, backend, opset=16):
+    """Trace an inference graph and save it as TorchScript or ONNX model
+
+    Args:
+        graph (nn.Module): inference graph, e.g. FlowInferenceGraph
+        example_inputs (tuple): example input tensors, defining the traced input size
+        input_names (list): input names (ONNX)
+        output_names (list): output names (ONNX)
+        path (str): output path
+        backend (str): runtime backend [torchscript, onnx]
+        opset (int): ONNX opset version; grid_sample requires opset >= 16
+    """
+    graph.eval()
+    mkdir_if_not_exists(os.path.dirname(path))
+    if backend == 'torchscript':
+        traced = torch.jit.trace(graph, example_inputs, check_trace=False)
+        traced = torch.jit.freeze(traced)
+        traced.save(path)
+    elif backend == 'onnx':
+        torch.onnx.export(
+            graph, example_inputs, path,
+            input_names=input_names,
+            output_names=output_names,
+            opset_version=opset,
+            do_constant_folding=True)
+    else:
+        assert False, "Wrong export backend [{}] is provided.".format(backend)
+
+
+class CompiledModel():
+    """CompiledModel runs an exported inference graph with TorchScript or ONNX Runtime (CPU).
+    Exported models have a fixed input size and batch size 1; batched inputs are run sample by sample.
+    """
+    def __init__(self, path, backend, device, num_threads=0):
+        """
+        Args:
+            path (str): exported model path
+            backend (str): runtime backend [torchscript, onnx]
+            device (torch.device): device for TorchScript models
+            num_threads (int): number of intra-op threads for ONNX Runtime, 0 uses the default
+        """
+        assert os.path.isfile(path), \
+            "Compiled model [{}] does not exist, export it with tools/export_deep_models.py".format(path)
+        self.path = path
+        self.backend = backend
+        print("==> Load compiled model [{}]".format(path))
+
+        if backend == 'torchscript':
+            self.model = torch.jit.load(path, map_location=device)
+            self.model.eval()
+        elif backend == 'onnx':
+            try:
+                import onnxruntime
+            except ImportError:
+                assert False, "ONNX Runtime is not installed, try pip install onnxruntime"
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if num_threads > 0:
+                options.intra_op_num_threads = num_threads
+            self.session = onnxruntime.InferenceSession(
+                path, sess_options=options, providers=['CPUExecutionProvider'])
+            self.input_names = [i.name for i in self.session.get_inputs()]
+        else:
+            assert False, "Wrong runtime backend [{}] is provided.".format(backend)
+
+    def run(self, *inputs):
+        """Run the model with a single sample
+
+        Args:
+            inputs (list): input tensors, each is [1x...]
+
+        Returns:
+            output (tensor): model output, on the device of inputs
+        """
+        if self.backend == 'torchscript':
+            return self.model(*inputs)
+        else:
+            feed = {name: x.detach().cpu().numpy() for name, x in zip(self.input_names, inputs)}
+            output = self.session.run(None, feed)[0]
+            return torch.from_numpy(output).to(inputs[0].device)
+
+    @torch.no_grad()
+    def __call__(self, *inputs):
+        """
+        Args:
+            inputs (list): input tensors, each is [Nx...]
+
+        Returns:
+            output (tensor, [Nx...]): model output
+        """
+        outputs = [self.run(*[x[i:i+1] for x in inputs]) for i in range(inputs[0].shape[0])]
+        return torch.cat(outputs, 0)
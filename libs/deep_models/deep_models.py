@@ -10,62 +10,122 @@
 
 import numpy as np
 import os
-import PIL.Image as pil
 import torch
+import torch.nn.functional as F
 import torch.optim as optim
-from torchvision import transforms
-from io import BytesIO
-
-from .depth.monodepth2.monodepth2 import Monodepth2DepthNet
-# from .flow.lite_flow_net.lite_flow import LiteFlow
-# from .flow.hd3.hd3_flow import HD3Flow
-from .pose.monodepth2.monodepth2 import Monodepth2PoseNet
-from libs.deep_models.depth.monodepth2.layers import FlowToPix, PixToFlow, SSIM, get_smooth_loss
+
+from .async_finetune import AsyncFinetuner
+from .compiled_model import CompiledModel, get_compiled_model_path
+from .image_tensor import ImageTensorCache, upload_images, normalize_images
+from .replay_buffer import ReplayBuffer
+from .precision import PRECISIONS, InputRecorder, prepare_static_net, convert_static_net
+from libs.general.frame_tensors import to_numpy
+from libs.general.profiler import profile_scope, profiled
+from libs.general.registry import Registry
 from libs.general.utils import mkdir_if_not_exists
 
-from libs.deep_models.flow.spynet.run import Network as SpyNet
-from libs.deep_models.flow.spynet.run import estimate # function
-from libs.deep_models.depth.adabins.infer import InferenceHelper
+
+# network interfaces are imported when they are selected
+FLOW_NETWORKS = Registry("flow network", {
+    'liteflow': 'libs.deep_models.flow.lite_flow_net.lite_flow:LiteFlow',
+    'hd3': 'libs.deep_models.flow.hd3.hd3_flow:HD3Flow',
+    'spynet': 'libs.deep_models.flow.spynet.spynet_flow:SpyNetFlow',
+})
+
+DEPTH_NETWORKS = Registry("depth network", {
+    'monodepth2': 'libs.deep_models.depth.monodepth2.monodepth2:Monodepth2DepthNet',
+    'adabins': 'libs.deep_models.depth.adabins.adabins_depth:AdaBinsDepthNet',
+})
+
+POSE_NETWORKS = Registry("pose network", {
+    'monodepth2': 'libs.deep_models.pose.monodepth2.monodepth2:Monodepth2PoseNet',
+})
 
 
 class DeepModel():
     """DeepModel initializes different deep networks and provide forward interfaces.
     """
     
-    def __init__(self, cfg):
+    def __init__(self, cfg, timers=None):
         """
         Args:
             cfg (edict): configuration dictionary
+            timers (Profiler): profiler, host-device transfers are reported as [H2D/D2H name] scopes
         """
         self.cfg = cfg
+        self.timers = timers
         self.finetune_cfg = self.cfg.online_finetune
+        self.runtime_cfg = self.cfg.deep_runtime
         self.device = torch.device('cuda')
 
-        self.depth_net = InferenceHelper(dataset='kitti')
-        self.flow_net = SpyNet()
+        # keep the computation graph of inference, used for training in synchronous per-frame finetuning
+        self.inference_grad = False
+
+        # frames are uploaded once and shared by the networks (current and reference frames)
+        self.image_cache = ImageTensorCache(size=2, device=self.device, timers=self.timers)
+
+        # camera intrinsics tensors for training, {(K, batch_size): (K, inv_K)}
+        self.intrinsics_tensors = {}
+
+        # networks are built on first use
+        self._flow = None
+        self._depth = None
+        self._pose = None
 
     def initialize_models(self):
-        """intialize multiple deep models
+        """Check the configuration of multiple deep models.
+        The networks are built, and their weights are loaded, when they are first used.
         """
-        """
-        #''' optical flow '''
-        self.flow = self.initialize_deep_flow_model()
+        ''' optical flow '''
+        assert self.cfg.deep_flow.network in FLOW_NETWORKS, \
+            "Invalid flow network [{}] is provided.".format(self.cfg.deep_flow.network)
 
         ''' single-view depth '''
         if self.cfg.depth.depth_src is None:
             if self.cfg.depth.deep_depth.pretrained_model is not None:
-                self.depth = self.initialize_deep_depth_model()
+                assert self.cfg.depth.deep_depth.network in DEPTH_NETWORKS, \
+                    "Invalid depth network [{}] is provided.".format(self.cfg.depth.deep_depth.network)
             else:
                 assert False, "No precomputed depths nor pretrained depth model"
-        
+
         ''' two-view pose '''
         if self.cfg.deep_pose.enable:
-            if self.cfg.deep_pose.pretrained_model is not None:
-                self.pose = self.initialize_deep_pose_model()
-            else:
+            if self.cfg.deep_pose.pretrained_model is None:
                 assert False, "No pretrained pose model"
+
+    @property
+    def flow(self):
+        """optical flow network interface, built on first use
+        """
+        if self._flow is None:
+            self._flow = self.initialize_deep_flow_model()
+            if self.runtime_cfg.backend != 'eager' and \
+                    not (self.finetune_cfg.enable and self.finetune_cfg.flow.enable):
+                self._flow.compiled_model = self.initialize_compiled_model(
+                                                self.cfg.deep_flow.network,
+                                                self._flow.height, self._flow.width)
+        return self._flow
+
+    @property
+    def depth(self):
+        """single-view depth network interface, built on first use
         """
-        pass
+        if self._depth is None:
+            self._depth = self.initialize_deep_depth_model()
+            if self.runtime_cfg.backend != 'eager' and \
+                    not (self.finetune_cfg.enable and self.finetune_cfg.depth.enable):
+                self._depth.compiled_model = self.initialize_compiled_model(
+                                                self.cfg.depth.deep_depth.network,
+                                                self._depth.feed_height, self._depth.feed_width)
+        return self._depth
+
+    @property
+    def pose(self):
+        """two-view pose network interface, built on first use
+        """
+        if self._pose is None:
+            self._pose = self.initialize_deep_pose_model()
+        return self._pose
 
     def initialize_deep_flow_model(self):
         """Initialize optical flow network
@@ -73,27 +133,19 @@ class DeepModel():
         Returns:
             flow_net (nn.Module): optical flow network
         """
-        '''
-        if self.cfg.deep_flow.network == 'liteflow':
-            flow_net = LiteFlow(self.cfg.image.height, self.cfg.image.width)
-            enable_finetune = self.finetune_cfg.enable and self.finetune_cfg.flow.enable
-            flow_net.initialize_network_model(
-                    weight_path=self.cfg.deep_flow.flow_net_weight,
-                    finetune=enable_finetune,
-                    )
-        elif self.cfg.deep_flow.network == 'hd3':
-            flow_net = HD3Flow(self.cfg.image.height, self.cfg.image.width)
-            enable_finetune = self.finetune_cfg.enable and self.finetune_cfg.flow.enable
-            flow_net.initialize_network_model(
-                    weight_path=self.cfg.deep_flow.flow_net_weight,
-                    finetune=enable_finetune,
-                    )
-        else:
-            assert False, "Invalid flow network [{}] is provided.".format(
-                                self.cfg.deep_flow.network
-                                )
-        '''
-        pass
+        # flow network runs at a (down)scaled image size
+        scale = self.cfg.deep_flow.inference_scale
+        height = int(round(self.cfg.image.height * scale))
+        width = int(round(self.cfg.image.width * scale))
+        enable_finetune = self.finetune_cfg.enable and self.finetune_cfg.flow.enable
+        assert not (enable_finetune and scale != 1), "Flow finetuning requires deep_flow.inference_scale=1"
+
+        flow_net = FLOW_NETWORKS[self.cfg.deep_flow.network](height, width)
+        flow_net.initialize_network_model(
+                weight_path=self.cfg.deep_flow.flow_net_weight,
+                finetune=enable_finetune,
+                )
+        return flow_net
 
     def initialize_deep_depth_model(self):
         """Initialize single-view depth model
@@ -101,28 +153,41 @@ class DeepModel():
         Returns:
             depth_net (nn.Module): single-view depth network
         """
-        '''
-        if self.cfg.depth.deep_depth.network == 'monodepth2':
-            depth_net = Monodepth2DepthNet(self.cfg.image.height, self.cfg.image.width)
-            enable_finetune = self.finetune_cfg.enable and self.finetune_cfg.depth.enable
-            depth_net.initialize_network_model(
-                    weight_path=self.cfg.depth.deep_depth.pretrained_model,
-                    dataset=self.cfg.dataset,
-                    finetune=enable_finetune)
-        else:
-            assert False, "Invalid depth network [{}] is provided.".format(
-                                self.cfg.depth.deep_depth.network
-                                )
-        '''
-        return InferenceHelper
-    
+        depth_net = DEPTH_NETWORKS[self.cfg.depth.deep_depth.network](
+                                self.cfg.image.height, self.cfg.image.width)
+        enable_finetune = self.finetune_cfg.enable and self.finetune_cfg.depth.enable
+        depth_net.initialize_network_model(
+                weight_path=self.cfg.depth.deep_depth.pretrained_model,
+                dataset=self.cfg.dataset,
+                finetune=enable_finetune)
+        return depth_net
+
+    def initialize_compiled_model(self, network, height, width):
+        """Load an exported model (TorchScript/ONNX) replacing the eager inference of a network.
+        Flow models are exported at the flow inference size (image size x deep_flow.inference_scale);
+        depth models at the input size of the depth network.
+        Networks being finetuned keep the eager model.
+
+        Args:
+            network (str): network name
+            height (int): input height
+            width (int): input width
+
+        Returns:
+            compiled_model (CompiledModel): compiled model
+        """
+        backend = self.runtime_cfg.backend
+        device = torch.device('cpu') if backend == 'onnx' else self.device
+        path = get_compiled_model_path(self.runtime_cfg.model_dir, network, height, width, backend)
+        return CompiledModel(path, backend, device, self.runtime_cfg.num_threads)
+
     def initialize_deep_pose_model(self):
         """Initialize two-view pose model
 
         Returns:
             pose_net (nn.Module): two-view pose network
         """
-        pose_net = Monodepth2PoseNet()
+        pose_net = POSE_NETWORKS['monodepth2']()
         enable_finetune = self.finetune_cfg.enable and self.finetune_cfg.pose.enable
         pose_net.initialize_network_model(
             weight_path=self.cfg.deep_pose.pretrained_model,
@@ -131,6 +196,77 @@ class DeepModel():
             )
         return pose_net
 
+    def get_inference_networks(self):
+        """Get the networks used for inference only (i.e. not being finetuned)
+
+        Returns:
+            nets (list): network interfaces
+        """
+        nets = []
+        if not (self.finetune_cfg.enable and self.finetune_cfg.flow.enable):
+            nets.append(self.flow)
+        if self.cfg.depth.depth_src is None and \
+                not (self.finetune_cfg.enable and self.finetune_cfg.depth.enable):
+            nets.append(self.depth)
+        if self.cfg.deep_pose.enable and \
+                not (self.finetune_cfg.enable and self.finetune_cfg.pose.enable):
+            nets.append(self.pose)
+        return nets
+
+    def initialize_precision(self, dataset):
+        """Setup reduced-precision inference for the networks used for inference only
+
+            - **fp16/bf16**: autocast
+            - **int8_static**: static FX quantization of Conv/Linear layers calibrated with the first frames of dataset,
+              networks run on CPU; networks which cannot be symbolically traced are rejected
+
+        Args:
+            dataset (Dataset): dataset for calibration
+        """
+        precision = self.runtime_cfg.precision
+        assert precision in PRECISIONS, "Wrong precision [{}] is provided, choose from {}".format(
+                                            precision, PRECISIONS)
+        assert self.runtime_cfg.backend == 'eager', "Reduced precision is only supported by the eager backend"
+        
+        nets = self.get_inference_networks()
+        if precision in ['fp16', 'bf16']:
+            for net in nets:
+                net.precision = precision
+        elif precision == 'int8_static':
+            # record example inputs with a frame pair
+            recorder = InputRecorder(nets)
+            self.calibrate(dataset, 2)
+            recorder.remove()
+
+            # calibrate activation ranges
+            for net in nets:
+                prepare_static_net(net, recorder)
+            print("==> Calibrate int8 models with {} frames".format(self.runtime_cfg.calibration_frames))
+            self.calibrate(dataset, self.runtime_cfg.calibration_frames)
+            for net in nets:
+                convert_static_net(net)
+
+    def calibrate(self, dataset, num_frames):
+        """Run depth/flow/pose inference over the first frames of a sequence, e.g. for int8 calibration
+
+        Args:
+            dataset (Dataset): dataset
+            num_frames (int): number of frames
+        """
+        ref_data = {}
+        for img_id in range(min(num_frames, len(dataset))):
+            cur_data = {
+                'id': img_id,
+                'img': dataset.get_image(dataset.get_timestamp(img_id))
+            }
+            if self.cfg.depth.depth_src is None:
+                self.forward_depth([cur_data['img']])
+            if img_id > 0:
+                self.forward_flow(cur_data, ref_data, self.cfg.deep_flow.forward_backward)
+                if self.cfg.deep_pose.enable:
+                    self.forward_pose([ref_data['img'], cur_data['img']])
+            ref_data = cur_data
+
     def setup_train(self):
         """Setup training configurations for online finetuning
         """
@@ -142,20 +278,64 @@ class DeepModel():
         self.learning_rate = self.finetune_cfg.lr
         self.parameters_to_train = []
 
+        # replay buffer; mini-batches are trained every replay.update_period frames
+        if self.finetune_cfg.replay.enable:
+            self.replay_buffer = ReplayBuffer(self.finetune_cfg.replay.buffer_size, self.cfg.seed)
+        else:
+            self.replay_buffer = None
+
+        # synchronous per-frame finetuning trains with the predictions of inference
+        self.inference_grad = not (self.finetune_cfg.asynchronous.enable or self.finetune_cfg.replay.enable)
+
+        # networks to be trained; asynchronous finetuning trains copies of the networks on a background worker
+        if self.finetune_cfg.asynchronous.enable:
+            self.async_finetuner = AsyncFinetuner(self, self.finetune_cfg.asynchronous)
+            train_nets = self.async_finetuner.train_nets
+        else:
+            self.async_finetuner = None
+            train_nets = {name: getattr(self, name) for name in self.get_finetune_networks()}
+
         # flow train setup
         if self.finetune_cfg.flow.enable:
-            self.flow.setup_train(self, self.finetune_cfg.flow)
-        
+            train_nets['flow'].setup_train(self, self.finetune_cfg.flow)
+
         # depth train setup
         if self.finetune_cfg.depth.enable:
-            self.depth.setup_train(self, self.finetune_cfg.depth)
-        
+            train_nets['depth'].setup_train(self, self.finetune_cfg.depth)
+
         # pose train setup
         if self.finetune_cfg.pose.enable:
-            self.pose.setup_train(self, self.finetune_cfg.pose)
-        
+            train_nets['pose'].setup_train(self, self.finetune_cfg.pose)
+
         self.model_optimizer = optim.Adam(self.parameters_to_train, self.learning_rate)
 
+        if self.async_finetuner is not None:
+            self.async_finetuner.start()
+
+    def get_finetune_networks(self):
+        """Get the networks involved in online finetuning, i.e. trained networks
+        and the pose network providing poses for depth finetuning
+
+        Returns:
+            names (list): network names [flow, depth, pose]
+        """
+        names = []
+        if self.finetune_cfg.flow.enable:
+            names.append('flow')
+        if self.finetune_cfg.depth.enable:
+            names.append('depth')
+        if self.finetune_cfg.pose.enable or \
+                (self.finetune_cfg.depth.enable and self.finetune_cfg.depth.pose_src in ['deep_pose', 'DF-VO2']):
+            names.append('pose')
+        return names
+
+    def stop_finetune(self):
+        """Stop online finetuning. For asynchronous finetuning, the queued samples are trained
+        and the final weights are loaded into the inference networks.
+        """
+        if self.async_finetuner is not None:
+            self.async_finetuner.finalize()
+
     def forward_flow(self, in_cur_data, in_ref_data, forward_backward):
         """Optical flow network forward interface, a forward inference.
 
@@ -171,57 +351,65 @@ class DeepModel():
                 - **flows(id2, id1)** (array, 2xHxW): flows from id2 to id1
                 - **flows(id1, id2, 'diff)** (array, 1xHxW): flow difference of id1
         """
-        # Preprocess image
-        cur_imgs = np.transpose((in_cur_data['img'])/255, (2, 0, 1))
-        ref_imgs = np.transpose((in_ref_data['img'])/255, (2, 0, 1))
-        cur_imgs = torch.from_numpy(cur_imgs).unsqueeze(0).float().cuda()
-        ref_imgs = torch.from_numpy(ref_imgs).unsqueeze(0).float().cuda()
+        # Preprocess image; resized to the flow inference size on the device
+        h, w = in_cur_data['img'].shape[:2]
+        cur_imgs = self.image_cache.get([in_cur_data['img']], self.flow.height, self.flow.width)
+        ref_imgs = self.image_cache.get([in_ref_data['img']], self.flow.height, self.flow.width)
 
         # Forward pass
         flows = {}
 
-        '''
         # Flow inference
-        batch_flows = self.flow.inference_flow(
-                                img1=ref_imgs,
-                                img2=cur_imgs,
-                                forward_backward=forward_backward,
-                                dataset=self.cfg.dataset)
-        '''
+        with torch.set_grad_enabled(self.inference_grad), profile_scope(self.timers, 'flow_net'):
+            batch_flows = self.flow.inference_flow(
+                                    img1=ref_imgs,
+                                    img2=cur_imgs,
+                                    forward_backward=forward_backward,
+                                    dataset=self.cfg.dataset)
+
+        # Upsample flows to the image size
+        if (h, w) != (self.flow.height, self.flow.width):
+            batch_flows = self.upsample_flows(batch_flows, h, w)
+        
         # Save flows at current view
         src_id = in_ref_data['id']
         tgt_id = in_cur_data['id']
+        flows[(src_id, tgt_id)] = to_numpy(batch_flows['forward'], self.timers, 'flow')[0]
+        if forward_backward:
+            flows[(tgt_id, src_id)] = to_numpy(batch_flows['backward'], self.timers, 'flow')[0]
+            flows[(src_id, tgt_id, "diff")] = to_numpy(batch_flows['flow_diff'], self.timers, 'flow_diff')[0]
 
-        tenOne = torch.FloatTensor(np.ascontiguousarray(
-            np.array(ref_imgs)[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) * (
-                        1.0 / 255.0)))
-        tenTwo = torch.FloatTensor(np.ascontiguousarray(
-            np.array(pil.Image.open(cur_imgs))[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) * (
-                        1.0 / 255.0)))
-
-        tenOutput = estimate(tenOne, tenTwo)
-
-        # objOutput = open(arguments_strOut, 'wb')
-
-        temp_stream = BytesIO()
-
-        # overwrite or append??
-        np.array([80, 73, 69, 72], np.uint8).tofile(temp_stream)
-        np.array([tenOutput.shape[2], tenOutput.shape[1]], np.int32).tofile(temp_stream)
-        np.array(tenOutput.numpy().transpose(1, 2, 0), np.float32).tofile(temp_stream)
-
-        flows[(src_id, tgt_id)] = temp_stream.close()
+        # keep the device copy of the forward flow in the frame tensors of the reference view
+        if 'tensors' in in_ref_data:
+            in_ref_data['tensors'].put('flow', flows[(src_id, tgt_id)], batch_flows['forward'].detach()[0])
+        return flows
 
-        temp_stream.close()
+    @profiled('flow_upsample')
+    def upsample_flows(self, flows, height, width):
+        """Upsample flows predicted at the flow inference size with magnitude rescaling
 
-        # flows[(src_id, tgt_id)] = batch_flows['forward'].detach().cpu().numpy()[0]
+        Args:
+            flows (dict): flow data from inference_flow
+                - **forward** (tensor, [Nx2xhxw]) : forward flow
+                - **backward** (tensor, [Nx2xhxw]) : backward flow
+                - **flow_diff** (tensor, [Nxhxwx1]) : foward-backward flow inconsistency
+            height (int): image height
+            width (int): image width
 
-        '''
-        if forward_backward:
-            flows[(tgt_id, src_id)] = batch_flows['backward'].detach().cpu().numpy()[0]
-            flows[(src_id, tgt_id, "diff")] = batch_flows['flow_diff'].detach().cpu().numpy()[0]
-        '''
-        return flows
+        Returns:
+            flows (dict): flow data at image size
+        """
+        out_flows = {}
+        for key in ['forward', 'backward']:
+            if key in flows:
+                out_flows[key] = self.flow.resize_dense_flow(flows[key], height, width)
+        if 'flow_diff' in flows:
+            # flow inconsistency is in pixel unit
+            ratio = 0.5 * (height / self.flow.height + width / self.flow.width)
+            flow_diff = F.interpolate(
+                flows['flow_diff'].permute(0, 3, 1, 2), (height, width), mode='bilinear', align_corners=True)
+            out_flows['flow_diff'] = flow_diff.permute(0, 2, 3, 1) * ratio
+        return out_flows
 
     def forward_depth(self, imgs):
         """Depth network forward interface, a forward inference.
@@ -233,24 +421,13 @@ class DeepModel():
             depth (array, [HxW]): depth map of imgs[0]
         """
         # Preprocess
-        depth_array = []
-        for img in imgs:
-            input_image = pil.fromarray(img).resize((640,480))  # the depth model works only with this dimension
-            # input_image = input_image.resize((self.depth.feed_width, self.depth.feed_height), pil.LANCZOS)
-            # input_image = transforms.ToTensor()(input_image).unsqueeze(0)
-            _, predicted_depth = self.depth_net.predict_pil(input_image)
-            depth_array.append(input_image)
-
-        '''
-        # img_tensor = torch.cat(img_arrays, 0)
-        img_tensor = depth_array.cuda()
-        
-        # Inference
-        pred_depth = self.depth.inference_depth(img_tensor)
-        depth = pred_depth.detach().cpu().numpy()[0,0] 
-        '''
+        img_tensor = self.image_cache.get(imgs, self.depth.feed_height, self.depth.feed_width)
 
-        return depth_array
+        # Inference
+        with torch.set_grad_enabled(self.inference_grad), profile_scope(self.timers, 'depth_net'):
+            pred_depth = self.depth.inference_depth(img_tensor)
+        depth = to_numpy(pred_depth, self.timers, 'depth')[0,0]
+        return depth
 
     def forward_pose(self, imgs):
         """Depth network forward interface, a forward inference.
@@ -262,22 +439,20 @@ class DeepModel():
             pose (array, [4x4]): relative pose from img2 to img1
         """
         # Preprocess
-        img_tensor = []
-        for img in imgs:
-            input_image = pil.fromarray(img)
-            input_image = input_image.resize((self.depth.feed_width, self.depth.feed_height), pil.LANCZOS)
-            input_image = transforms.ToTensor()(input_image).unsqueeze(0)
-            img_tensor.append(input_image)
-        img_tensor = torch.cat(img_tensor, 1)
-        img_tensor = img_tensor.cuda()
+        img_tensor = self.image_cache.get(imgs, self.depth.feed_height, self.depth.feed_width)
+        img_tensor = torch.cat(img_tensor.split(1, 0), 1)
 
         # Prediction
-        pred_poses = self.pose.inference_pose(img_tensor)
-        pose = pred_poses.detach().cpu().numpy()[0]
+        with torch.set_grad_enabled(self.inference_grad), profile_scope(self.timers, 'pose_net'):
+            pred_poses = self.pose.inference_pose(img_tensor)
+        pose = to_numpy(pred_poses, self.timers, 'pose')[0]
         return pose
 
+    @profiled('online_finetune')
     def finetune(self, img1, img2, pose, K, inv_K):
-        """Finetuning deep models
+        """Finetuning deep models.
+        In asynchronous mode, the sample is queued for the background worker and
+        the inference networks are updated with the latest published weights.
 
         Args:
             img1 (array, [HxWx3]): image 1 (reference)
@@ -286,104 +461,220 @@ class DeepModel():
             K (array, [3x3]): camera intrinsics
             inv_K (array, [3x3]): inverse camera intrinsics
         """
-        # preprocess data
-        # images
-        img1 = np.transpose((img1)/255, (2, 0, 1))
-        img2 = np.transpose((img2)/255, (2, 0, 1))
-        img1 = torch.from_numpy(img1).unsqueeze(0).float().cuda()
-        img2 = torch.from_numpy(img2).unsqueeze(0).float().cuda()
-
-        # camera intrinsics
-        K44 = np.eye(4)
-        K44[:3, :3] = K.copy()
-        K = torch.from_numpy(K44).unsqueeze(0).float().cuda()
-        K44[:3, :3] = inv_K.copy()
-        inv_K = torch.from_numpy(K44).unsqueeze(0).float().cuda()
-
-        # pose
-        if self.finetune_cfg.depth.pose_src == 'DF-VO':
-            pose = torch.from_numpy(pose).unsqueeze(0).float().cuda()
-            pose[:, :3, 3] /= 5.4
-        elif self.finetune_cfg.depth.pose_src == 'deep_pose':
-            pose = self.pose.pred_pose
-        elif self.finetune_cfg.depth.pose_src == 'DF-VO2':
-            deep_pose_scale = torch.norm(self.pose.pred_pose[:, :3, 3].clone())
-            pose = torch.from_numpy(pose).unsqueeze(0).float().cuda()
-            pose[:, :3, 3] /= torch.norm(pose[:, :3, 3])
-            pose[:, :3, 3] *= deep_pose_scale
-        
         if self.finetune_cfg.num_frames is None or self.img_cnt < self.finetune_cfg.num_frames:
-            ''' data preparation '''
-            losses = {'loss': 0}
-            inputs = {
-                ('color', 0, 0): img1,
-                ('color', 1, 0): img2,
-                ('K', 0): K,
-                ('inv_K', 0): inv_K,
-            }
-            outputs = {}
-
-            ''' loss computation '''
-            # flow
-            if self.finetune_cfg.flow.enable:
-                assert self.cfg.deep_flow.forward_backward, "forward-backward option has to be True for finetuning"
-                for s in self.flow.flow_scales:
-                    outputs.update(
-                        {
-                            ('flow', 0, 1, s):  self.flow.forward_flow[s],
-                            ('flow', 1, 0, s):  self.flow.backward_flow[s],
-                            ('flow_diff', 0, 1, s):  self.flow.flow_diff[s]
-                        }
-                    )
-
-                losses.update(self.flow.train(inputs, outputs))
-                losses["loss"] += losses["flow_loss"]
-            
-            # depth and pose
-            if self.finetune_cfg.depth.enable:
-                # add predicted depths
-                for s in self.depth.depth_scales:
-                    outputs.update(
-                        {
-                            ('depth', 1, s): self.depth.pred_depths[s][:1],
-                            ('disp', 1, s): self.depth.pred_disps[s][:1],
-                            ('depth', 0, s): self.depth.pred_depths[s][1:],
-                            ('disp', 0, s): self.depth.pred_disps[s][1:]
-                        }
-                    )
-
-                # add predicted poses
-                outputs.update(
-                    {
-                        ('pose_T', 1, 0): pose
-                    }
-                )
-                
-                losses.update(self.depth.train(inputs, outputs))
-                losses["loss"] += losses["reproj_sm_loss"]
-                if self.depth.depth_consistency != 0:
-                    losses["loss"] += losses["depth_consistency_loss"]
-            
-            ''' backward '''
-            self.model_optimizer.zero_grad()
-            losses["loss"].backward()
-            self.model_optimizer.step()
-            
+            if self.async_finetuner is not None:
+                self.async_finetuner.update_inference_weights()
+                self.async_finetuner.push(img1, img2, pose, K, inv_K)
+            else:
+                self.finetune_sample(img1, img2, pose, K, inv_K)
             self.img_cnt += 1
 
+        elif self.async_finetuner is not None:
+            # train the queued samples and load the final weights
+            self.async_finetuner.finish()
+            if not self.async_finetuner.worker.is_alive():
+                self.async_finetuner.finalize()
+            self.async_finetuner.update_inference_weights()
+
         else:
             # reset flow model to eval mode
             if self.finetune_cfg.flow.enable:
                 self.flow.model.eval()
-            
+
             # reset depth model to eval mode
             if self.finetune_cfg.depth.enable:
                 self.depth.model.eval()
-            
+
             # reset pose model to eval mode
             if self.finetune_cfg.pose.enable:
                 self.pose.model.eval()
 
+    def finetune_sample(self, img1, img2, pose, K, inv_K, nets=None):
+        """Finetune with a new sample. Without replay buffer, a training step is taken with the sample;
+        otherwise the sample is stored and a mini-batch from the replay buffer is trained every replay.update_period samples.
+
+        Args:
+            img1 (array, [HxWx3]): image 1 (reference)
+            img2 (array, [HxWx3]): image 2 (current)
+            pose (array, [4x4]): relative pose from view-2 to view-1 (from DF-VO)
+            K (array, [3x3]): camera intrinsics
+            inv_K (array, [3x3]): inverse camera intrinsics
+            nets (dict): training network interfaces {flow, depth, pose}; networks of DeepModel are used if None
+
+        Returns:
+            losses (dict): losses, None if no training step is taken
+        """
+        if self.replay_buffer is None:
+            return self.train_step(img1[None], img2[None], pose[None], K, inv_K, nets)
+
+        self.replay_buffer.add(img1, img2, pose)
+        if self.replay_buffer.num_added % self.finetune_cfg.replay.update_period != 0:
+            return None
+        if nets is None:
+            nets = {name: getattr(self, name) for name in self.get_finetune_networks()}
+        img1, img2, pose = self.replay_buffer.sample(self.finetune_cfg.replay.batch_size)
+        return self.train_step(img1, img2, pose, K, inv_K, nets)
+
+    def finetune_forward(self, img1, img2, nets):
+        """Forward pass (with gradients) of the training networks for a batch of frame pairs,
+        the predictions are kept in the network interfaces as in inference
+
+        Args:
+            img1 (tensor, [Nx3xHxW]): images 1 (reference); uint8
+            img2 (tensor, [Nx3xHxW]): images 2 (current); uint8
+            nets (dict): training network interfaces, {flow, depth, pose}
+        """
+        # flow (1->2 and 2->1)
+        if 'flow' in nets:
+            imgs = [normalize_images(img) for img in [img1, img2]]
+            nets['flow'].inference_flow(
+                        img1=imgs[0],
+                        img2=imgs[1],
+                        forward_backward=True,
+                        dataset=self.cfg.dataset)
+
+        # depth of [currents, references]
+        if 'depth' in nets:
+            depth_net = nets['depth']
+            imgs = normalize_images(torch.cat([img2, img1], 0), depth_net.feed_height, depth_net.feed_width)
+            depth_net.inference_depth(imgs)
+
+        # pose from current to reference
+        if 'pose' in nets:
+            depth_net = nets['depth'] if 'depth' in nets else self.depth
+            imgs = [normalize_images(img, depth_net.feed_height, depth_net.feed_width) for img in [img1, img2]]
+            nets['pose'].inference_pose(torch.cat(imgs, 1))
+
+    def get_intrinsics_tensors(self, K, inv_K, batch_size):
+        """Get camera intrinsics tensors for a batch. The tensors are created once per intrinsics and batch size,
+        so that the geometry layers can reuse their pixel rays.
+
+        Args:
+            K (array, [3x3]): camera intrinsics
+            inv_K (array, [3x3]): inverse camera intrinsics
+            batch_size (int): batch size
+
+        Returns:
+            a tuple containing
+                - **K** (tensor, [Nx4x4]): camera intrinsics
+                - **inv_K** (tensor, [Nx4x4]): inverse camera intrinsics
+        """
+        key = (K.tobytes(), batch_size)
+        if key not in self.intrinsics_tensors:
+            K44 = np.eye(4)
+            K44[:3, :3] = K.copy()
+            K_tensor = torch.from_numpy(K44).unsqueeze(0).float().cuda().repeat(batch_size, 1, 1)
+            K44[:3, :3] = inv_K.copy()
+            inv_K_tensor = torch.from_numpy(K44).unsqueeze(0).float().cuda().repeat(batch_size, 1, 1)
+            self.intrinsics_tensors[key] = (K_tensor, inv_K_tensor)
+        return self.intrinsics_tensors[key]
+
+    def train_step(self, img1, img2, pose, K, inv_K, nets=None):
+        """A training step of online finetuning with a batch of samples
+
+        Args:
+            img1 (array, [NxHxWx3]): images 1 (reference)
+            img2 (array, [NxHxWx3]): images 2 (current)
+            pose (array, [Nx4x4]): relative poses from view-2 to view-1 (from DF-VO)
+            K (array, [3x3]): camera intrinsics
+            inv_K (array, [3x3]): inverse camera intrinsics
+            nets (dict): training network interfaces {flow, depth, pose}, which run a forward pass here.
+                If None, the networks of DeepModel are trained with their predictions from the frame inference (N=1).
+
+        Returns:
+            losses (dict): losses
+        """
+        batch_size = img1.shape[0]
+        if nets is None:
+            nets = {name: getattr(self, name) for name in self.get_finetune_networks()}
+
+            # the frames have been converted in the frame inference
+            img1 = self.image_cache.get(list(img1))
+            img2 = self.image_cache.get(list(img2))
+        else:
+            # preprocess data
+            # images; uploaded once for the forward pass and the losses
+            img1 = upload_images(img1, self.device)
+            img2 = upload_images(img2, self.device)
+            self.finetune_forward(img1, img2, nets)
+            img1 = normalize_images(img1)
+            img2 = normalize_images(img2)
+
+        # camera intrinsics
+        K, inv_K = self.get_intrinsics_tensors(K, inv_K, batch_size)
+
+        ''' data preparation '''
+        losses = {'loss': 0}
+        inputs = {
+            ('color', 0, 0): img1,
+            ('color', 1, 0): img2,
+            ('K', 0): K,
+            ('inv_K', 0): inv_K,
+        }
+        outputs = {}
+
+        ''' loss computation '''
+        # flow
+        if self.finetune_cfg.flow.enable:
+            flow_net = nets['flow']
+            assert self.cfg.deep_flow.forward_backward, "forward-backward option has to be True for finetuning"
+            for s in flow_net.flow_scales:
+                outputs.update(
+                    {
+                        ('flow', 0, 1, s):  flow_net.forward_flow[s],
+                        ('flow', 1, 0, s):  flow_net.backward_flow[s],
+                        ('flow_diff', 0, 1, s):  flow_net.flow_diff[s]
+                    }
+                )
+
+            losses.update(flow_net.train(inputs, outputs))
+            losses["loss"] += losses["flow_loss"]
+
+        # depth and pose
+        if self.finetune_cfg.depth.enable:
+            depth_net = nets['depth']
+
+            # pose
+            if self.finetune_cfg.depth.pose_src == 'DF-VO':
+                pose = torch.from_numpy(pose).float().cuda()
+                pose[:, :3, 3] /= 5.4
+            elif self.finetune_cfg.depth.pose_src == 'deep_pose':
+                pose = nets['pose'].pred_pose
+            elif self.finetune_cfg.depth.pose_src == 'DF-VO2':
+                deep_pose_scale = torch.norm(nets['pose'].pred_pose[:, :3, 3].clone(), dim=1, keepdim=True)
+                pose = torch.from_numpy(pose).float().cuda()
+                pose[:, :3, 3] /= torch.norm(pose[:, :3, 3], dim=1, keepdim=True)
+                pose[:, :3, 3] *= deep_pose_scale
+
+            # add predicted depths
+            for s in depth_net.depth_scales:
+                outputs.update(
+                    {
+                        ('depth', 1, s): depth_net.pred_depths[s][:batch_size],
+                        ('disp', 1, s): depth_net.pred_disps[s][:batch_size],
+                        ('depth', 0, s): depth_net.pred_depths[s][batch_size:],
+                        ('disp', 0, s): depth_net.pred_disps[s][batch_size:]
+                    }
+                )
+
+            # add predicted poses
+            outputs.update(
+                {
+                    ('pose_T', 1, 0): pose
+                }
+            )
+
+            losses.update(depth_net.train(inputs, outputs))
+            losses["loss"] += losses["reproj_sm_loss"]
+            if depth_net.depth_consistency != 0:
+                losses["loss"] += losses["depth_consistency_loss"]
+
+        ''' backward '''
+        self.model_optimizer.zero_grad()
+        losses["loss"].backward()
+        self.model_optimizer.step()
+        return losses
+
     def save_model(self):
         """Save deep models
         """
@@ -0,0 +1,105 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This is the interface for AdaBins depth network
+'''
+
+import torch
+import torch.nn.functional as F
+
+from . import model_io
+from .models import UnetAdaptiveBins
+from ..deep_depth import DeepDepth
+
+
+class AdaBinsDepthNet(DeepDepth):
+    """This is the interface for AdaBins depth network
+    """
+    def __init__(self, *args, **kwargs):
+        super(AdaBinsDepthNet, self).__init__(*args, **kwargs)
+
+        self.enable_finetune = False
+
+    def initialize_network_model(self, weight_path, dataset, finetune):
+        """initialize network and load pretrained model
+
+        Args:
+            weight_path (str): AdaBins checkpoint path, e.g. AdaBins_kitti.pt
+            dataset (str): dataset setup for min/max depth [kitti, tum]
+            finetune (bool): finetune model on the run if True
+        """
+        # dataset parameters; AdaBins predicts metric depth
+        if 'tum' in dataset:
+            self.min_depth = 1e-3
+            self.max_depth = 10
+        else:
+            self.min_depth = 1e-3
+            self.max_depth = 80
+
+        # initilize network
+        print("==> Initialize AdaBins with [{}]".format(weight_path))
+        self.model = UnetAdaptiveBins.build(n_bins=256, min_val=self.min_depth, max_val=self.max_depth,
+                                            pretrained_backbone=False)
+        self.model, _, _ = model_io.load_checkpoint(weight_path, self.model)
+        self.model.to(self.device)
+
+        if finetune:
+            self.model.train()
+        else:
+            self.model.eval()
+
+        # image size; the released models work with this resolution
+        self.feed_height = 480
+        self.feed_width = 640
+
+        # ImageNet normalization
+        self.mean = torch.tensor([0.485, 0.456, 0.406], device=self.device).view(1, 3, 1, 1)
+        self.std = torch.tensor([0.229, 0.224, 0.225], device=self.device).view(1, 3, 1, 1)
+
+    def inference(self, img):
+        """Depth prediction, averaged with the prediction of the mirrored image
+
+        Args:
+            img (tensor, [Nx3HxW]): image
+
+        Returns:
+            a dictionary containing depths and disparities at different scales, resized back to input scale
+
+                - **depth** (dict): depth predictions, each element is **scale-N** (tensor, [Nx1xHxW]): depth predictions at scale-N
+                - **disp** (dict): disparity predictions, each element is **scale-N** (tensor, [Nx1xHxW]): disparity predictions at scale-N
+        """
+        n, _, original_height, original_width = img.shape
+
+        # Prediction; original and mirrored images in one batch
+        img = (img - self.mean) / self.std
+        _, pred = self.model(torch.cat([img, torch.flip(img, [3])], 0))
+        pred = pred.clamp(self.min_depth, self.max_depth)
+        pred = 0.5 * (pred[:n] + torch.flip(pred[n:], [3]))
+
+        depth = F.interpolate(
+            pred, (original_height, original_width), mode='bilinear', align_corners=True)
+        depth = depth.clamp(self.min_depth, self.max_depth)
+        depth = torch.where(torch.isnan(depth), torch.full_like(depth, self.min_depth), depth)
+
+        outputs = {'depth': {0: depth}, 'disp': {0: 1. / depth}}
+        return outputs
+
+    def inference_depth(self, img):
+        """Depth prediction
+
+        Args:
+            img (tensor, [Nx3HxW]): image
+
+        Returns:
+            depth (tensor, [Nx1xHxW]): depth prediction at highest resolution
+        """
+        if self.enable_finetune:
+            predictions = self.inference(img)
+        else:
+            predictions = self.inference_no_grad(img)
+        self.pred_depths = predictions['depth']
+        self.pred_disps = predictions['disp']
+
+        # summarize depth predictions for DF-VO
+        depth = self.pred_depths[0].clone()
+        return depth
@@ -11,6 +11,7 @@ from tqdm import tqdm
 from . import model_io
 from . import utils
 from .models import UnetAdaptiveBins
+from ..image_tensor import upload_images, normalize_images
 
 
 def _is_pil_image(img):
@@ -64,24 +65,31 @@ class ToTensor(object):
 
 
 class InferenceHelper:
-    def __init__(self, dataset='nyu', device='cuda:0'):
+    def __init__(self, dataset='nyu', device='cuda:0', pretrained_path=None):
+        """
+        Args:
+            dataset (str): dataset of the pretrained model [nyu, kitti]
+            device (str): device
+            pretrained_path (str): checkpoint path; pretrained/AdaBins_{dataset}.pt next to this file is used if None
+        """
         self.toTensor = ToTensor()
         self.device = device
         if dataset == 'nyu':
             self.min_depth = 1e-3
             self.max_depth = 10
             self.saving_factor = 1000  # used to save in 16 bit
-            model = UnetAdaptiveBins.build(n_bins=256, min_val=self.min_depth, max_val=self.max_depth)
-            pretrained_path = "./pretrained/AdaBins_nyu.pt"
         elif dataset == 'kitti':
             self.min_depth = 1e-3
             self.max_depth = 80
             self.saving_factor = 256
-            model = UnetAdaptiveBins.build(n_bins=256, min_val=self.min_depth, max_val=self.max_depth)
-            pretrained_path = "/content/DF-VO/libs/deep_models/depth/adabins/pretrained/AdaBins_kitti.pt"
         else:
             raise ValueError("dataset can be either 'nyu' or 'kitti' but got {}".format(dataset))
 
+        if pretrained_path is None:
+            pretrained_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                           "pretrained", "AdaBins_{}.pt".format(dataset))
+        model = UnetAdaptiveBins.build(n_bins=256, min_val=self.min_depth, max_val=self.max_depth,
+                                       pretrained_backbone=False)
         model, _, _ = model_io.load_checkpoint(pretrained_path, model)
         model.eval()
         self.model = model.to(self.device)
@@ -89,9 +97,8 @@ class InferenceHelper:
     @torch.no_grad()
     def predict_pil(self, pil_image, visualized=False):
         # pil_image = pil_image.resize((640, 480))
-        img = np.asarray(pil_image) / 255.
-
-        img = self.toTensor(img).unsqueeze(0).float().to(self.device)
+        img = normalize_images(upload_images(np.asarray(pil_image), self.device))
+        img = self.toTensor.normalize(img[0]).unsqueeze(0)
         bin_centers, pred = self.predict(img)
 
         if visualized:
@@ -107,7 +114,7 @@ class InferenceHelper:
         pred = np.clip(pred.cpu().numpy(), self.min_depth, self.max_depth)
 
         # Flip
-        image = torch.Tensor(np.array(image.cpu().numpy())[..., ::-1].copy()).to(self.device)
+        image = torch.flip(image, [-1])
         pred_lr = self.model(image)[-1]
         pred_lr = np.clip(pred_lr.cpu().numpy()[..., ::-1], self.min_depth, self.max_depth)
 
@@ -119,11 +119,14 @@ class UnetAdaptiveBins(nn.Module):
             yield from m.parameters()
 
     @classmethod
-    def build(cls, n_bins, **kwargs):
+    def build(cls, n_bins, pretrained_backbone=True, **kwargs):
+        # pretrained_backbone=False skips downloading/loading the ImageNet weights of the encoder,
+        # e.g. when a full AdaBins checkpoint is loaded afterwards
         basemodel_name = 'tf_efficientnet_b5_ap'
 
-        print('Loading base model ()...'.format(basemodel_name), end='')
-        basemodel = torch.hub.load('rwightman/gen-efficientnet-pytorch', basemodel_name, pretrained=True)
+        print('Loading base model ({})...'.format(basemodel_name), end='')
+        basemodel = torch.hub.load('rwightman/gen-efficientnet-pytorch', basemodel_name,
+                                   pretrained=pretrained_backbone)
         print('Done.')
 
         # Remove last layer
@@ -11,7 +11,9 @@
 import torch
 import torch.nn.functional as nnFunc
 
-from libs.deep_models.depth.monodepth2.layers import SSIM, get_smooth_loss, BackprojectDepth, disp_to_depth
+from libs.deep_models.depth.monodepth2.layers import SSIM, get_smooth_loss, disp_to_depth
+from libs.geometry.backprojection import Backprojection
+from libs.deep_models.precision import autocast
 from libs.geometry.reprojection import Reprojection
 
 class DeepDepth():
@@ -30,6 +32,13 @@ class DeepDepth():
         self.device = torch.device('cuda')
         self.enable_finetune = False
         self.depth_scales = [0]
+
+        # compiled model (TorchScript/ONNX) replacing the eager model for inference
+        self.compiled_model = None
+
+        # inference precision and the modules called in inference() (quantized for int8)
+        self.precision = 'fp32'
+        self.inference_modules = ['model']
     
 # ========================== Methods need to be implemented =======================
 
@@ -82,7 +91,13 @@ class DeepDepth():
             a dictionary containing depths at different scales, resized back to input scale
                 - **scale-N** (tensor, [Nx1xHxW]): depth predictions at scale-N
         """
-        return self.inference(img)
+        if self.compiled_model is not None:
+            # compiled models only predict the scale-0 depth
+            depth = self.compiled_model(img)
+            return {'depth': {0: depth}, 'disp': {0: 1. / depth}}
+        with autocast(self.precision, self.device):
+            outputs = self.inference(img)
+        return {key: {s: v.float() for s, v in val.items()} for key, val in outputs.items()}
 
     def setup_train(self, deep_model, cfg):
         """Setup training configurations for online finetuning depth network
@@ -107,7 +122,7 @@ class DeepDepth():
         self.ssim = SSIM()
         self.ssim.to(self.device)
         self.reproj = Reprojection(self.height, self.width).to(self.device)
-        self.backproject_depth = BackprojectDepth(1, self.height, self.width)
+        self.backproject_depth = Backprojection(self.height, self.width)
         self.backproject_depth.to(self.device)
 
         # loss
@@ -276,7 +291,7 @@ class DeepDepth():
                     
                     # Reproject ref_depth
                     transformed_cam_points = torch.matmul(T[:, :3, :], cam_points)
-                    transformed_cam_points = transformed_cam_points.view(1, 3, self.height, self.width)
+                    transformed_cam_points = transformed_cam_points.view(-1, 3, self.height, self.width)
                     proj_depth = transformed_cam_points[:, 2, :, :]
 
                     # Compute depth difference
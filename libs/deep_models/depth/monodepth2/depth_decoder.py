@@ -50,6 +50,10 @@ class DepthDecoder(nn.Module):
     def forward(self, input_features):
         self.outputs = {}
 
+        # multi-scale disparities are only needed for training;
+        # in eval mode only the finest disparity head is computed
+        scales = self.scales if self.training else [min(self.scales)]
+
         # decoder
         x = input_features[-1]
         for i in range(4, -1, -1):
@@ -59,7 +63,7 @@ class DepthDecoder(nn.Module):
                 x += [input_features[i - 1]]
             x = torch.cat(x, 1)
             x = self.convs[("upconv", i, 1)](x)
-            if i in self.scales:
+            if i in scales:
                 self.outputs[("disp", i)] = self.sigmoid(self.convs[("dispconv", i)](x))
 
         return self.outputs
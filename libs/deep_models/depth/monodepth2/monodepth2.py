@@ -26,6 +26,7 @@ class Monodepth2DepthNet(DeepDepth):
         super(Monodepth2DepthNet, self).__init__(*args, **kwargs)
 
         self.enable_finetune = False
+        self.inference_modules = ['encoder', 'depth_decoder']
         
     def initialize_network_model(self, weight_path, dataset, finetune):
         """initialize network and load pretrained model
@@ -106,8 +107,15 @@ class Monodepth2DepthNet(DeepDepth):
         features = self.encoder(img)
         pred_disps = self.depth_decoder(features)
 
+        # multi-scale outputs are only needed for training (with gradients and a decoder in train mode);
+        # otherwise only scale-0 is upsampled and converted to depth
+        if torch.is_grad_enabled():
+            scales = [s for s in self.depth_scales if ('disp', s) in pred_disps]
+        else:
+            scales = [0]
+
         outputs = {'depth': {}, 'disp': {}}
-        for s in self.depth_scales:
+        for s in scales:
             disp = pred_disps[('disp', s)]
             disp_resized = torch.nn.functional.interpolate(
                 disp, (original_height, original_width), mode='bilinear', align_corners=False)
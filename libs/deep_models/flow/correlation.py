@@ -1,12 +1,24 @@
-import torch
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: Correlation (cost volume) layer shared by LiteFlowNet and HD3.
+    A CuPy CUDA kernel is used when CuPy is available and the inputs live on GPU,
+    otherwise a vectorized PyTorch implementation is used.
+'''
 
-import cupy
+import collections
 import math
 import re
+import torch
+import torch.nn.functional as F
 
-class Stream:
-	ptr = torch.cuda.current_stream().cuda_stream
-# end
+try:
+    import cupy
+except ImportError:
+    cupy = None
+
+
+Stream = collections.namedtuple('Stream', ['ptr'])
 
 kernel_Correlation_rearrange = '''
 	extern "C" __global__ void kernel_Correlation_rearrange(
@@ -27,9 +39,9 @@ kernel_Correlation_rearrange = '''
 
 	  __syncthreads();
 
-	  int intPaddedY = (intIndex / SIZE_3(input)) + 3*{{intStride}};
-	  int intPaddedX = (intIndex % SIZE_3(input)) + 3*{{intStride}};
-	  int intRearrange = ((SIZE_3(input) + 6*{{intStride}}) * intPaddedY) + intPaddedX;
+	  int intPaddedY = (intIndex / SIZE_3(input)) + {{intMaxDisplacement}}*{{intStride}};
+	  int intPaddedX = (intIndex % SIZE_3(input)) + {{intMaxDisplacement}}*{{intStride}};
+	  int intRearrange = ((SIZE_3(input) + 2*{{intMaxDisplacement}}*{{intStride}}) * intPaddedY) + intPaddedX;
 
 	  output[(((intSample * SIZE_1(output) * SIZE_2(output)) + intRearrange) * SIZE_1(input)) + intChannel] = dblValue;
 	}
@@ -47,8 +59,8 @@ kernel_Correlation_updateOutput = '''
 	  float *patch_data = (float *)patch_data_char;
 	  
 	  // First (upper left) position of kernel upper-left corner in current center position of neighborhood in image 1
-	  int x1 = (blockIdx.x + 3) * {{intStride}};
-	  int y1 = (blockIdx.y + 3) * {{intStride}};
+	  int x1 = (blockIdx.x + {{intMaxDisplacement}}) * {{intStride}};
+	  int y1 = (blockIdx.y + {{intMaxDisplacement}}) * {{intStride}};
 	  int item = blockIdx.z;
 	  int ch_off = threadIdx.x;
 	  
@@ -72,8 +84,8 @@ kernel_Correlation_updateOutput = '''
 	  for (int top_channel = 0; top_channel < SIZE_1(top); top_channel++) {
 	    sum[ch_off] = 0;
 	  
-	    int s2o = (top_channel % 7 - 3) * {{intStride}};
-	    int s2p = (top_channel / 7 - 3) * {{intStride}};
+	    int s2o = (top_channel % {{intGridSize}} - {{intMaxDisplacement}}) * {{intStride}};
+	    int s2p = (top_channel / {{intGridSize}} - {{intMaxDisplacement}}) * {{intStride}};
 	    
 	    for (int j = 0; j < 1; j++) { // HEIGHT
 	      for (int i = 0; i < 1; i++) { // WIDTH
@@ -118,8 +130,8 @@ kernel_Correlation_updateGradFirst = '''
 	  float* gradSecond
 	) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
 	  int n = intIndex % SIZE_1(gradFirst); // channels
-	  int l = (intIndex / SIZE_1(gradFirst)) % SIZE_3(gradFirst) + 3*{{intStride}}; // w-pos
-	  int m = (intIndex / SIZE_1(gradFirst) / SIZE_3(gradFirst)) % SIZE_2(gradFirst) + 3*{{intStride}}; // h-pos
+	  int l = (intIndex / SIZE_1(gradFirst)) % SIZE_3(gradFirst) + {{intMaxDisplacement}}*{{intStride}}; // w-pos
+	  int m = (intIndex / SIZE_1(gradFirst) / SIZE_3(gradFirst)) % SIZE_2(gradFirst) + {{intMaxDisplacement}}*{{intStride}}; // h-pos
 	  
 	  // round_off is a trick to enable integer division with ceil, even for negative numbers
 	  // We use a large offset, for the inner part not to become negative.
@@ -127,12 +139,12 @@ kernel_Correlation_updateGradFirst = '''
 	  const int round_off_s1 = {{intStride}} * round_off;
 	  
 	  // We add round_off before_s1 the int division and subtract round_off after it, to ensure the formula matches ceil behavior:
-	  int xmin = (l - 3*{{intStride}} + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - 3*{{intStride}}) / {{intStride}}
-	  int ymin = (m - 3*{{intStride}} + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - 3*{{intStride}}) / {{intStride}}
+	  int xmin = (l - {{intMaxDisplacement}}*{{intStride}} + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - {{intMaxDisplacement}}*{{intStride}}) / {{intStride}}
+	  int ymin = (m - {{intMaxDisplacement}}*{{intStride}} + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - {{intMaxDisplacement}}*{{intStride}}) / {{intStride}}
 	  
 	  // Same here:
-	  int xmax = (l - 3*{{intStride}} + round_off_s1) / {{intStride}} - round_off; // floor (l - 3*{{intStride}}) / {{intStride}}
-	  int ymax = (m - 3*{{intStride}} + round_off_s1) / {{intStride}} - round_off; // floor (m - 3*{{intStride}}) / {{intStride}}
+	  int xmax = (l - {{intMaxDisplacement}}*{{intStride}} + round_off_s1) / {{intStride}} - round_off; // floor (l - {{intMaxDisplacement}}*{{intStride}}) / {{intStride}}
+	  int ymax = (m - {{intMaxDisplacement}}*{{intStride}} + round_off_s1) / {{intStride}} - round_off; // floor (m - {{intMaxDisplacement}}*{{intStride}}) / {{intStride}}
 	  
 	  float sum = 0;
 	  if (xmax>=0 && ymax>=0 && (xmin<=SIZE_3(gradOutput)-1) && (ymin<=SIZE_2(gradOutput)-1)) {
@@ -142,8 +154,8 @@ kernel_Correlation_updateGradFirst = '''
 	    ymin = max(0,ymin);
 	    ymax = min(SIZE_2(gradOutput)-1,ymax);
 	    
-	    for (int p = -3; p <= 3; p++) {
-	      for (int o = -3; o <= 3; o++) {
+	    for (int p = -{{intMaxDisplacement}}; p <= {{intMaxDisplacement}}; p++) {
+	      for (int o = -{{intMaxDisplacement}}; o <= {{intMaxDisplacement}}; o++) {
 	        // Get rbot1 data:
 	        int s2o = {{intStride}} * o;
 	        int s2p = {{intStride}} * p;
@@ -151,7 +163,7 @@ kernel_Correlation_updateGradFirst = '''
 	        float bot1tmp = rbot1[idxbot1]; // rbot1[l+s2o,m+s2p,n]
 	        
 	        // Index offset for gradOutput in following loops:
-	        int op = (p+3) * 7 + (o+3); // index[o,p]
+	        int op = (p+{{intMaxDisplacement}}) * {{intGridSize}} + (o+{{intMaxDisplacement}}); // index[o,p]
 	        int idxopoffset = (intSample * SIZE_1(gradOutput) + op);
 	        
 	        for (int y = ymin; y <= ymax; y++) {
@@ -164,7 +176,7 @@ kernel_Correlation_updateGradFirst = '''
 	    }
 	  }
 	  const int sumelems = SIZE_1(gradFirst);
-	  const int bot0index = ((n * SIZE_2(gradFirst)) + (m-3*{{intStride}})) * SIZE_3(gradFirst) + (l-3*{{intStride}});
+	  const int bot0index = ((n * SIZE_2(gradFirst)) + (m-{{intMaxDisplacement}}*{{intStride}})) * SIZE_3(gradFirst) + (l-{{intMaxDisplacement}}*{{intStride}});
 	  gradFirst[bot0index + intSample*SIZE_1(gradFirst)*SIZE_2(gradFirst)*SIZE_3(gradFirst)] = sum / (float)sumelems;
 	} }
 '''
@@ -182,8 +194,8 @@ kernel_Correlation_updateGradSecond = '''
 	  float* gradSecond
 	) { for (int intIndex = (blockIdx.x * blockDim.x) + threadIdx.x; intIndex < n; intIndex += blockDim.x * gridDim.x) {
 	  int n = intIndex % SIZE_1(gradSecond); // channels
-	  int l = (intIndex / SIZE_1(gradSecond)) % SIZE_3(gradSecond) + 3*{{intStride}}; // w-pos
-	  int m = (intIndex / SIZE_1(gradSecond) / SIZE_3(gradSecond)) % SIZE_2(gradSecond) + 3*{{intStride}}; // h-pos
+	  int l = (intIndex / SIZE_1(gradSecond)) % SIZE_3(gradSecond) + {{intMaxDisplacement}}*{{intStride}}; // w-pos
+	  int m = (intIndex / SIZE_1(gradSecond) / SIZE_3(gradSecond)) % SIZE_2(gradSecond) + {{intMaxDisplacement}}*{{intStride}}; // h-pos
 	  
 	  // round_off is a trick to enable integer division with ceil, even for negative numbers
 	  // We use a large offset, for the inner part not to become negative.
@@ -191,19 +203,19 @@ kernel_Correlation_updateGradSecond = '''
 	  const int round_off_s1 = {{intStride}} * round_off;
 	  
 	  float sum = 0;
-	  for (int p = -3; p <= 3; p++) {
-	    for (int o = -3; o <= 3; o++) {
+	  for (int p = -{{intMaxDisplacement}}; p <= {{intMaxDisplacement}}; p++) {
+	    for (int o = -{{intMaxDisplacement}}; o <= {{intMaxDisplacement}}; o++) {
 	      int s2o = {{intStride}} * o;
 	      int s2p = {{intStride}} * p;
 	      
 	      //Get X,Y ranges and clamp
 	      // We add round_off before_s1 the int division and subtract round_off after it, to ensure the formula matches ceil behavior:
-	      int xmin = (l - 3*{{intStride}} - s2o + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - 3*{{intStride}} - s2o) / {{intStride}}
-	      int ymin = (m - 3*{{intStride}} - s2p + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - 3*{{intStride}} - s2o) / {{intStride}}
+	      int xmin = (l - {{intMaxDisplacement}}*{{intStride}} - s2o + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - {{intMaxDisplacement}}*{{intStride}} - s2o) / {{intStride}}
+	      int ymin = (m - {{intMaxDisplacement}}*{{intStride}} - s2p + round_off_s1 - 1) / {{intStride}} + 1 - round_off; // ceil (l - {{intMaxDisplacement}}*{{intStride}} - s2o) / {{intStride}}
 	      
 	      // Same here:
-	      int xmax = (l - 3*{{intStride}} - s2o + round_off_s1) / {{intStride}} - round_off; // floor (l - 3*{{intStride}} - s2o) / {{intStride}}
-	      int ymax = (m - 3*{{intStride}} - s2p + round_off_s1) / {{intStride}} - round_off; // floor (m - 3*{{intStride}} - s2p) / {{intStride}}
+	      int xmax = (l - {{intMaxDisplacement}}*{{intStride}} - s2o + round_off_s1) / {{intStride}} - round_off; // floor (l - {{intMaxDisplacement}}*{{intStride}} - s2o) / {{intStride}}
+	      int ymax = (m - {{intMaxDisplacement}}*{{intStride}} - s2p + round_off_s1) / {{intStride}} - round_off; // floor (m - {{intMaxDisplacement}}*{{intStride}} - s2p) / {{intStride}}
           
 	      if (xmax>=0 && ymax>=0 && (xmin<=SIZE_3(gradOutput)-1) && (ymin<=SIZE_2(gradOutput)-1)) {
 	        xmin = max(0,xmin);
@@ -217,7 +229,7 @@ kernel_Correlation_updateGradSecond = '''
 	        float bot0tmp = rbot0[idxbot0]; // rbot1[l+s2o,m+s2p,n]
 	        
 	        // Index offset for gradOutput in following loops:
-	        int op = (p+3) * 7 + (o+3); // index[o,p]
+	        int op = (p+{{intMaxDisplacement}}) * {{intGridSize}} + (o+{{intMaxDisplacement}}); // index[o,p]
 	        int idxopoffset = (intSample * SIZE_1(gradOutput) + op);
 	        
 	        for (int y = ymin; y <= ymax; y++) {
@@ -230,13 +242,16 @@ kernel_Correlation_updateGradSecond = '''
 	    }
 	  }
 	  const int sumelems = SIZE_1(gradSecond);
-	  const int bot1index = ((n * SIZE_2(gradSecond)) + (m-3*{{intStride}})) * SIZE_3(gradSecond) + (l-3*{{intStride}});
+	  const int bot1index = ((n * SIZE_2(gradSecond)) + (m-{{intMaxDisplacement}}*{{intStride}})) * SIZE_3(gradSecond) + (l-{{intMaxDisplacement}}*{{intStride}});
 	  gradSecond[bot1index + intSample*SIZE_1(gradSecond)*SIZE_2(gradSecond)*SIZE_3(gradSecond)] = sum / (float)sumelems;
 	} }
 '''
 
 def cupy_kernel(strFunction, objectVariables):
-	strKernel = globals()[strFunction].replace('{{intStride}}', str(objectVariables['intStride']))
+	strKernel = globals()[strFunction]
+	strKernel = strKernel.replace('{{intStride}}', str(objectVariables['intStride']))
+	strKernel = strKernel.replace('{{intMaxDisplacement}}', str(objectVariables['intMaxDisplacement']))
+	strKernel = strKernel.replace('{{intGridSize}}', str(2 * objectVariables['intMaxDisplacement'] + 1))
 
 	while True:
 		objectMatch = re.search('(SIZE_)([0-4])(\()([^\)]*)(\))', strKernel)
@@ -273,54 +288,69 @@ def cupy_kernel(strFunction, objectVariables):
 	return strKernel
 # end
 
-@cupy.memoize(for_each_device=True)
+objectKernelCache = {}
+
 def cupy_launch(strFunction, strKernel):
-	return cupy.cuda.compile_with_cache(strKernel).get_function(strFunction)
+	# compiled kernels are cached per device, same as cupy.memoize(for_each_device=True)
+	objectKey = (cupy.cuda.Device().id, strFunction, strKernel)
+	if objectKey not in objectKernelCache:
+		objectKernelCache[objectKey] = cupy.cuda.compile_with_cache(strKernel).get_function(strFunction)
+	# end
+	return objectKernelCache[objectKey]
 # end
 
 class _FunctionCorrelation(torch.autograd.Function):
 	@staticmethod
-	def forward(self, first, second, intStride):
-		rbot0 = first.new_zeros([ first.size(0), first.size(2) + (6 * intStride), first.size(3) + (6 * intStride), first.size(1) ])
-		rbot1 = first.new_zeros([ first.size(0), first.size(2) + (6 * intStride), first.size(3) + (6 * intStride), first.size(1) ])
+	def forward(self, first, second, intStride, intMaxDisplacement):
+		intPad = intMaxDisplacement * intStride
+		intGridSize = 2 * intMaxDisplacement + 1
+
+		rbot0 = first.new_zeros([ first.size(0), first.size(2) + (2 * intPad), first.size(3) + (2 * intPad), first.size(1) ])
+		rbot1 = first.new_zeros([ first.size(0), first.size(2) + (2 * intPad), first.size(3) + (2 * intPad), first.size(1) ])
 
 		self.save_for_backward(first, second, rbot0, rbot1)
 
 		self.intStride = intStride
+		self.intMaxDisplacement = intMaxDisplacement
 
 		assert(first.is_contiguous() == True)
 		assert(second.is_contiguous() == True)
 
-		output = first.new_zeros([ first.size(0), 49, int(math.ceil(first.size(2) / intStride)), int(math.ceil(first.size(3) / intStride)) ])
+		output = first.new_zeros([ first.size(0), intGridSize * intGridSize, int(math.ceil(first.size(2) / intStride)), int(math.ceil(first.size(3) / intStride)) ])
 
 		if first.is_cuda == True:
+			objectStream = Stream(torch.cuda.current_stream().cuda_stream)
+
 			n = first.size(2) * first.size(3)
 			cupy_launch('kernel_Correlation_rearrange', cupy_kernel('kernel_Correlation_rearrange', {
 				'intStride': self.intStride,
+				'intMaxDisplacement': self.intMaxDisplacement,
 				'input': first,
 				'output': rbot0
 			}))(
 				grid=tuple([ int((n + 16 - 1) / 16), first.size(1), first.size(0) ]),
 				block=tuple([ 16, 1, 1 ]),
 				args=[ n, first.data_ptr(), rbot0.data_ptr() ],
-				stream=Stream
+				stream=objectStream
 			)
 
 			n = second.size(2) * second.size(3)
 			cupy_launch('kernel_Correlation_rearrange', cupy_kernel('kernel_Correlation_rearrange', {
 				'intStride': self.intStride,
+				'intMaxDisplacement': self.intMaxDisplacement,
 				'input': second,
 				'output': rbot1
 			}))(
 				grid=tuple([ int((n + 16 - 1) / 16), second.size(1), second.size(0) ]),
 				block=tuple([ 16, 1, 1 ]),
 				args=[ n, second.data_ptr(), rbot1.data_ptr() ],
-				stream=Stream
+				stream=objectStream
 			)
 
 			n = output.size(1) * output.size(2) * output.size(3)
 			cupy_launch('kernel_Correlation_updateOutput', cupy_kernel('kernel_Correlation_updateOutput', {
 				'intStride': self.intStride,
+				'intMaxDisplacement': self.intMaxDisplacement,
 				'rbot0': rbot0,
 				'rbot1': rbot1,
 				'top': output
@@ -329,7 +359,7 @@ class _FunctionCorrelation(torch.autograd.Function):
 				block=tuple([ 32, 1, 1 ]),
 				shared_mem=first.size(1) * 4,
 				args=[ n, rbot0.data_ptr(), rbot1.data_ptr(), output.data_ptr() ],
-				stream=Stream
+				stream=objectStream
 			)
 
 		elif first.is_cuda == False:
@@ -344,17 +374,20 @@ class _FunctionCorrelation(torch.autograd.Function):
 	def backward(self, gradOutput):
 		first, second, rbot0, rbot1 = self.saved_tensors
 
-		assert(gradOutput.is_contiguous() == True)
+		gradOutput = gradOutput.contiguous()
 
 		gradFirst = first.new_zeros([ first.size(0), first.size(1), first.size(2), first.size(3) ]) if self.needs_input_grad[0] == True else None
 		gradSecond = first.new_zeros([ first.size(0), first.size(1), first.size(2), first.size(3) ]) if self.needs_input_grad[1] == True else None
 
 		if first.is_cuda == True:
+			objectStream = Stream(torch.cuda.current_stream().cuda_stream)
+
 			if gradFirst is not None:
 				for intSample in range(first.size(0)):
 					n = first.size(1) * first.size(2) * first.size(3)
 					cupy_launch('kernel_Correlation_updateGradFirst', cupy_kernel('kernel_Correlation_updateGradFirst', {
 						'intStride': self.intStride,
+						'intMaxDisplacement': self.intMaxDisplacement,
 						'rbot0': rbot0,
 						'rbot1': rbot1,
 						'gradOutput': gradOutput,
@@ -364,7 +397,7 @@ class _FunctionCorrelation(torch.autograd.Function):
 						grid=tuple([ int((n + 512 - 1) / 512), 1, 1 ]),
 						block=tuple([ 512, 1, 1 ]),
 						args=[ n, intSample, rbot0.data_ptr(), rbot1.data_ptr(), gradOutput.data_ptr(), gradFirst.data_ptr(), None ],
-						stream=Stream
+						stream=objectStream
 					)
 				# end
 			# end
@@ -374,6 +407,7 @@ class _FunctionCorrelation(torch.autograd.Function):
 					n = first.size(1) * first.size(2) * first.size(3)
 					cupy_launch('kernel_Correlation_updateGradSecond', cupy_kernel('kernel_Correlation_updateGradSecond', {
 						'intStride': self.intStride,
+						'intMaxDisplacement': self.intMaxDisplacement,
 						'rbot0': rbot0,
 						'rbot1': rbot1,
 						'gradOutput': gradOutput,
@@ -383,7 +417,7 @@ class _FunctionCorrelation(torch.autograd.Function):
 						grid=tuple([ int((n + 512 - 1) / 512), 1, 1 ]),
 						block=tuple([ 512, 1, 1 ]),
 						args=[ n, intSample, rbot0.data_ptr(), rbot1.data_ptr(), gradOutput.data_ptr(), None, gradSecond.data_ptr() ],
-						stream=Stream
+						stream=objectStream
 					)
 				# end
 			# end
@@ -393,20 +427,106 @@ class _FunctionCorrelation(torch.autograd.Function):
 
 		# end
 
-		return gradFirst, gradSecond, None
+		return gradFirst, gradSecond, None, None
 	# end
 # end
 
-def FunctionCorrelation(tensorFirst, tensorSecond, intStride):
-	return _FunctionCorrelation.apply(tensorFirst, tensorSecond, intStride)
-# end
 
-class ModuleCorrelation(torch.nn.Module):
-	def __init__(self):
-		super(ModuleCorrelation, self).__init__()
-	# end
+def is_cupy_available():
+    """Check whether the CuPy correlation kernel can be used
+
+    Returns:
+        available (bool): True if CuPy is installed and a CUDA device is visible
+    """
+    return cupy is not None and torch.cuda.is_available()
+
+
+def correlation_cupy(first, second, stride=1, max_displacement=3):
+    """Correlation computed by the CuPy CUDA kernel
+
+    Args:
+        first (tensor, [NxCxHxW]): feature map of view-1, on GPU
+        second (tensor, [NxCxHxW]): feature map of view-2, on GPU
+        stride (int): stride of the sampled positions and displacements
+        max_displacement (int): maximum displacement (in strided steps)
+
+    Returns:
+        cost_volume (tensor, [NxDxH'xW']): correlation, D=(2*max_displacement+1)**2, H'=ceil(H/stride)
+    """
+    assert is_cupy_available(), "CuPy correlation backend is not available."
+    return _FunctionCorrelation.apply(first.contiguous(), second.contiguous(), stride, max_displacement)
+
+
+def correlation_torch(first, second, stride=1, max_displacement=3):
+    """Correlation computed with PyTorch operations (shift-and-multiply).
+    It runs on any device and is differentiable through autograd.
+    The result matches the CuPy kernel: zero padding and channel-averaged dot products.
+
+    Args:
+        first (tensor, [NxCxHxW]): feature map of view-1
+        second (tensor, [NxCxHxW]): feature map of view-2
+        stride (int): stride of the sampled positions and displacements
+        max_displacement (int): maximum displacement (in strided steps)
+
+    Returns:
+        cost_volume (tensor, [NxDxH'xW']): correlation, D=(2*max_displacement+1)**2, H'=ceil(H/stride)
+    """
+    _, _, h, w = first.shape
+    pad = max_displacement * stride
+    grid_size = 2 * max_displacement + 1
+    out_h = int(math.ceil(h / stride))
+    out_w = int(math.ceil(w / stride))
+
+    # sampled positions in view-1, padded view-2
+    first = first[:, :, ::stride, ::stride]
+    second = F.pad(second, [pad, pad, pad, pad])
+
+    # channel order follows the CUDA kernel: index = (dy + d) * grid_size + (dx + d)
+    cost_volume = []
+    for dy in range(grid_size):
+        y0 = dy * stride
+        for dx in range(grid_size):
+            x0 = dx * stride
+            shifted = second[:, :,
+                             y0:y0 + (out_h - 1) * stride + 1:stride,
+                             x0:x0 + (out_w - 1) * stride + 1:stride]
+            cost_volume.append((first * shifted).mean(1, keepdim=True))
+    return torch.cat(cost_volume, 1)
+
+
+backends = {
+    'cupy': correlation_cupy,
+    'torch': correlation_torch,
+}
+
+
+def FunctionCorrelation(tensorFirst, tensorSecond, intStride=1, intMaxDisplacement=3, backend='auto'):
+    """Correlation between two feature maps
+
+    Args:
+        tensorFirst (tensor, [NxCxHxW]): feature map of view-1
+        tensorSecond (tensor, [NxCxHxW]): feature map of view-2
+        intStride (int): stride of the sampled positions and displacements
+        intMaxDisplacement (int): maximum displacement (in strided steps)
+        backend (str): correlation backend [auto, cupy, torch].
+            **auto** uses CuPy for CUDA tensors if CuPy is available, otherwise PyTorch.
+            PyTorch is always used while tracing (TorchScript/ONNX export)
+
+    Returns:
+        cost_volume (tensor, [NxDxH'xW']): correlation, D=(2*intMaxDisplacement+1)**2, H'=ceil(H/intStride)
+    """
+    if backend == 'auto':
+        use_cupy = tensorFirst.is_cuda and is_cupy_available() and not torch.jit.is_tracing()
+        backend = 'cupy' if use_cupy else 'torch'
+    return backends[backend](tensorFirst, tensorSecond, intStride, intMaxDisplacement)
 
-	def forward(self, tensorFirst, tensorSecond, intStride):
-		return _FunctionCorrelation.apply(tensorFirst, tensorSecond, intStride)
-	# end
-# end
\ No newline at end of file
+
+class ModuleCorrelation(torch.nn.Module):
+    def __init__(self, intMaxDisplacement=3, backend='auto'):
+        super(ModuleCorrelation, self).__init__()
+        self.intMaxDisplacement = intMaxDisplacement
+        self.backend = backend
+
+    def forward(self, tensorFirst, tensorSecond, intStride=1):
+        return FunctionCorrelation(tensorFirst, tensorSecond, intStride,
+                                   self.intMaxDisplacement, self.backend)
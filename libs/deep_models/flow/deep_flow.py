@@ -17,6 +17,7 @@ import torch
 import torch.nn.functional as F
 
 from libs.deep_models.depth.monodepth2.layers import FlowToPix, SSIM, get_smooth_loss
+from libs.deep_models.precision import autocast
 
 
 class DeepFlow():
@@ -35,6 +36,13 @@ class DeepFlow():
         self.device = torch.device('cuda')
         self.enable_finetune = False
         self.flow_scales = [1]
+
+        # compiled model (TorchScript/ONNX) replacing the eager model for inference
+        self.compiled_model = None
+
+        # inference precision and the modules called in inference() (quantized for int8)
+        self.precision = 'fp32'
+        self.inference_modules = ['model']
         
         # Layer setup
         self.flow_to_pix = FlowToPix(self.batch_size, self.height, self.width) 
@@ -166,7 +174,12 @@ class DeepFlow():
             a dictionary containing flows at different scales, resized back to input scale 
                 - **scale-N** (tensor, [Nx2xHxW]): flow from img1 to img2 at scale level-N
         """
-        return self.inference(img1, img2)
+        if self.compiled_model is not None:
+            # compiled models only predict the finest flow
+            return {1: self.compiled_model(img1, img2)}
+        with autocast(self.precision, self.device):
+            flows = self.inference(img1, img2)
+        return {s: flow.float() for s, flow in flows.items()}
 
     def forward_backward_consistency(self, flow1, flow2, px1on2):
         """Compute flow consistency map
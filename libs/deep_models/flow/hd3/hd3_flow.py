@@ -183,9 +183,9 @@ class HD3Flow(DeepFlow):
         self.flow_diff = {}
         self.px1on2 = {}
         for s in self.flow_scales:
-            self.forward_flow[s] = combined_flow_data[s][0:1]
+            self.forward_flow[s] = combined_flow_data[s][:len(img1)]
             if forward_backward:
-                self.backward_flow[s] = combined_flow_data[s][1:2]
+                self.backward_flow[s] = combined_flow_data[s][len(img1):]
 
             # sampled flow
             # Get sampling pixel coordinates
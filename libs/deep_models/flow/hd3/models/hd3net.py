@@ -1,7 +1,7 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from . import correlation
+from libs.deep_models.flow import correlation
 from .hd3_ops import *
 from .dla_up import DLAEncoder as dlaup_encoder
 from .vgg import VGGEncoder as vgg_encoder
@@ -161,7 +161,8 @@ class HD3Net(nn.Module):
                 tar_feat_corr = self.shift(tar_feat, up_curr_vect)
 
             cost_vol = correlation.FunctionCorrelation(
-                tensorFirst=ref_feat, tensorSecond=tar_feat_corr)
+                tensorFirst=ref_feat, tensorSecond=tar_feat_corr,
+                intStride=1, intMaxDisplacement=4)
             if self.task == 'stereo':
                 c = self.classes[l] // 2
                 cost_vol = cost_vol[:, c * (2 * c + 1):(c + 1) *
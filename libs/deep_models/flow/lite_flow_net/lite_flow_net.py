@@ -1,7 +1,7 @@
 import math
 import torch
 
-from . import correlation  # the custom cost volume layer
+from .. import correlation  # the custom cost volume layer
 
 
 Backward_tensorGrid = {}
@@ -17,15 +17,16 @@ def Backward(tensorInput, tensorFlow):
     Returns:
         tensorOutput (tensor): warped data
     """
-    if str(tensorFlow.size()) not in Backward_tensorGrid:
+    strKey = str(tensorFlow.size()) + str(tensorFlow.device)
+    if strKey not in Backward_tensorGrid:
         tensorHorizontal = torch.linspace(-1.0, 1.0, tensorFlow.size(3)).view(1, 1, 1, tensorFlow.size(3)).expand(tensorFlow.size(0), -1, tensorFlow.size(2), -1)
         tensorVertical = torch.linspace(-1.0, 1.0, tensorFlow.size(2)).view(1, 1, tensorFlow.size(2), 1).expand(tensorFlow.size(0), -1, -1, tensorFlow.size(3))
 
-        Backward_tensorGrid[str(tensorFlow.size())] = torch.cat([ tensorHorizontal, tensorVertical ], 1).cuda()
+        Backward_tensorGrid[strKey] = torch.cat([ tensorHorizontal, tensorVertical ], 1).to(tensorFlow.device)
     
     tensorFlow = torch.cat([ tensorFlow[:, 0:1, :, :] / ((tensorInput.size(3) - 1.0) / 2.0), tensorFlow[:, 1:2, :, :] / ((tensorInput.size(2) - 1.0) / 2.0) ], 1)
 
-    return torch.nn.functional.grid_sample(input=tensorInput, grid=(Backward_tensorGrid[str(tensorFlow.size())] + tensorFlow).permute(0, 2, 3, 1), mode='bilinear', padding_mode='zeros')
+    return torch.nn.functional.grid_sample(input=tensorInput, grid=(Backward_tensorGrid[strKey] + tensorFlow).permute(0, 2, 3, 1), mode='bilinear', padding_mode='zeros')
 
 
 class LiteFlowNet(torch.nn.Module):
@@ -142,10 +143,10 @@ class LiteFlowNet(torch.nn.Module):
                 
 
                 if self.moduleUpcorr is None:
-                    tensorCorrelation = torch.nn.functional.leaky_relu(input=correlation.FunctionCorrelation(tensorFirst=tensorFeaturesFirst, tensorSecond=tensorFeaturesSecond, intStride=1), negative_slope=0.1, inplace=False)
+                    tensorCorrelation = torch.nn.functional.leaky_relu(input=correlation.FunctionCorrelation(tensorFirst=tensorFeaturesFirst, tensorSecond=tensorFeaturesSecond, intStride=1, intMaxDisplacement=3), negative_slope=0.1, inplace=False)
 
                 elif self.moduleUpcorr is not None:
-                    tensorCorrelation = self.moduleUpcorr(torch.nn.functional.leaky_relu(input=correlation.FunctionCorrelation(tensorFirst=tensorFeaturesFirst, tensorSecond=tensorFeaturesSecond, intStride=2), negative_slope=0.1, inplace=False))
+                    tensorCorrelation = self.moduleUpcorr(torch.nn.functional.leaky_relu(input=correlation.FunctionCorrelation(tensorFirst=tensorFeaturesFirst, tensorSecond=tensorFeaturesSecond, intStride=2, intMaxDisplacement=3), negative_slope=0.1, inplace=False))
 
                 
 
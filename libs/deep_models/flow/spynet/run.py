@@ -14,8 +14,6 @@ import sys
 
 assert(int(str('').join(torch.__version__.split('.')[0:2])) >= 13) # requires at least pytorch version 1.3.0
 
-torch.set_grad_enabled(False) # make sure to not compute gradients for computational performance
-
 torch.backends.cudnn.enabled = True # make sure to use cudnn for computational performance
 
 ##########################################################
@@ -25,36 +23,31 @@ arguments_strOne = './images/one.png'
 arguments_strTwo = './images/two.png'
 arguments_strOut = './out.flo'
 
-for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [ strParameter[2:] + '=' for strParameter in sys.argv[1::2] ])[0]:
-	if strOption == '--model' and strArgument != '': arguments_strModel = strArgument # which model to use, see below
-	if strOption == '--one' and strArgument != '': arguments_strOne = strArgument # path to the first frame
-	if strOption == '--two' and strArgument != '': arguments_strTwo = strArgument # path to the second frame
-	if strOption == '--out' and strArgument != '': arguments_strOut = strArgument # path to where the output should be stored
-# end
-
 ##########################################################
 
 backwarp_tenGrid = {}
 
 def backwarp(tenInput, tenFlow):
-	if str(tenFlow.shape) not in backwarp_tenGrid:
+	if str(tenFlow.shape) + str(tenFlow.device) not in backwarp_tenGrid:
 		tenHor = torch.linspace(-1.0 + (1.0 / tenFlow.shape[3]), 1.0 - (1.0 / tenFlow.shape[3]), tenFlow.shape[3]).view(1, 1, 1, -1).expand(-1, -1, tenFlow.shape[2], -1)
 		tenVer = torch.linspace(-1.0 + (1.0 / tenFlow.shape[2]), 1.0 - (1.0 / tenFlow.shape[2]), tenFlow.shape[2]).view(1, 1, -1, 1).expand(-1, -1, -1, tenFlow.shape[3])
 
-		backwarp_tenGrid[str(tenFlow.shape)] = torch.cat([ tenHor, tenVer ], 1).cuda()
+		backwarp_tenGrid[str(tenFlow.shape) + str(tenFlow.device)] = torch.cat([ tenHor, tenVer ], 1).to(tenFlow.device)
 	# end
 
 	tenFlow = torch.cat([ tenFlow[:, 0:1, :, :] / ((tenInput.shape[3] - 1.0) / 2.0), tenFlow[:, 1:2, :, :] / ((tenInput.shape[2] - 1.0) / 2.0) ], 1)
 
-	return torch.nn.functional.grid_sample(input=tenInput, grid=(backwarp_tenGrid[str(tenFlow.shape)] + tenFlow).permute(0, 2, 3, 1), mode='bilinear', padding_mode='border', align_corners=False)
+	return torch.nn.functional.grid_sample(input=tenInput, grid=(backwarp_tenGrid[str(tenFlow.shape) + str(tenFlow.device)] + tenFlow).permute(0, 2, 3, 1), mode='bilinear', padding_mode='border', align_corners=False)
 # end
 
 ##########################################################
 
 class Network(torch.nn.Module):
-	def __init__(self):
+	def __init__(self, strModel=None):
 		super().__init__()
 
+		if strModel is None: strModel = arguments_strModel # a model name from the list above, or a path to a local weight file
+
 		class Preprocess(torch.nn.Module):
 			def __init__(self):
 				super().__init__()
@@ -95,7 +88,13 @@ class Network(torch.nn.Module):
 
 		self.netBasic = torch.nn.ModuleList([ Basic(intLevel) for intLevel in range(6) ])
 
-		self.load_state_dict({ strKey.replace('module', 'net'): tenWeight for strKey, tenWeight in torch.hub.load_state_dict_from_url(url='http://content.sniklaus.com/github/pytorch-spynet/network-' + arguments_strModel + '.pytorch', file_name='spynet-' + arguments_strModel).items() })
+		if os.path.isfile(strModel):
+			objectWeights = torch.load(strModel, map_location='cpu')
+		else:
+			objectWeights = torch.hub.load_state_dict_from_url(url='http://content.sniklaus.com/github/pytorch-spynet/network-' + strModel + '.pytorch', file_name='spynet-' + strModel)
+		# end
+
+		self.load_state_dict({ strKey.replace('module', 'net'): tenWeight for strKey, tenWeight in objectWeights.items() })
 	# end
 
 	def forward(self, tenOne, tenTwo):
@@ -130,6 +129,7 @@ netNetwork = None
 
 ##########################################################
 
+@torch.no_grad()
 def estimate(tenOne, tenTwo):
 	global netNetwork
 
@@ -166,6 +166,15 @@ def estimate(tenOne, tenTwo):
 ##########################################################
 
 if __name__ == '__main__':
+	# command line options are only parsed when running this file as a script, importing the module keeps sys.argv intact
+	for strOption, strArgument in getopt.getopt(sys.argv[1:], '', [ strParameter[2:] + '=' for strParameter in sys.argv[1::2] ])[0]:
+		if strOption == '--model' and strArgument != '': arguments_strModel = strArgument # which model to use, see below
+		if strOption == '--one' and strArgument != '': arguments_strOne = strArgument # path to the first frame
+		if strOption == '--two' and strArgument != '': arguments_strTwo = strArgument # path to the second frame
+		if strOption == '--out' and strArgument != '': arguments_strOut = strArgument # path to where the output should be stored
+	# end
+
+	torch.set_grad_enabled(False) # make sure to not compute gradients for computational performance
 
 	tenOne = torch.FloatTensor(numpy.ascontiguousarray(numpy.array(PIL.Image.open(arguments_strOne))[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
 	tenTwo = torch.FloatTensor(numpy.ascontiguousarray(numpy.array(PIL.Image.open(arguments_strTwo))[:, :, ::-1].transpose(2, 0, 1).astype(numpy.float32) * (1.0 / 255.0)))
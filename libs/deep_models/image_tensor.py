@@ -0,0 +1,134 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This file contains the image preprocessing shared by the deep models.
+    Images are kept as uint8 on the host, uploaded once and normalized/resized on the device.
+'''
+
+from collections import OrderedDict
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+def upload_images(imgs, device='cuda'):
+    """Upload uint8 images to the device without any host-side float conversion.
+
+    Args:
+        imgs (array/list): [HxWx3] array, [NxHxWx3] array or list of [HxWx3] arrays; uint8
+        device (str): device
+
+    Returns:
+        img_tensor (tensor, [Nx3xHxW]): uint8 images
+    """
+    if isinstance(imgs, (list, tuple)):
+        imgs = np.stack(imgs, 0)
+    elif imgs.ndim == 3:
+        imgs = imgs[None]
+    imgs = np.ascontiguousarray(imgs, dtype=np.uint8)
+
+    img_tensor = torch.from_numpy(imgs).to(device)
+    return img_tensor.permute(0, 3, 1, 2).contiguous()
+
+
+def normalize_images(img_tensor, height=None, width=None):
+    """Convert uint8 images to float images and resize them on the device.
+    Area interpolation is used for downscaling and bilinear interpolation for upscaling.
+
+    Args:
+        img_tensor (tensor, [Nx3xHxW]): uint8 images
+        height (int): output height; no resizing if None
+        width (int): output width; no resizing if None
+
+    Returns:
+        img_tensor (tensor, [Nx3xhxw]): float images; intensity [0-1]
+    """
+    assert img_tensor.dtype == torch.uint8, "Wrong image dtype [{}], uint8 images are expected".format(img_tensor.dtype)
+    img_tensor = img_tensor.float().div_(255)
+    h, w = img_tensor.shape[2:]
+    if height is None or (height, width) == (h, w):
+        return img_tensor
+
+    if height <= h and width <= w:
+        return F.interpolate(img_tensor, (height, width), mode='area')
+    else:
+        return F.interpolate(img_tensor, (height, width), mode='bilinear', align_corners=False)
+
+
+class ImageTensorCache():
+    """ImageTensorCache converts each frame once and shares the tensors among the networks.
+    The uint8 upload and the normalized tensor at every requested size are cached per frame.
+
+    Frames are identified by their data buffer (address, shape and strides), so that
+    views of a frame, e.g. img[None][0], hit the same entry.
+    The cached frames are referenced by the cache, therefore a buffer cannot be reused
+    by another frame while it is cached; frames should not be modified in place.
+    """
+    def __init__(self, size=2, device='cuda', timers=None):
+        """
+        Args:
+            size (int): number of cached frames; 2 covers the current and the reference frames
+            device (str): device
+            timers (Profiler): profiler, uploads are reported as the [H2D image] scope
+        """
+        self.size = size
+        self.device = device
+        self.timers = timers
+        self.entries = OrderedDict()
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_entry(self, img):
+        """Get the cache entry of a frame, the frame is uploaded if it is not cached
+
+        Args:
+            img (array, [HxWx3]): image; uint8
+
+        Returns:
+            entry (dict): cache entry
+                - **img** (array, [HxWx3]): image
+                - **uint8** (tensor, [1x3xHxW]): uint8 image on the device
+                - **float** (dict): normalized images, each element is **(h, w)** (tensor, [1x3xhxw])
+        """
+        key = (img.__array_interface__['data'][0], img.shape, img.strides)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        if self.timers is not None:
+            self.timers.start('H2D image')
+        entry = {
+            'img': img,
+            'uint8': upload_images(img, self.device),
+            'float': {}
+        }
+        if self.timers is not None:
+            self.timers.end('H2D image')
+        self.entries[key] = entry
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def get(self, imgs, height=None, width=None):
+        """Get normalized image tensors of the frames
+
+        Args:
+            imgs (list): list of images, each element is a [HxWx3] array
+            height (int): output height; original size if None
+            width (int): output width; original size if None
+
+        Returns:
+            img_tensor (tensor, [Nx3xhxw]): float images; intensity [0-1]
+        """
+        img_tensors = []
+        for img in imgs:
+            entry = self.get_entry(img)
+            h, w = (height, width) if height is not None else img.shape[:2]
+            if (h, w) not in entry['float']:
+                entry['float'][(h, w)] = normalize_images(entry['uint8'], h, w)
+            img_tensors.append(entry['float'][(h, w)])
+
+        if len(img_tensors) == 1:
+            return img_tensors[0]
+        return torch.cat(img_tensors, 0)
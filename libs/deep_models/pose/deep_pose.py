@@ -10,6 +10,8 @@
 
 import torch
 
+from libs.deep_models.precision import autocast
+
 
 class DeepPose():
     """DeepPose is the Base class for deep pose network interface
@@ -19,6 +21,10 @@ class DeepPose():
         self.device = torch.device('cuda')
         self.enable_finetune = False
 
+        # inference precision and the modules called in inference() (quantized for int8)
+        self.precision = 'fp32'
+        self.inference_modules = ['model']
+
 # ========================== Methods need to be implemented =======================
     def initialize_network_model(self, weight_path):
         """initialize network and load pretrained model
@@ -64,7 +70,9 @@ class DeepPose():
         Returns:
             pose (tensor, [Nx4x4]): relative pose from img2 to img1
         """
-        return self.inference(imgs)
+        with autocast(self.precision, self.device):
+            pose = self.inference(imgs)
+        return pose.float()
     
     def setup_train(self, deep_model, cfg):
         """Setup training configurations for online finetuning depth network
@@ -27,6 +27,7 @@ class Monodepth2PoseNet(DeepPose):
     def __init__(self, *args, **kwargs):
         super(Monodepth2PoseNet, self).__init__(*args, **kwargs)
         self.enable_finetune = False
+        self.inference_modules = ['encoder', 'pose_decoder']
     
     def initialize_network_model(self, weight_path, dataset, finetune):
         """initialize network and load pretrained model
@@ -0,0 +1,200 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This file contains the reduced-precision (fp16/bf16 autocast, int8 quantization) utilities for the deep models
+'''
+
+import contextlib
+import copy
+import torch
+import torch.nn as nn
+
+
+# precision modes
+#   - fp32: full precision
+#   - fp16/bf16: autocast on the network device (fp16 requires CUDA)
+#   - int8_static: static quantization with calibrated activation ranges on CPU
+# dynamic quantization is not provided, it only handles Linear/LSTM/GRU layers
+# and the depth/flow/pose networks are convolutional
+PRECISIONS = ['fp32', 'fp16', 'bf16', 'int8_static']
+
+# module types handled by static quantization
+# (torch.ao.quantization is imported in the quantization functions, it is not needed for fp32/fp16/bf16)
+STATIC_QUANT_MODULES = {nn.Conv2d, nn.ConvTranspose2d, nn.Linear}
+
+
+def has_modules(module, types):
+    """Check if a module contains submodules of given types
+
+    Args:
+        module (nn.Module): module
+        types (set): module types
+
+    Returns:
+        found (bool): True if a submodule is an instance of types
+    """
+    return any(isinstance(m, tuple(types)) for m in module.modules())
+
+
+def is_quantized(module):
+    """Check if a module contains quantized submodules
+
+    Args:
+        module (nn.Module): module
+
+    Returns:
+        quantized (bool): True if a submodule is a quantized module
+    """
+    return any(type(m).__module__.startswith(('torch.ao.nn.quantized', 'torch.nn.quantized'))
+               for m in module.modules())
+
+
+def autocast(precision, device):
+    """Get the autocast context of a precision mode
+
+    Args:
+        precision (str): precision mode
+        device (torch.device): device running the network
+
+    Returns:
+        context (context manager): autocast context, no-op if precision is not fp16/bf16
+    """
+    if precision == 'fp16':
+        assert device.type == 'cuda', "fp16 autocast requires CUDA, use bf16 on CPU"
+        return torch.autocast(device_type=device.type, dtype=torch.float16)
+    elif precision == 'bf16':
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    else:
+        return contextlib.nullcontext()
+
+
+def to_device(data, device):
+    """Move tensors in a (nested) list/tuple/dict to a device
+
+    Args:
+        data (tensor/list/tuple/dict): data
+        device (torch.device): target device
+
+    Returns:
+        data (tensor/list/tuple/dict): data on device
+    """
+    if isinstance(data, torch.Tensor):
+        return data.to(device)
+    elif isinstance(data, (list, tuple)):
+        return type(data)(to_device(i, device) for i in data)
+    elif isinstance(data, dict):
+        return type(data)((k, to_device(v, device)) for k, v in data.items())
+    else:
+        return data
+
+
+def find_device(data):
+    """Find the device of the first tensor in a (nested) list/tuple/dict
+
+    Args:
+        data (tensor/list/tuple/dict): data
+
+    Returns:
+        device (torch.device): device, None if data has no tensor
+    """
+    if isinstance(data, torch.Tensor):
+        return data.device
+    if isinstance(data, dict):
+        data = list(data.values())
+    if isinstance(data, (list, tuple)):
+        for i in data:
+            device = find_device(i)
+            if device is not None:
+                return device
+    return None
+
+
+class CPUModule(nn.Module):
+    """Run a (quantized) module on CPU; inputs are moved to CPU and
+    outputs are moved back to the device of the inputs
+    """
+    def __init__(self, module, prepared=False):
+        """
+        Args:
+            module (nn.Module): module running on CPU
+            prepared (bool): module is prepared for static quantization (observers inserted)
+        """
+        super(CPUModule, self).__init__()
+        self.module = module
+        self.prepared = prepared
+
+    def forward(self, *inputs):
+        device = find_device(inputs)
+        outputs = self.module(*to_device(inputs, torch.device('cpu')))
+        return to_device(outputs, device)
+
+
+class InputRecorder():
+    """Record the first inputs of the inference modules of network interfaces,
+    used as example inputs for static quantization
+    """
+    def __init__(self, nets):
+        """
+        Args:
+            nets (list): network interfaces
+        """
+        self.inputs = {}
+        self.handles = []
+        for net in nets:
+            for name in net.inference_modules:
+                module = getattr(net, name)
+                self.handles.append(module.register_forward_pre_hook(self.get_hook(module)))
+
+    def get_hook(self, module):
+        def hook(m, inputs):
+            if module not in self.inputs:
+                self.inputs[module] = to_device(inputs, torch.device('cpu'))
+        return hook
+
+    def remove(self):
+        """Remove the hooks
+        """
+        for handle in self.handles:
+            handle.remove()
+
+
+def prepare_static_net(net, recorder):
+    """Insert observers into the inference modules of a network interface for static int8 quantization.
+    Modules that cannot be symbolically traced are rejected.
+
+    Args:
+        net (DeepFlow/DeepDepth/DeepPose): network interface
+        recorder (InputRecorder): recorder with the example inputs of the modules
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    for name in net.inference_modules:
+        module = getattr(net, name)
+        assert module in recorder.inputs, "No example inputs are recorded for [{}]".format(name)
+        assert has_modules(module, STATIC_QUANT_MODULES), \
+            "[{}.{}] has no Conv/Linear layer for int8_static quantization".format(type(net).__name__, name)
+        example_inputs = recorder.inputs[module]
+        module = copy.deepcopy(module).cpu().eval()
+        try:
+            prepared = prepare_fx(module, qconfig_mapping, example_inputs)
+        except Exception as e:
+            assert False, "[{}.{}] cannot be symbolically traced for int8_static quantization ({}: {})".format(
+                type(net).__name__, name, type(e).__name__, e)
+        setattr(net, name, CPUModule(prepared, prepared=True))
+
+
+def convert_static_net(net):
+    """Convert calibrated modules of a network interface to int8 modules
+
+    Args:
+        net (DeepFlow/DeepDepth/DeepPose): network interface
+    """
+    from torch.ao.quantization.quantize_fx import convert_fx
+    for name in net.inference_modules:
+        module = getattr(net, name)
+        if module.prepared:
+            converted = convert_fx(module.module)
+            assert is_quantized(converted), \
+                "[{}.{}] has no quantized layer after int8_static conversion".format(type(net).__name__, name)
+            setattr(net, name, CPUModule(converted))
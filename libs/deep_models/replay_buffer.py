@@ -0,0 +1,67 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This file contains the replay buffer of frame pairs for online finetuning
+'''
+
+import numpy as np
+
+
+class ReplayBuffer():
+    """ReplayBuffer keeps the most recent frame pairs and relative poses for online finetuning.
+    Samples are stored compactly in preallocated arrays (uint8 images, float32 poses);
+    the oldest sample is overwritten when the buffer is full.
+    """
+    def __init__(self, size, seed=0):
+        """
+        Args:
+            size (int): maximum number of samples
+            seed (int): seed of the sampling, independent of the global random state
+        """
+        self.size = size
+        self.rng = np.random.RandomState(seed)
+        self.num_added = 0
+        self.img1 = None
+        self.img2 = None
+        self.pose = None
+
+    def __len__(self):
+        return min(self.num_added, self.size)
+
+    def add(self, img1, img2, pose):
+        """Add a sample
+
+        Args:
+            img1 (array, [HxWx3]): image 1 (reference)
+            img2 (array, [HxWx3]): image 2 (current)
+            pose (array, [4x4]): relative pose from view-2 to view-1
+        """
+        if self.img1 is None:
+            self.img1 = np.empty((self.size,) + img1.shape, dtype=np.uint8)
+            self.img2 = np.empty((self.size,) + img2.shape, dtype=np.uint8)
+            self.pose = np.empty((self.size, 4, 4), dtype=np.float32)
+
+        idx = self.num_added % self.size
+        self.img1[idx] = img1
+        self.img2[idx] = img2
+        self.pose[idx] = pose
+        self.num_added += 1
+
+    def sample(self, batch_size):
+        """Draw a mini-batch of distinct samples; the latest sample is always included
+
+        Args:
+            batch_size (int): batch size; limited by the number of stored samples
+
+        Returns:
+            a tuple containing
+                - **img1** (array, [NxHxWx3]) : images 1
+                - **img2** (array, [NxHxWx3]) : images 2
+                - **pose** (array, [Nx4x4]) : relative poses from view-2 to view-1
+        """
+        latest = (self.num_added - 1) % self.size
+        others = np.delete(np.arange(len(self)), latest)
+        batch_size = min(batch_size, len(self))
+        idxs = self.rng.choice(others, batch_size - 1, replace=False)
+        idxs = np.sort(np.append(idxs, latest))
+        return self.img1[idxs], self.img2[idxs], self.pose[idxs].copy()
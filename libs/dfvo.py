@@ -12,7 +12,6 @@ import cv2
 import copy
 from glob import glob
 import math
-from matplotlib import pyplot as plt
 import numpy as np
 import os
 from time import time
@@ -21,11 +20,16 @@ from tqdm import tqdm
 from libs.geometry.camera_modules import SE3
 import libs.datasets as Dataset
 from libs.deep_models.deep_models import DeepModel
+from libs.general.frame_data import FrameData
 from libs.general.frame_drawer import FrameDrawer
-from libs.general.timer import Timer
+from libs.general.frame_tensors import FrameTensors
+from libs.general.memory_profiler import MemoryProfiler
+from libs.general.profiler import Profiler
+from libs.general.realtime_scheduler import RealtimeScheduler
 from libs.matching.keypoint_sampler import KeypointSampler
 from libs.matching.depth_consistency import DepthConsistency
 from libs.tracker import EssTracker, PnpTracker
+from libs.tracker.keyframe_selector import KeyframeSelector
 from libs.general.utils import *
 
 
@@ -52,7 +56,8 @@ class DFVO():
     def setup(self):
         """Reading configuration and setup, including
 
-            - Timer
+            - Profiler
+            - Memory profiler
             - Dataset
             - Tracking method
             - Keypoint Sampler
@@ -60,8 +65,11 @@ class DFVO():
             - Deep layers
             - Visualizer
         """
-        # timer
-        self.timers = Timer()
+        # profiler
+        self.timers = Profiler(self.cfg.profiler)
+
+        # memory profiler
+        self.memory_profiler = MemoryProfiler(self.cfg.memory_profiler)
 
         # intialize dataset
         self.dataset = Dataset.datasets[self.cfg.dataset](self.cfg)
@@ -71,13 +79,15 @@ class DFVO():
         self.initialize_tracker()
 
         # initialize keypoint sampler
-        self.kp_sampler = KeypointSampler(self.cfg)
+        self.kp_sampler = KeypointSampler(self.cfg, self.timers)
         
         # Deep networks
-        self.deep_models = DeepModel(self.cfg)
+        self.deep_models = DeepModel(self.cfg, self.timers)
         self.deep_models.initialize_models()
         if self.cfg.online_finetune.enable:
             self.deep_models.setup_train()
+        if self.cfg.deep_runtime.precision != 'fp32':
+            self.deep_models.initialize_precision(self.dataset)
         
         # Depth consistency
         if self.cfg.kp_selection.depth_consistency.enable:
@@ -85,21 +95,24 @@ class DFVO():
 
         # visualization interface
         self.drawer = FrameDrawer(self.cfg.visualization)
+
+        # keyframe selection
+        self.keyframe_selector = KeyframeSelector(self.cfg.keyframe)
         
     def initialize_data(self):
         """initialize data of current view and reference view
         """
-        self.ref_data = {}
-        self.cur_data = {}
+        self.ref_data = FrameData()
+        self.cur_data = FrameData()
 
     def initialize_tracker(self):
         """Initialize tracker
         """
         if self.tracking_method == 'hybrid':
             self.e_tracker = EssTracker(self.cfg, self.dataset.cam_intrinsics, self.timers)
-            self.pnp_tracker = PnpTracker(self.cfg, self.dataset.cam_intrinsics)
+            self.pnp_tracker = PnpTracker(self.cfg, self.dataset.cam_intrinsics, self.timers)
         elif self.tracking_method == 'PnP':
-            self.pnp_tracker = PnpTracker(self.cfg, self.dataset.cam_intrinsics)
+            self.pnp_tracker = PnpTracker(self.cfg, self.dataset.cam_intrinsics, self.timers)
         elif self.tracking_method == 'deep_pose':
             return
         else:
@@ -117,6 +130,25 @@ class DFVO():
         self.cur_data['pose'].R = self.cur_data['pose'].R @ new_pose.R
         self.global_poses[self.cur_data['id']] = copy.deepcopy(self.cur_data['pose'])
 
+    def update_keyframe(self):
+        """Interpolate the poses of the frames skipped since the last keyframe,
+        and set the current frame as the keyframe
+        """
+        cur_id = self.cur_data['id']
+        if self.keyframe_selector.skipped:
+            # keep the global poses in the order of frame indexes
+            cur_pose = self.global_poses.pop(cur_id)
+            self.global_poses.update(
+                self.keyframe_selector.interpolate_skipped_poses(cur_pose, cur_id, self.cur_data['timestamp']))
+            self.global_poses[cur_id] = cur_pose
+
+        if self.tracking_stage >= 1 and self.cfg.keyframe.enable and self.cfg.keyframe.method == 'motion':
+            self.keyframe_selector.update_motion(self.ref_data.get('flow'),
+                                                 cur_id - self.keyframe_selector.keyframe['id'])
+
+        self.keyframe_selector.set_keyframe(self.cur_data['img'], cur_id,
+                                            self.cur_data['timestamp'], self.cur_data['pose'])
+
     def tracking(self):
         """Tracking using both Essential matrix and PnP
         Essential matrix for rotation and translation direction;
@@ -141,10 +173,12 @@ class DFVO():
                     self.depth_consistency_computer.compute(self.cur_data, self.ref_data)
 
                 # kp_selection
-                self.timers.start('kp_sel', 'tracking')
+                self.timers.start('kp_sel')
                 kp_sel_outputs = self.kp_sampler.kp_selection(self.cur_data, self.ref_data)
                 if kp_sel_outputs['good_kp_found']:
                     self.kp_sampler.update_kp_data(self.cur_data, self.ref_data, kp_sel_outputs)
+                    if self.cfg.deep_flow.kp_refinement.enable:
+                        self.kp_sampler.refine_kp(self.cur_data, self.ref_data)
                 self.timers.end('kp_sel')
 
             ''' Pose estimation '''
@@ -162,7 +196,7 @@ class DFVO():
             ''' E-tracker '''
             if self.tracking_method in ['hybrid']:
                 # Essential matrix pose
-                self.timers.start('E-tracker', 'tracking')
+                self.timers.start('E-tracker')
                 e_tracker_outputs = self.e_tracker.compute_pose_2d2d(
                                 self.ref_data[self.cfg.e_tracker.kp_src],
                                 self.cur_data[self.cfg.e_tracker.kp_src],
@@ -178,7 +212,7 @@ class DFVO():
 
                 # scale recovery
                 if np.linalg.norm(E_pose.t) != 0:
-                    self.timers.start('scale_recovery', 'tracking')
+                    self.timers.start('scale_recovery')
                     scale_out = self.e_tracker.scale_recovery(self.cur_data, self.ref_data, E_pose, False)
                     scale = scale_out['scale']
                     if self.cfg.scale_recovery.kp_src == 'kp_depth':
@@ -191,7 +225,7 @@ class DFVO():
 
                 # Iterative keypoint refinement
                 if np.linalg.norm(E_pose.t) != 0 and self.cfg.e_tracker.iterative_kp.enable:
-                    self.timers.start('E-tracker iter.', 'tracking')
+                    self.timers.start('E-tracker iter.')
                     # Compute refined keypoint
                     self.e_tracker.compute_rigid_flow_kp(self.cur_data,
                                                          self.ref_data,
@@ -223,7 +257,7 @@ class DFVO():
             if self.tracking_method in ['PnP', 'hybrid']:
                 # PnP if Essential matrix fail
                 if np.linalg.norm(E_pose.t) == 0 or scale == -1:
-                    self.timers.start('pnp', 'tracking')
+                    self.timers.start('pnp')
                     pnp_outputs = self.pnp_tracker.compute_pose_3d2d(
                                     self.ref_data[self.cfg.pnp_tracker.kp_src],
                                     self.cur_data[self.cfg.pnp_tracker.kp_src],
@@ -260,27 +294,25 @@ class DFVO():
             self.update_global_pose(pose, 1)
 
     def update_data(self, ref_data, cur_data):
-        """Update data
-        
+        """Update data; the current data is moved to the reference view and the
+        records are reused for the next frame
+
         Args:
-            ref_data (dict): reference data
-            cur_data (dict): current data
+            ref_data (FrameData): reference data
+            cur_data (FrameData): current data
         
         Returns:
-            ref_data (dict): updated reference data
-            cur_data (dict): updated current data
+            ref_data (FrameData): updated reference data
+            cur_data (FrameData): updated current data
         """
-        for key in cur_data:
-            if key == "id":
-                ref_data['id'] = cur_data['id']
-            else:
-                if ref_data.get(key, -1) is -1:
-                    ref_data[key] = {}
-                ref_data[key] = cur_data[key]
-        
-        # Delete unused flow to avoid data leakage
+        # the constant motion is kept until the next tracked pair
+        cur_data.transfer(ref_data, keep=['motion'])
+
+        # the global pose is accumulated by the next frame
+        cur_data['pose'] = copy.deepcopy(ref_data['pose'])
+
+        # backward flow is not used by the reference view
         ref_data['flow'] = None
-        cur_data['flow'] = None
         ref_data['flow_diff'] = None
         return ref_data, cur_data
 
@@ -301,10 +333,11 @@ class DFVO():
         if self.tracking_method in ['hybrid', 'PnP']:
             # Single-view Depth prediction
             if self.dataset.data_dir['depth_src'] is None:
-                self.timers.start('depth_cnn', 'deep inference')
+                self.timers.start('depth_cnn')
 
-                if self.tracking_stage > 0 and \
-                    self.cfg.online_finetune.enable and self.cfg.online_finetune.depth.enable:
+                # synchronous per-frame depth finetuning trains with the depths of both views
+                if self.tracking_stage > 0 and self.deep_models.inference_grad and \
+                    self.cfg.online_finetune.depth.enable:
                         img_list = [self.cur_data['img'], self.ref_data['img']]
                 else:
                     img_list = [self.cur_data['img']]
@@ -324,23 +357,24 @@ class DFVO():
 
             # Two-view flow
             if self.tracking_stage >= 1:
-                self.timers.start('flow_cnn', 'deep inference')
+                self.timers.start('flow_cnn')
                 flows = self.deep_models.forward_flow(
                                         self.cur_data,
                                         self.ref_data,
                                         forward_backward=self.cfg.deep_flow.forward_backward)
                 
                 # Store flow
-                self.ref_data['flow'] = flows[(self.ref_data['id'], self.cur_data['id'])].copy()
+                # (the device copy of the flow in the frame tensors is moved to the frame buffer)
+                self.ref_data['flow'] = flows[(self.ref_data['id'], self.cur_data['id'])]
                 if self.cfg.deep_flow.forward_backward:
-                    self.cur_data['flow'] = flows[(self.cur_data['id'], self.ref_data['id'])].copy()
-                    self.ref_data['flow_diff'] = flows[(self.ref_data['id'], self.cur_data['id'], "diff")].copy()
+                    self.cur_data['flow'] = flows[(self.cur_data['id'], self.ref_data['id'])]
+                    self.ref_data['flow_diff'] = flows[(self.ref_data['id'], self.cur_data['id'], "diff")]
                 
                 self.timers.end('flow_cnn')
             
         # Relative camera pose
         if self.tracking_stage >= 1 and self.cfg.deep_pose.enable:
-            self.timers.start('pose_cnn', 'deep inference')
+            self.timers.start('pose_cnn')
             # Deep pose prediction
             pose = self.deep_models.forward_pose(
                         [self.ref_data['img'], self.cur_data['img']] 
@@ -348,6 +382,83 @@ class DFVO():
             self.ref_data['deep_pose'] = pose # from cur->ref
             self.timers.end('pose_cnn')
 
+    def process_frame(self, img_id):
+        """Run DF-VO on a frame, including data loading, deep model inferences,
+        tracking, (optional) online finetuning and visualization
+
+        Args:
+            img_id (int): frame index in the dataset
+        """
+        self.timers.new_frame(img_id)
+        self.memory_profiler.new_frame(img_id)
+        self.timers.start('DF-VO')
+        self.tracking_mode = "Ess. Mat."
+
+        """ Data reading """
+        # Initialize ids and timestamps
+        self.cur_data['id'] = img_id
+        self.cur_data['timestamp'] = self.dataset.get_timestamp(img_id)
+
+        # Read image data and (optional) precomputed depth data
+        self.timers.start('data_loading')
+        self.load_raw_data()
+        self.timers.end('data_loading')
+        self.memory_profiler.record('data_loading')
+
+        # Keyframe selection; non-keyframes skip inference, tracking and finetuning,
+        # their poses are interpolated when the next keyframe is tracked
+        if self.cfg.keyframe.enable:
+            self.timers.start('keyframe_sel')
+            is_last = img_id + self.cfg.frame_step >= len(self.dataset)
+            is_keyframe = self.keyframe_selector.is_keyframe(self.cur_data['img'], img_id, is_last)
+            self.timers.end('keyframe_sel')
+            if not is_keyframe:
+                self.keyframe_selector.skip(img_id, self.cur_data['timestamp'])
+                self.timers.end('DF-VO')
+                return
+
+        # device tensors of the frame, created on first use
+        self.cur_data['tensors'] = FrameTensors(self.deep_models.device, self.timers)
+
+        # Deep model inferences
+        self.timers.start('deep_inference')
+        self.deep_model_inference()
+        self.timers.end('deep_inference')
+        self.memory_profiler.record('deep_inference')
+
+        """ Visual odometry """
+        self.timers.start('tracking')
+        self.tracking()
+        self.update_keyframe()
+        self.timers.end('tracking')
+        self.memory_profiler.record('tracking')
+
+        """ Online Finetuning """
+        if self.tracking_stage >= 1 and self.cfg.online_finetune.enable:
+            self.deep_models.finetune(self.ref_data['img'], self.cur_data['img'],
+                                  self.ref_data['pose'].pose,
+                                  self.dataset.cam_intrinsics.mat,
+                                  self.dataset.cam_intrinsics.inv_mat)
+            self.memory_profiler.record('online_finetune')
+
+        """ Visualization """
+        if self.cfg.visualization.enable:
+            self.timers.start('visualization')
+            self.drawer.main(self)
+            self.timers.end('visualization')
+            self.memory_profiler.record('visualization')
+
+        """ Update reference and current data """
+        self.ref_data, self.cur_data = self.update_data(
+                                self.ref_data,
+                                self.cur_data,
+        )
+        self.memory_profiler.record('update_data')
+
+        self.tracking_stage += 1
+
+        self.timers.end('DF-VO')
+
     def main(self):
         """Main program
         """
@@ -359,52 +470,21 @@ class DFVO():
         else:
             start_frame = int(input("Start with frame: "))
 
-        for img_id in tqdm(range(start_frame, len(self.dataset), self.cfg.frame_step)):
-            self.timers.start('DF-VO')
-            self.tracking_mode = "Ess. Mat."
-
-            """ Data reading """
-            # Initialize ids and timestamps
-            self.cur_data['id'] = img_id
-            self.cur_data['timestamp'] = self.dataset.get_timestamp(img_id)
-
-            # Read image data and (optional) precomputed depth data
-            self.timers.start('data_loading')
-            self.load_raw_data()
-            self.timers.end('data_loading')
-
-            # Deep model inferences
-            self.timers.start('deep_inference')
-            self.deep_model_inference()
-            self.timers.end('deep_inference')
-
-            """ Visual odometry """
-            self.timers.start('tracking')
-            self.tracking()
-            self.timers.end('tracking')
-
-            """ Online Finetuning """
-            if self.tracking_stage >= 1 and self.cfg.online_finetune.enable:
-                self.deep_models.finetune(self.ref_data['img'], self.cur_data['img'],
-                                      self.ref_data['pose'].pose,
-                                      self.dataset.cam_intrinsics.mat,
-                                      self.dataset.cam_intrinsics.inv_mat)
-
-            """ Visualization """
-            if self.cfg.visualization.enable:
-                self.timers.start('visualization')
-                self.drawer.main(self)
-                self.timers.end('visualization')
-
-            """ Update reference and current data """
-            self.ref_data, self.cur_data = self.update_data(
-                                    self.ref_data,
-                                    self.cur_data,
-            )
-
-            self.tracking_stage += 1
-
-            self.timers.end('DF-VO')
+        frame_ids = list(range(start_frame, len(self.dataset), self.cfg.frame_step))
+        if self.cfg.realtime.enable:
+            # frames are consumed at their arrival times; late frames are dropped/merged
+            scheduler = RealtimeScheduler(
+                            self.cfg.realtime,
+                            frame_ids,
+                            self.dataset.get_timestamps(frame_ids))
+            scheduler.run(self.process_frame, self.keyframe_selector.skip)
+        else:
+            for img_id in tqdm(frame_ids):
+                self.process_frame(img_id)
+
+        # finish (asynchronous) online finetuning
+        if self.cfg.online_finetune.enable:
+            self.deep_models.stop_finetune()
 
         print("=> Finish!")
 
@@ -427,3 +507,21 @@ class DFVO():
 
         # Output experiement information
         self.timers.time_analysis()
+        if self.cfg.realtime.enable:
+            scheduler.summary()
+        self.memory_profiler.memory_analysis()
+
+        # Export profiling records
+        if self.cfg.profiler.enable:
+            if self.cfg.profiler.trace_file is not None:
+                trace_file = os.path.join(self.cfg.directory.result_dir, self.cfg.profiler.trace_file)
+                self.timers.export_chrome_trace(trace_file)
+                print("Save profiling trace in [{}].".format(trace_file))
+            if self.cfg.profiler.csv_file is not None:
+                csv_file = os.path.join(self.cfg.directory.result_dir, self.cfg.profiler.csv_file)
+                self.timers.export_csv(csv_file)
+                print("Save profiling records in [{}].".format(csv_file))
+        if self.cfg.memory_profiler.enable and self.cfg.memory_profiler.csv_file is not None:
+            csv_file = os.path.join(self.cfg.directory.result_dir, self.cfg.memory_profiler.csv_file)
+            self.memory_profiler.export_csv(csv_file)
+            print("Save memory records in [{}].".format(csv_file))
@@ -0,0 +1,104 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: BufferPool recycles per-frame dense arrays and keeps constant arrays built once per resolution
+'''
+
+from contextlib import contextmanager
+import numpy as np
+import threading
+
+
+class BufferPool():
+    """BufferPool keeps released arrays by (shape, dtype), so that per-frame temporaries,
+    e.g. dense keypoint maps and triangulated depth maps, are allocated once and reused
+    in the following frames.
+
+    Constant arrays (image grids, crop masks) are built once per key and shared read-only.
+    """
+    def __init__(self, max_per_key=4):
+        """
+        Args:
+            max_per_key (int): maximum number of released buffers kept per (shape, dtype)
+        """
+        self.max_per_key = max_per_key
+        self.buffers = {}
+        self.constants = {}
+        self.lock = threading.Lock()
+
+    def borrow(self, shape, dtype=np.float32, zero=False):
+        """Borrow a buffer; it is allocated if no released buffer fits
+
+        Args:
+            shape (tuple): buffer shape
+            dtype (type): buffer dtype
+            zero (bool): fill the buffer with zeros
+
+        Returns:
+            buf (array): buffer; its content is undefined unless zero is True
+        """
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            released = self.buffers.get(key)
+            buf = released.pop() if released else None
+        if buf is None:
+            return np.zeros(shape, dtype) if zero else np.empty(shape, dtype)
+        if zero:
+            buf.fill(0)
+        return buf
+
+    def release(self, buf):
+        """Return a borrowed buffer to the pool; it must not be used afterwards
+
+        Args:
+            buf (array): buffer from borrow()
+        """
+        key = (buf.shape, buf.dtype)
+        with self.lock:
+            released = self.buffers.setdefault(key, [])
+            if len(released) < self.max_per_key:
+                released.append(buf)
+
+    @contextmanager
+    def buffer(self, shape, dtype=np.float32, zero=False):
+        """Context manager borrowing a buffer and releasing it at exit
+
+        Args:
+            shape (tuple): buffer shape
+            dtype (type): buffer dtype
+            zero (bool): fill the buffer with zeros
+        """
+        buf = self.borrow(shape, dtype, zero)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+    def constant(self, key, builder):
+        """Get a constant array, which is built on first use and read-only
+
+        Args:
+            key (tuple): hashable key, e.g. (name, height, width)
+            builder (function): function building the array, builder()
+
+        Returns:
+            array (array): read-only constant array
+        """
+        array = self.constants.get(key)
+        if array is None:
+            array = builder()
+            array.setflags(write=False)
+            with self.lock:
+                array = self.constants.setdefault(key, array)
+        return array
+
+    def clear(self):
+        """Release all the buffers and constants
+        """
+        with self.lock:
+            self.buffers.clear()
+            self.constants.clear()
+
+
+# pool shared by the per-frame operations
+buffer_pool = BufferPool()
@@ -0,0 +1,163 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: FrameData is the typed record of the data of a frame (current/reference view)
+'''
+
+import numpy as np
+
+
+# fields of a frame and the dtype of their arrays; arrays are cast when assigned, None for other data
+FIELDS = {
+    # frame
+    'id': None,                     # (int) frame index
+    'timestamp': None,              # (float) frame timestamp
+    'img': np.uint8,                # (array, [HxWx3]) RGB image
+    'tensors': None,                # (FrameTensors) device copies of the frame data
+
+    # depth
+    'raw_depth': np.float32,        # (array, [HxW]) GT/precomputed/predicted depth
+    'depth': np.float32,            # (array, [HxW]) depth after cropping and capping range
+
+    # flow
+    'flow': np.float32,             # (array, [2xHxW]) optical flow to the other view
+    'flow_diff': np.float32,        # (array, [HxWx1]) forward-backward flow inconsistency
+    'fb_flow_mask': np.float32,     # (array, [HxW]) forward-backward flow inconsistency of the keypoints
+
+    # keypoints
+    'kp_best': np.float32,          # (array, [Nx2]) best-N keypoints
+    'kp_list': np.float32,          # (array, [Nx2]) uniformly sampled keypoints
+    'kp_depth': np.float32,         # (array, [Nx2]) keypoints with good depth
+    'kp_depth_uniform': np.float32, # (array, [Nx2]) uniformly sampled keypoints with good depth
+    'inliers': None,                # (array, [Nx1]) inlier mask of the essential matrix
+
+    # rigid flow / depth consistency
+    'rigid_flow_pose': None,        # (SE3) pose used for the rigid flow
+    'rigid_flow_diff': np.float32,  # (array, [HxWx1]) rigid-optical flow inconsistency
+    'rigid_flow_mask': np.float32,  # (array, [HxW]) rigid-optical flow inconsistency of the keypoints
+    'depth_diff': np.float32,       # (array, [HxW]) depth inconsistency
+
+    # poses
+    'pose': None,                   # (SE3) global pose (current view) / relative pose to the current view (reference view)
+    'motion': None,                 # (SE3) relative pose of the last tracked frame pair, for constant motion
+    'deep_pose': None,              # (array, [4x4]) relative pose predicted by the pose network
+}
+
+# dense fields with a fixed shape per sequence; they are written into buffers owned by the record.
+# Images are not included, they are decoded into new arrays and the image tensor cache
+# (ImageTensorCache) identifies a frame by its buffer address.
+BUFFERED_FIELDS = ['raw_depth', 'depth', 'flow', 'flow_diff', 'rigid_flow_diff', 'depth_diff']
+
+
+class FrameData():
+    """FrameData holds the data of a frame in a fixed set of fields (see FIELDS).
+    Arrays are stored with explicit dtypes (uint8 images, float32 depths/flows/keypoints/masks);
+    assigning an unknown field is an error, and an unset field is None.
+
+    The dict-style interface (data['depth'], data.get('depth'), 'depth' in data) is kept
+    for the consumers of the frame data.
+
+    Arrays of the dense fields (see BUFFERED_FIELDS) are copied into buffers owned by the record,
+    which are allocated once and reused by the following frames (reallocated if the shape changes).
+    """
+    __slots__ = tuple(FIELDS) + ('buffers',)
+
+    def __init__(self):
+        object.__setattr__(self, 'buffers', {})
+        self.clear()
+
+    def clear(self):
+        """Unset all the fields; the buffers are kept for reuse
+        """
+        for name in FIELDS:
+            object.__setattr__(self, name, None)
+
+    def __setattr__(self, name, value):
+        dtype = FIELDS.get(name, -1)
+        assert dtype != -1, "Unknown frame data field [{}].".format(name)
+        if name in BUFFERED_FIELDS and isinstance(value, np.ndarray):
+            value = self.write_buffer(name, value)
+        elif dtype is not None and isinstance(value, np.ndarray) and value.dtype != dtype:
+            value = value.astype(dtype)
+        object.__setattr__(self, name, value)
+
+    def get_buffer(self, name, shape):
+        """Get the buffer of a field, e.g. as the output array of a computation;
+        the field is not set, assign the buffer to set it
+
+        Args:
+            name (str): field name, one of BUFFERED_FIELDS
+            shape (tuple): data shape; the buffer is reallocated if its shape differs
+
+        Returns:
+            buffer (array): buffer of the field; its content is undefined
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape):
+            buffer = np.empty(shape, dtype=FIELDS[name])
+            self.buffers[name] = buffer
+        return buffer
+
+    def write_buffer(self, name, value):
+        """Copy an array into the buffer of a field; the device copy of the array
+        in the frame tensors (if any) is moved to the buffer
+
+        Args:
+            name (str): field name
+            value (array): data
+
+        Returns:
+            buffer (array): buffer of the field holding the data
+        """
+        buffer = self.get_buffer(name, value.shape)
+        if value is not buffer:
+            np.copyto(buffer, value, casting='unsafe')
+            if self.tensors is not None:
+                self.tensors.rebind(name, value, buffer)
+        return buffer
+
+    def __getitem__(self, name):
+        assert name in FIELDS, "Unknown frame data field [{}].".format(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return name in FIELDS and getattr(self, name) is not None
+
+    def get(self, name, default=None):
+        """Get a field; default if the field is unset
+
+        Args:
+            name (str): field name
+            default: default value
+        """
+        value = getattr(self, name, None) if name in FIELDS else None
+        return default if value is None else value
+
+    def keys(self):
+        """Names of the set fields
+        """
+        return [name for name in FIELDS if getattr(self, name) is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def transfer(self, dst, keep=()):
+        """Move the data of this frame to another record; this record is then cleared.
+        The buffers of the two records are swapped, not shared, so that the two records
+        never alias each other and this record reuses the released buffers of dst.
+
+        Args:
+            dst (FrameData): destination record; its data is released except the kept fields
+            keep (list): fields of dst which are kept if this record does not set them
+        """
+        for name in FIELDS:
+            value = getattr(self, name)
+            if value is not None or name not in keep:
+                object.__setattr__(dst, name, value)
+        buffers = self.buffers
+        object.__setattr__(self, 'buffers', dst.buffers)
+        object.__setattr__(dst, 'buffers', buffers)
+        self.clear()
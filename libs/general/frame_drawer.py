@@ -9,7 +9,6 @@
 '''
 
 import cv2
-import matplotlib as mpl
 import numpy as np
 import os
 
@@ -17,6 +16,22 @@ from libs.general.utils import mkdir_if_not_exists
 from libs.flowlib.flowlib import flow_to_image
 
 
+def get_colormap_mapper(vmax, cmap):
+    """Get a scalar mapper for colorizing a map with a matplotlib colormap.
+    matplotlib is imported here since it is slow to import and only needed for visualization.
+
+    Args:
+        vmax (float): maximum value of the normalization; minimum value is 0
+        cmap (str): colormap name
+
+    Returns:
+        mapper (ScalarMappable): scalar mapper
+    """
+    import matplotlib as mpl
+    normalizer = mpl.colors.Normalize(vmin=0, vmax=vmax)
+    return mpl.cm.ScalarMappable(norm=normalizer, cmap=cmap)
+
+
 def draw_match_temporal(img1, kp1, img2, kp2, N):
     """Draw matches defined by kp1, kp2. Lay the matches on img2.
 
@@ -382,8 +397,7 @@ class FrameDrawer():
                 vis_depth = 1/(tmp_vis_depth+1e-3)
                 # vis_depth = tmp_vis_depth
                 vmax = vis_depth.max()
-                normalizer = mpl.colors.Normalize(vmin=0, vmax=vmax)
-                mapper = mpl.cm.ScalarMappable(norm=normalizer, cmap='magma')
+                mapper = get_colormap_mapper(vmax, 'magma')
                 colormapped_im = (mapper.to_rgba(vis_depth)[:, :, :3] * 255).astype(np.uint8)
 
             # get inlier
@@ -425,8 +439,7 @@ class FrameDrawer():
             # visualize depth
             if vo.cfg.visualization.depth.depth_disp == 'depth':
                 vis_depth = tmp_vis_depth
-                normalizer = mpl.colors.Normalize(vmin=0, vmax=vo.cfg.depth.max_depth)
-                mapper = mpl.cm.ScalarMappable(norm=normalizer, cmap='magma')
+                mapper = get_colormap_mapper(vo.cfg.depth.max_depth, 'magma')
                 colormapped_im = (mapper.to_rgba(vis_depth)[:, :, :3] * 255).astype(np.uint8)
                 self.update_data("depth", colormapped_im)
             
@@ -435,8 +448,7 @@ class FrameDrawer():
                 vis_depth = 1 / (tmp_vis_depth+1e-3)
                 vis_depth[tmp_vis_depth==0] = 0
                 vmax = np.percentile(vis_depth, 90)
-                normalizer = mpl.colors.Normalize(vmin=0, vmax=vmax)
-                mapper = mpl.cm.ScalarMappable(norm=normalizer, cmap='magma')
+                mapper = get_colormap_mapper(vmax, 'magma')
                 colormapped_im = (mapper.to_rgba(vis_depth)[:, :, :3] * 255).astype(np.uint8)
                 self.update_data("depth", colormapped_im)
         else:
@@ -474,8 +486,7 @@ class FrameDrawer():
         else:
             vmax = 1
         
-        normalizer = mpl.colors.Normalize(vmin=0, vmax=vmax)
-        mapper = mpl.cm.ScalarMappable(norm=normalizer, cmap='jet')
+        mapper = get_colormap_mapper(vmax, 'jet')
         mask = vo.cur_data['fb_flow_mask']
         colormapped_im = (mapper.to_rgba(mask)[:, :, :3] * 255).astype(np.uint8)
         self.update_data("opt_flow_diff", colormapped_im)
@@ -489,8 +500,7 @@ class FrameDrawer():
         # set vmax for different score method
         vmax = 1
         
-        normalizer = mpl.colors.Normalize(vmin=0, vmax=vmax)
-        mapper = mpl.cm.ScalarMappable(norm=normalizer, cmap='jet')
+        mapper = get_colormap_mapper(vmax, 'jet')
         mask = vo.deep_models.depth.warp_diff
         colormapped_im = (mapper.to_rgba(mask)[:, :, :3] * 255).astype(np.uint8)
         self.update_data("warp_diff", colormapped_im)
@@ -505,8 +515,7 @@ class FrameDrawer():
         if vo.cur_data.get('rigid_flow_mask', -1) is -1: return
         
         vmax = vo.cfg.kp_selection.rigid_flow_kp.rigid_flow_thre
-        normalizer = mpl.colors.Normalize(vmin=0, vmax=vmax)
-        mapper = mpl.cm.ScalarMappable(norm=normalizer, cmap='jet')
+        mapper = get_colormap_mapper(vmax, 'jet')
         mask = vo.cur_data['rigid_flow_mask']
         colormapped_im = (mapper.to_rgba(mask)[:, :, :3] * 255).astype(np.uint8)
         self.update_data("rigid_flow_diff", colormapped_im)
@@ -0,0 +1,123 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: FrameTensors keeps the device-resident tensors of a frame; host-device transfers are timed
+'''
+
+import numpy as np
+import torch
+
+
+def to_device(array, device, timers=None, name='array'):
+    """Copy an array to the device as a float tensor; the transfer is reported as the [H2D name] scope
+
+    Args:
+        array (array): data
+        device (torch.device): device
+        timers (Profiler): profiler
+        name (str): data name
+
+    Returns:
+        tensor (tensor): float tensor with the shape of array
+    """
+    if timers is not None:
+        timers.start('H2D {}'.format(name))
+    tensor = torch.from_numpy(np.ascontiguousarray(array)).to(device).float()
+    if timers is not None:
+        timers.end('H2D {}'.format(name))
+    return tensor
+
+
+def to_numpy(tensor, timers=None, name='tensor', out=None):
+    """Copy a tensor to the host; the transfer is reported as the [D2H name] scope
+
+    Args:
+        tensor (tensor): data
+        timers (Profiler): profiler
+        name (str): data name
+        out (array): (optional) host array with the shape of tensor the data is copied into
+
+    Returns:
+        array (array): data; out if given
+    """
+    if timers is not None:
+        timers.start('D2H {}'.format(name))
+    if out is None:
+        array = tensor.detach().cpu().numpy()
+    else:
+        torch.from_numpy(out).copy_(tensor.detach())
+        array = out
+    if timers is not None:
+        timers.end('D2H {}'.format(name))
+    return array
+
+
+class FrameTensors():
+    """FrameTensors holds device-resident copies of the data of a frame, e.g. depth, flow and pose.
+    A copy is created lazily and at most once while the frame data (array object) is unchanged,
+    so that the consumers within a frame (trackers, depth consistency, etc.) share the transfers.
+    The context moves with the frame data, i.e. from cur_data to ref_data.
+    """
+    def __init__(self, device, timers=None):
+        """
+        Args:
+            device (torch.device): device
+            timers (Profiler): profiler, transfers are reported as [H2D/D2H name] scopes
+        """
+        self.device = torch.device(device)
+        self.timers = timers
+        self.tensors = {}
+
+    def get(self, name, array):
+        """Get the device copy of frame data
+
+        Args:
+            name (str): data name, e.g. raw_depth
+            array (array): frame data
+
+        Returns:
+            tensor (tensor): float tensor with the shape of array
+        """
+        entry = self.tensors.get(name)
+        if entry is None or entry[0] is not array:
+            entry = (array, to_device(array, self.device, self.timers, name))
+            self.tensors[name] = entry
+        return entry[1]
+
+    def put(self, name, array, tensor):
+        """Register a tensor which is already on the device (e.g. network prediction) as the copy of frame data
+
+        Args:
+            name (str): data name
+            array (array): frame data
+            tensor (tensor): device copy of array
+        """
+        self.tensors[name] = (array, tensor)
+
+    def rebind(self, name, src, dst):
+        """Update the copy of frame data when the data is written into another array.
+        The copy of src is kept for dst; a copy of dst is dropped since dst is overwritten.
+
+        Args:
+            name (str): data name
+            src (array): source frame data
+            dst (array): array holding the data of src
+        """
+        entry = self.tensors.get(name)
+        if entry is not None and entry[0] is src:
+            self.tensors[name] = (dst, entry[1])
+        elif entry is not None and entry[0] is dst:
+            del self.tensors[name]
+
+    def to_numpy(self, tensor, name, out=None):
+        """Copy a tensor to the host, the transfer is timed
+
+        Args:
+            tensor (tensor): data
+            name (str): data name
+            out (array): (optional) host array with the shape of tensor the data is copied into
+
+        Returns:
+            array (array): data; out if given
+        """
+        return to_numpy(tensor, self.timers, name, out)
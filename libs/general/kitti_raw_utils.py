@@ -9,6 +9,8 @@
 '''
 import numpy as np
 from collections import namedtuple
+from glob import glob
+from multiprocessing.pool import ThreadPool
 import os
 
 from .kitti_utils import *
@@ -25,36 +27,56 @@ OxtsPacket = namedtuple('OxtsPacket',
                             'posmode, velmode, orimode')
 
 
-def generate_pose(seq, frame_idx, do_flip):
-    """Get pose for a frame in a sequence
+# OXTS field indexes, {field: column}
+OXTS_IDX = {name: i for i, name in enumerate(OxtsPacket._fields)}
+
+# pose cache file, stored next to the oxts data directory
+OXTS_CACHE = "oxts_poses.npz"
+
+# poses of the loaded sequences, {oxts_dir: (mtime, array [Nx4x4])}
+_oxts_poses = {}
+
+
+def read_oxts_file(filename):
+    """Read an oxts file
 
     Args:
-        seq (str): sequence oxts_dir directory
-        frame_idx (int): frame index
-        do_flip (bool): flip sequence horizontally
-        
+        filename (str): oxts txt file path
+
     Returns:
-        pose (array, [4x4]): absolute pose w.r.t frame-0
+        packet (array, [30]): oxts packet, fields are ordered as OxtsPacket
     """
-    # Read oxts data
-    oxts_files = [
-            os.path.join(seq, "{:010}.txt".format(0)),
-            os.path.join(seq, "{:010}.txt".format(frame_idx))
-            ]
-    oxts_packets = []
-    for filename in oxts_files:
-        with open(filename, 'r') as f:
-            for line in f.readlines():
-                line = line.split()
-                # Last five entries are flags and counts
-                line[:-5] = [float(x) for x in line[:-5]]
-                line[-5:] = [int(float(x)) for x in line[-5:]]
-
-                data = OxtsPacket(*line)
-                oxts_packets.append(data)
-
-    # get absolute pose w.r.t frame-0
-    gps_poses = poses_from_oxts(oxts_packets)
+    with open(filename, 'r') as f:
+        return np.array(f.readline().split(), dtype=np.float64)
+
+
+def read_oxts_dir(oxts_dir, num_workers=8):
+    """Read the oxts files of a sequence in parallel
+
+    Args:
+        oxts_dir (str): directory stores oxts data
+        num_workers (int): number of reading threads
+
+    Returns:
+        oxts (array, [Nx30]): oxts packets, fields are ordered as OxtsPacket
+    """
+    files = sorted(glob(os.path.join(oxts_dir, "*.txt")))
+    assert len(files) != 0, "Wrong path is given: [{}]".format(oxts_dir)
+    with ThreadPool(num_workers) as pool:
+        packets = pool.map(read_oxts_file, files, chunksize=64)
+    return np.stack(packets)
+
+
+def camera_poses_from_oxts(oxts):
+    """Compute camera poses w.r.t frame-0 from oxts packets
+
+    Args:
+        oxts (array, [Nx30]): oxts packets
+
+    Returns:
+        poses (array, [Nx4x4]): absolute camera poses w.r.t frame-0
+    """
+    gps_poses = poses_from_oxts(oxts)
 
     # convert from GPS coordinate system to camera coordinate system
     # - Camera:   x: right,   y: down,  z: forward
@@ -65,9 +87,63 @@ def generate_pose(seq, frame_idx, do_flip):
                 [0, 0, -1],
                 [1, 0, 0]]
                 )
-    T_01 = np.linalg.inv(gps_poses[0]) @ gps_poses[1]
-    # pose = (T @ gps_poses[0]) @ np.linalg.inv(T @ gps_poses[1])
-    pose = T @ T_01 @ np.linalg.inv(T)
+    T_0i = np.linalg.inv(gps_poses[0]) @ gps_poses
+    return T @ T_0i @ np.linalg.inv(T)
+
+
+def load_oxts_poses(oxts_dir, use_cache=True, num_workers=8):
+    """Load camera poses of a sequence from oxts data.
+    The poses are cached in OXTS_CACHE next to the oxts data directory
+    and the cache is rebuilt if the directory is modified.
+
+    Args:
+        oxts_dir (str): directory stores oxts data
+        use_cache (bool): read/write the pose cache
+        num_workers (int): number of reading threads
+
+    Returns:
+        poses (array, [Nx4x4]): absolute camera poses w.r.t frame-0
+    """
+    oxts_dir = os.path.normpath(oxts_dir)
+    assert os.path.isdir(oxts_dir), "Wrong path is given: [{}]".format(oxts_dir)
+    mtime = os.path.getmtime(oxts_dir)
+    if use_cache and oxts_dir in _oxts_poses and _oxts_poses[oxts_dir][0] == mtime:
+        return _oxts_poses[oxts_dir][1]
+
+    cache_path = os.path.join(os.path.dirname(oxts_dir), OXTS_CACHE)
+    if use_cache and os.path.isfile(cache_path):
+        with np.load(cache_path) as cache:
+            if cache['mtime'] == mtime:
+                poses = cache['poses']
+                _oxts_poses[oxts_dir] = (mtime, poses)
+                return poses
+
+    oxts = read_oxts_dir(oxts_dir, num_workers)
+    poses = camera_poses_from_oxts(oxts)
+    if use_cache:
+        _oxts_poses[oxts_dir] = (mtime, poses)
+        # the dataset directory can be read-only; the poses are then rebuilt next time
+        try:
+            tmp_path = cache_path[:-len(".npz")] + ".{}.tmp.npz".format(os.getpid())
+            np.savez(tmp_path, mtime=mtime, oxts=oxts, poses=poses)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return poses
+
+
+def generate_pose(seq, frame_idx, do_flip):
+    """Get pose for a frame in a sequence
+
+    Args:
+        seq (str): sequence oxts_dir directory
+        frame_idx (int): frame index
+        do_flip (bool): flip sequence horizontally
+        
+    Returns:
+        pose (array, [4x4]): absolute pose w.r.t frame-0
+    """
+    pose = load_oxts_poses(seq)[frame_idx].copy()
 
     if do_flip:
         pose[:3, :3] = flip_rotation(pose[:3, :3])
@@ -102,43 +178,41 @@ def flip_rotation(R):
     return new_R
 
 
-def poses_from_oxts(oxts_packets):
+def poses_from_oxts(oxts):
     """Helper method to compute SE(3) pose matrices from OXTS packets.
     
     Args:
-        oxts_packets (namedtuple): oxts data
+        oxts (array, [Nx30]): oxts packets, fields are ordered as OxtsPacket
     
     Returns:
-        poses (list): list of sensor poses
+        poses (array, [Nx4x4]): sensor poses
     """
     er = 6378137.  # earth radius (approx.) in meters
 
+    lat = oxts[:, OXTS_IDX['lat']]
+    lon = oxts[:, OXTS_IDX['lon']]
+    alt = oxts[:, OXTS_IDX['alt']]
+
     # compute scale from first lat value
-    scale = np.cos(oxts_packets[0].lat * np.pi / 180.)
-
-    t_0 = []    # initial position
-    poses = []  # list of poses computed from oxts
-    for packet in oxts_packets:
-        # Use a Mercator projection to get the translation vector
-        tx = scale * packet.lon * np.pi * er / 180.
-        ty = scale * er * \
-            np.log(np.tan((90. + packet.lat) * np.pi / 360.))
-        tz = packet.alt
-        t = np.array([tx, ty, tz])
-
-        # We want the initial position to be the origin, but keep the ENU
-        # coordinate system
-        if len(t_0) == 0:
-            t_0 = t
-
-        # Use the Euler angles to get the rotation matrix
-        Rx = rotx(packet.roll)
-        Ry = roty(packet.pitch)
-        Rz = rotz(packet.yaw)
-        R = Rz.dot(Ry.dot(Rx))
-
-        # Combine the translation and rotation into a homogeneous transform
-        # poses.append(transform_from_rot_trans(R, t - t_0))
-        poses.append(transform_from_rot_trans(R, t))
-
-    return poses
\ No newline at end of file
+    scale = np.cos(lat[0] * np.pi / 180.)
+
+    # Use a Mercator projection to get the translation vector
+    poses = np.tile(np.eye(4), (len(oxts), 1, 1))
+    poses[:, 0, 3] = scale * lon * np.pi * er / 180.
+    poses[:, 1, 3] = scale * er * np.log(np.tan((90. + lat) * np.pi / 360.))
+    poses[:, 2, 3] = alt
+
+    # Use the Euler angles to get the rotation matrix, R = Rz @ Ry @ Rx
+    cr, sr = np.cos(oxts[:, OXTS_IDX['roll']]), np.sin(oxts[:, OXTS_IDX['roll']])
+    cp, sp = np.cos(oxts[:, OXTS_IDX['pitch']]), np.sin(oxts[:, OXTS_IDX['pitch']])
+    cy, sy = np.cos(oxts[:, OXTS_IDX['yaw']]), np.sin(oxts[:, OXTS_IDX['yaw']])
+    poses[:, 0, 0] = cy * cp
+    poses[:, 0, 1] = cy * sp * sr - sy * cr
+    poses[:, 0, 2] = cy * sp * cr + sy * sr
+    poses[:, 1, 0] = sy * cp
+    poses[:, 1, 1] = sy * sp * sr + cy * cr
+    poses[:, 1, 2] = sy * sp * cr - cy * sr
+    poses[:, 2, 0] = -sp
+    poses[:, 2, 1] = cp * sr
+    poses[:, 2, 2] = cp * cr
+    return poses
@@ -2,7 +2,6 @@
 
 from collections import namedtuple
 
-import matplotlib.image as mpimg
 import numpy as np
 
 __author__ = "Lee Clement"
@@ -109,6 +108,7 @@ def load_stereo_pairs(imL_files, imR_files, **kwargs):
             - **left** (HxWxC): left image
             - **right** (HxWxC): left image
     """
+    import matplotlib.image as mpimg
     StereoPair = namedtuple('StereoPair', 'left, right')
 
     impairs = []
@@ -0,0 +1,187 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: MemoryProfiler records host and device memory usage per pipeline stage and per frame
+'''
+
+import csv
+import numpy as np
+import os
+import resource
+import sys
+import tracemalloc
+
+
+MB = 1024. * 1024.
+
+
+def get_rss():
+    """Get the current resident set size of the process
+
+    Returns:
+        rss (float): resident set size (MB); peak RSS if the current RSS is not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError):
+        return get_peak_rss()
+
+
+def get_peak_rss():
+    """Get the peak resident set size of the process
+
+    Returns:
+        peak_rss (float): peak resident set size (MB)
+    """
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return maxrss / MB
+    return maxrss / 1024.
+
+
+class MemoryProfiler():
+    """MemoryProfiler records the memory usage after each pipeline stage of a frame
+
+        - rss / peak_rss: current and peak resident set size of the process (MB)
+        - py / py_peak: current and peak (within the stage) Python allocations traced by tracemalloc (MB)
+        - cuda / cuda_peak: current and peak (within the stage) torch device allocations (MB)
+
+    A tracemalloc snapshot taken after the first frame is the baseline; the allocators
+    that grow the most since then are reported, which points to leaks and oversized buffers.
+    """
+    def __init__(self, cfg):
+        """
+        Args:
+            cfg (edict): memory profiler configuration
+                - **enable** (bool): enable memory profiler
+                - **tracemalloc** (bool): trace Python allocations
+                - **top_k** (int): number of reported top allocators
+        """
+        self.cfg = cfg
+        self.enable = cfg.enable
+        self.records = []
+        self.frame = None
+        self.baseline = None
+
+        if not self.enable:
+            return
+
+        if cfg.tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.cuda = None
+        import torch
+        if torch.cuda.is_available():
+            self.cuda = torch.cuda
+
+    def new_frame(self, frame_id):
+        """Start recording a frame; the peaks are reset
+
+        Args:
+            frame_id (int): frame index
+        """
+        if not self.enable:
+            return
+        # baseline after the first frame, when models and buffers are allocated
+        if self.frame is not None and self.baseline is None and tracemalloc.is_tracing():
+            self.baseline = tracemalloc.take_snapshot()
+        self.frame = frame_id
+        self.reset_peaks()
+
+    def reset_peaks(self):
+        """Reset the peaks of Python and device allocations
+        """
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        if self.cuda is not None:
+            self.cuda.reset_peak_memory_stats()
+
+    def record(self, stage):
+        """Record the memory usage after a stage; the peaks cover the stage since the previous record
+
+        Args:
+            stage (str): stage name
+        """
+        if not self.enable:
+            return
+        record = {
+            'frame': self.frame,
+            'stage': stage,
+            'rss': get_rss(),
+            'peak_rss': get_peak_rss(),
+            'py': 0.,
+            'py_peak': 0.,
+            'cuda': 0.,
+            'cuda_peak': 0.,
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record['py'] = current / MB
+            record['py_peak'] = peak / MB
+        if self.cuda is not None:
+            record['cuda'] = self.cuda.memory_allocated() / MB
+            record['cuda_peak'] = self.cuda.max_memory_allocated() / MB
+        self.records.append(record)
+        self.reset_peaks()
+
+    def top_allocators(self):
+        """Get the allocators with the largest growth since the baseline (or the largest size)
+
+        Returns:
+            stats (list): tracemalloc StatisticDiff/Statistic of the top allocators
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        if self.baseline is not None:
+            return snapshot.compare_to(self.baseline, 'lineno')[:self.cfg.top_k]
+        return snapshot.statistics('lineno')[:self.cfg.top_k]
+
+    def memory_analysis(self):
+        """Print memory usage per stage, RSS growth and the top allocators
+        """
+        if not self.enable or len(self.records) == 0:
+            return
+        print("----- memory breakdown (MB) -----")
+        print("\t{:<20} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+                'stage', 'rss', 'peak_rss', 'py_peak', 'cuda', 'cuda_peak'))
+        stages = []
+        for record in self.records:
+            if record['stage'] not in stages:
+                stages.append(record['stage'])
+        for stage in stages:
+            records = [r for r in self.records if r['stage'] == stage]
+            print("\t{:<20} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+                    stage,
+                    np.max([r['rss'] for r in records]),
+                    np.max([r['peak_rss'] for r in records]),
+                    np.max([r['py_peak'] for r in records]),
+                    np.max([r['cuda'] for r in records]),
+                    np.max([r['cuda_peak'] for r in records])))
+
+        # RSS growth between the first and the last frame
+        first, last = self.records[0], self.records[-1]
+        print("\tRSS: {:.1f}MB (frame {}) -> {:.1f}MB (frame {})".format(
+                first['rss'], first['frame'], last['rss'], last['frame']))
+
+        allocators = self.top_allocators()
+        if len(allocators) > 0:
+            print("\ttop allocators{}:".format(" (growth since first frame)" if self.baseline is not None else ""))
+            for stat in allocators:
+                print("\t\t{}".format(stat))
+
+    def export_csv(self, path):
+        """Export the per-frame records as CSV
+
+        Args:
+            path (str): csv file path
+        """
+        keys = ['frame', 'stage', 'rss', 'peak_rss', 'py', 'py_peak', 'cuda', 'cuda_peak']
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            for record in self.records:
+                writer.writerow([record[k] if k in ['frame', 'stage'] else '{:.2f}'.format(record[k])
+                                    for k in keys])
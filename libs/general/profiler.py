@@ -0,0 +1,321 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: Profiler records nested timing scopes with percentile statistics and trace export
+'''
+
+import csv
+import functools
+import json
+import numpy as np
+import os
+import threading
+from time import perf_counter
+
+
+class _NullScope():
+    """Scope used when profiling is disabled; does nothing
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope():
+    """Context manager timing a scope of a Profiler
+    """
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.start(self.name)
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.end(self.name)
+        return False
+
+
+def profile_scope(profiler, name):
+    """Get a timing scope of a profiler, which can be None
+
+    Args:
+        profiler (Profiler): profiler; a scope doing nothing is returned if it is None or disabled
+        name (str): scope name
+
+    Returns:
+        scope (context manager): timing scope
+    """
+    if profiler is None:
+        return _NULL_SCOPE
+    return profiler.scope(name)
+
+
+def profiled(name=None):
+    """Decorator timing a method with the profiler of its object (self.timers).
+    The method is called directly if the object has no profiler or it is disabled.
+
+    Args:
+        name (str): scope name; method name if None
+    """
+    def decorator(func):
+        scope_name = name if name is not None else func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            profiler = getattr(self, 'timers', None)
+            if profiler is None or not profiler.enable:
+                return func(self, *args, **kwargs)
+            profiler.start(scope_name)
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                profiler.end(scope_name)
+        return wrapper
+    return decorator
+
+
+class Profiler():
+    """Profiler records hierarchical timing scopes.
+    A scope started while another scope is running (in the same thread) is a child of it, and
+    is identified by its path, e.g. DF-VO/tracking/E-tracker. Each record keeps the frame index
+    set by new_frame(), so that the statistics can be reported per scope and per frame.
+
+    Scopes are timed by start()/end(), the scope() context manager or the profiled() decorator.
+    When disabled, every call returns immediately.
+
+    By default only the durations of the scopes are kept (statistics); the per-execution
+    records (frame, thread, start time) for the trace/CSV export are kept only if
+    a trace or CSV file is configured.
+    """
+    def __init__(self, cfg=None):
+        """
+        Args:
+            cfg (edict): profiler configuration; enabled without CUDA synchronization and records if None
+                - **enable** (bool): enable profiling
+                - **sync_cuda** (bool): synchronize CUDA at scope boundaries, so that GPU time is included
+                - **trace_file** (str): records are kept if trace_file or csv_file is set
+                - **csv_file** (str): records are kept if trace_file or csv_file is set
+        """
+        self.enable = True if cfg is None else cfg.enable
+        self.sync_cuda = False if cfg is None else cfg.sync_cuda
+        self.record_events = cfg is not None and \
+            (cfg.get('trace_file') is not None or cfg.get('csv_file') is not None)
+
+        # durations of the scopes, each element is **path** (list); ordered by first start
+        self.timers = {}
+
+        # records, each element is (frame, path, thread id, start time, duration); see record_events
+        self.events = []
+
+        self.frame = None
+        self.local = threading.local()
+        self.start_time = perf_counter()
+
+        self.cuda = None
+        if self.enable and self.sync_cuda:
+            import torch
+            if torch.cuda.is_available():
+                self.cuda = torch.cuda
+
+    def get_stack(self):
+        """Get the running scopes of the current thread
+
+        Returns:
+            stack (list): running scopes, each element is (path, name, start time)
+        """
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def new_frame(self, frame_id):
+        """Set the frame index of the following records
+
+        Args:
+            frame_id (int): frame index
+        """
+        self.frame = frame_id
+
+    def start(self, name):
+        """Start a scope, as a child of the running scope
+
+        Args:
+            name (str): scope name
+        """
+        if not self.enable:
+            return
+        if self.cuda is not None:
+            self.cuda.synchronize()
+        stack = self.get_stack()
+        path = name if len(stack) == 0 else stack[-1][0] + '/' + name
+        if path not in self.timers:
+            self.timers[path] = []
+        stack.append((path, name, perf_counter()))
+
+    def end(self, name):
+        """End the latest running scope with the name; its unfinished children are discarded
+
+        Args:
+            name (str): scope name
+        """
+        if not self.enable:
+            return
+        if self.cuda is not None:
+            self.cuda.synchronize()
+        end_time = perf_counter()
+        stack = self.get_stack()
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][1] == name:
+                break
+        else:
+            assert False, "Scope [{}] has not started.".format(name)
+
+        path, _, start_time = stack[i]
+        del stack[i:]
+        duration = end_time - start_time
+        self.timers[path].append(duration)
+        if self.record_events:
+            self.events.append((self.frame, path, threading.get_ident(), start_time - self.start_time, duration))
+
+    def scope(self, name):
+        """Context manager timing a scope
+
+        Args:
+            name (str): scope name
+
+        Returns:
+            scope (context manager): timing scope
+        """
+        if not self.enable:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def profile(self, name):
+        """Decorator timing a function as a scope
+
+        Args:
+            name (str): scope name
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enable:
+                    return func(*args, **kwargs)
+                self.start(name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.end(name)
+            return wrapper
+        return decorator
+
+    def durations(self, name):
+        """Get the durations of a scope
+
+        Args:
+            name (str): scope path or name; for a name, durations of all the scopes with the name are returned
+
+        Returns:
+            durations (list): durations (s)
+        """
+        if name in self.timers:
+            return self.timers[name]
+        return [d for path, durations in self.timers.items()
+                    if path.split('/')[-1] == name for d in durations]
+
+    def frame_records(self):
+        """Get the total duration of each scope per frame
+
+        Returns:
+            records (dict): each element is **frame index** (dict, each element is **path** (float));
+                empty if the records are not kept (see record_events)
+        """
+        records = {}
+        for frame, path, _, _, duration in self.events:
+            record = records.setdefault(frame, {})
+            record[path] = record.get(path, 0.) + duration
+        return records
+
+    def summary(self):
+        """Compute statistics of the scopes
+
+        Returns:
+            stats (dict): each element is **path** (dict) containing count, mean, p50, p95, p99 and max (s)
+        """
+        stats = {}
+        for path, durations in self.timers.items():
+            if len(durations) == 0:
+                continue
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+            stats[path] = {
+                'count': len(durations),
+                'mean': float(np.mean(durations)),
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+                'max': float(np.max(durations)),
+            }
+        return stats
+
+    def time_analysis(self):
+        """Print the scope tree with statistics (ms)
+        """
+        print("----- time breakdown -----")
+        if not self.enable:
+            print("\tprofiler is disabled.")
+            return
+        print("\t{:<40} {:>8} {:>8} {:>8} {:>8} {:>8} {:>6}".format(
+                'scope', 'mean', 'p50', 'p95', 'p99', 'max', 'count'))
+        for path, stat in self.summary().items():
+            names = path.split('/')
+            label = '  ' * (len(names) - 1) + names[-1]
+            print("\t{:<40} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:6d}".format(
+                    label,
+                    stat['mean'] * 1e3, stat['p50'] * 1e3, stat['p95'] * 1e3,
+                    stat['p99'] * 1e3, stat['max'] * 1e3,
+                    stat['count']))
+
+    def export_chrome_trace(self, path):
+        """Export the records in Chrome trace-event format (chrome://tracing, Perfetto)
+
+        Args:
+            path (str): json file path
+        """
+        pid = os.getpid()
+        trace_events = []
+        for frame, scope_path, tid, start, duration in self.events:
+            trace_events.append({
+                'name': scope_path.split('/')[-1],
+                'cat': scope_path.split('/')[0],
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': duration * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': {'frame': frame, 'path': scope_path}
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+    def export_csv(self, path):
+        """Export the records as CSV; one row per scope execution
+
+        Args:
+            path (str): csv file path
+        """
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'scope', 'thread', 'start_ms', 'duration_ms'])
+            for frame, scope_path, tid, start, duration in self.events:
+                writer.writerow([frame, scope_path, tid,
+                                 '{:.4f}'.format(start * 1e3),
+                                 '{:.4f}'.format(duration * 1e3)])
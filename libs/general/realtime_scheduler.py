@@ -0,0 +1,121 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: RealtimeScheduler feeds frames at their arrival times and drops/merges frames when falling behind
+'''
+
+from bisect import bisect_right
+import numpy as np
+from time import sleep, time
+
+
+class RealtimeScheduler():
+    """RealtimeScheduler consumes frames according to their arrival times, as from a live camera,
+    and keeps track of the latency budget.
+    When a frame is still queued after its deadline (arrival time + latency budget), the scheduler is behind and
+    the frame is handled according to the drop policy
+
+        - none: every frame is processed in order, however late it is
+        - drop: late frames are dropped; they are not processed and not in the trajectory
+        - merge: late frames are merged into the next processed frame; their poses are interpolated
+
+    The newest arrived frame is always processed, so that tracking continues against the last processed reference.
+    """
+    def __init__(self, cfg, frame_ids, timestamps):
+        """
+        Args:
+            cfg (edict): real-time scheduler configuration
+            frame_ids (list): frame indexes, in processing order
+            timestamps (list): timestamps of the frames
+        """
+        self.cfg = cfg
+        self.frame_ids = frame_ids
+        self.timestamps = timestamps
+
+        # arrival times (s) relative to the first frame
+        if cfg.timestamp_unit is not None:
+            self.arrival_times = [(ts - timestamps[0]) * cfg.timestamp_unit for ts in timestamps]
+        else:
+            self.arrival_times = [(i - frame_ids[0]) / cfg.fps for i in frame_ids]
+
+        self.latency_budget = cfg.latency_budget if cfg.latency_budget is not None else 1. / cfg.fps
+        assert cfg.drop_policy in ['none', 'drop', 'merge'], \
+                "Wrong drop policy [{}] is used.".format(cfg.drop_policy)
+
+        # statistics
+        self.latencies = []
+        self.queue_depths = []
+        self.num_dropped = 0
+        self.num_deadline_miss = 0
+
+    def select_frame(self, first, last, now):
+        """Select the queued frame to be processed
+
+        Args:
+            first (int): index of the oldest queued frame
+            last (int): index of the newest queued frame
+            now (float): current time (s)
+
+        Returns:
+            selected (int): index of the frame to be processed; the older queued frames are dropped/merged
+        """
+        if self.cfg.drop_policy == 'none':
+            return first
+        for i in range(first, last):
+            if self.arrival_times[i] + self.latency_budget > now:
+                return i
+        return last
+
+    def run(self, process_frame, merge_frame=None):
+        """Run the scheduler until all frames are consumed
+
+        Args:
+            process_frame (function): function processing a frame, process_frame(img_id)
+            merge_frame (function): function recording a merged frame, merge_frame(img_id, timestamp);
+                used by the merge policy
+        """
+        num_frames = len(self.frame_ids)
+        start_time = time()
+        cnt = 0
+        while cnt < num_frames:
+            # wait for the next frame
+            now = time() - start_time
+            if self.arrival_times[cnt] > now:
+                sleep(self.arrival_times[cnt] - now)
+                now = time() - start_time
+
+            # queued frames [cnt, last]
+            last = bisect_right(self.arrival_times, now, lo=cnt) - 1
+            self.queue_depths.append(last - cnt + 1)
+
+            # drop/merge late frames
+            selected = self.select_frame(cnt, last, now)
+            for i in range(cnt, selected):
+                self.num_dropped += 1
+                if self.cfg.drop_policy == 'merge' and merge_frame is not None:
+                    merge_frame(self.frame_ids[i], self.timestamps[i])
+
+            process_frame(self.frame_ids[selected])
+
+            latency = time() - start_time - self.arrival_times[selected]
+            self.latencies.append(latency)
+            if latency > self.latency_budget:
+                self.num_deadline_miss += 1
+            cnt = selected + 1
+
+    def summary(self):
+        """Print statistics of the run
+        """
+        print("----- real-time scheduler -----")
+        print("\tpolicy: {}; latency budget: {:.03f}s".format(self.cfg.drop_policy, self.latency_budget))
+        print("\tprocessed frames: {}; {} frames: {}; deadline misses: {}".format(
+                len(self.latencies),
+                'merged' if self.cfg.drop_policy == 'merge' else 'dropped',
+                self.num_dropped,
+                self.num_deadline_miss))
+        if len(self.latencies) > 0:
+            p50, p90, p99 = np.percentile(self.latencies, [50, 90, 99])
+            print("\tlatency: p50 {:.03f}s; p90 {:.03f}s; p99 {:.03f}s; max {:.03f}s".format(
+                    p50, p90, p99, np.max(self.latencies)))
+            print("\tqueue depth: mean {:.02f}; max {}".format(
+                    np.mean(self.queue_depths), np.max(self.queue_depths)))
@@ -0,0 +1,51 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: Registry of lazily imported components (datasets, deep networks)
+'''
+
+import importlib
+
+
+class Registry():
+    """Registry maps component names to classes given as "module:class" paths.
+    A class is imported when it is looked up, so that the modules (and the heavy dependencies)
+    of components not selected in the configuration are never imported.
+    """
+    def __init__(self, name, entries):
+        """
+        Args:
+            name (str): component type, used in error messages
+            entries (dict): component name -> "module:class" path
+        """
+        self.name = name
+        self.entries = dict(entries)
+
+    def register(self, key, path):
+        """Register a component
+
+        Args:
+            key (str): component name
+            path (str): "module:class" path
+        """
+        self.entries[key] = path
+
+    def keys(self):
+        return self.entries.keys()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        """Import and return the class of a component
+
+        Args:
+            key (str): component name
+
+        Returns:
+            cls (class): component class
+        """
+        assert key in self.entries, "Invalid {} [{}] is provided, choose from {}".format(
+                                        self.name, key, list(self.entries.keys()))
+        module_path, class_name = self.entries[key].split(":")
+        return getattr(importlib.import_module(module_path), class_name)
@@ -0,0 +1,281 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: Trajectory I/O; vectorized KITTI/TUM text format and binary (.npz/.npy) format
+'''
+
+import numpy as np
+import os
+
+
+# binary trajectory file extensions
+BINARY_EXTS = ['.npz', '.npy']
+
+# number format of the pose parameters in text files
+POSE_FMT = "%.12g"
+
+
+def is_binary_traj(file_name):
+    """Check if a trajectory file is in binary format (by extension)
+
+    Args:
+        file_name (str): trajectory file path
+
+    Returns:
+        is_binary (bool): True for .npz/.npy files
+    """
+    return os.path.splitext(file_name)[1] in BINARY_EXTS
+
+
+def quat_to_rot(quats):
+    """Convert quaternions to rotation matrices
+
+    Args:
+        quats (array, [Nx4]): quaternions (qw, qx, qy, qz); non-unit quaternions are normalized
+
+    Returns:
+        R (array, [Nx3x3]): rotation matrices
+    """
+    quats = np.asarray(quats, dtype=np.float64).reshape(-1, 4)
+    Nq = (quats ** 2).sum(1)
+    s = np.where(Nq < 1e-8, 0., 2. / np.maximum(Nq, 1e-8))
+    w, x, y, z = quats.T
+    X, Y, Z = x * s, y * s, z * s
+    wX, wY, wZ = w * X, w * Y, w * Z
+    xX, xY, xZ = x * X, x * Y, x * Z
+    yY, yZ, zZ = y * Y, y * Z, z * Z
+    R = np.stack([
+            1. - (yY + zZ), xY - wZ, xZ + wY,
+            xY + wZ, 1. - (xX + zZ), yZ - wX,
+            xZ - wY, yZ + wX, 1. - (xX + yY)
+            ], axis=1)
+    return R.reshape(-1, 3, 3)
+
+
+def rot_to_quat(R):
+    """Convert rotation matrices to quaternions
+
+    Args:
+        R (array, [Nx3x3]): rotation matrices
+
+    Returns:
+        quats (array, [Nx4]): unit quaternions (qw, qx, qy, qz) with qw >= 0
+    """
+    R = np.asarray(R, dtype=np.float64).reshape(-1, 3, 3)
+    m00, m01, m02 = R[:, 0, 0], R[:, 0, 1], R[:, 0, 2]
+    m10, m11, m12 = R[:, 1, 0], R[:, 1, 1], R[:, 1, 2]
+    m20, m21, m22 = R[:, 2, 0], R[:, 2, 1], R[:, 2, 2]
+
+    # the largest of the four squared components is computed first for numerical stability
+    cands = np.stack([
+                1. + m00 + m11 + m22,
+                1. + m00 - m11 - m22,
+                1. - m00 + m11 - m22,
+                1. - m00 - m11 + m22,
+                ], axis=1)
+    best = cands.argmax(1)
+    quats = np.empty((len(R), 4))
+    for i in range(4):
+        sel = best == i
+        if not sel.any():
+            continue
+        t = np.sqrt(np.maximum(cands[sel, i], 1e-12))
+        q_i = 0.5 * t
+        k = 0.5 / t
+        a01, a02, a12 = m01[sel], m02[sel], m12[sel]
+        a10, a20, a21 = m10[sel], m20[sel], m21[sel]
+        if i == 0:
+            q = [q_i, (a21 - a12) * k, (a02 - a20) * k, (a10 - a01) * k]
+        elif i == 1:
+            q = [(a21 - a12) * k, q_i, (a01 + a10) * k, (a02 + a20) * k]
+        elif i == 2:
+            q = [(a02 - a20) * k, (a01 + a10) * k, q_i, (a12 + a21) * k]
+        else:
+            q = [(a10 - a01) * k, (a02 + a20) * k, (a12 + a21) * k, q_i]
+        quats[sel] = np.stack(q, axis=1)
+    quats[quats[:, 0] < 0] *= -1
+    return quats
+
+
+def read_kitti_traj(file_name):
+    """Read a trajectory in KITTI format
+    Each line in the file should follow one of the following structures
+        (1) idx pose(3x4 matrix in terms of 12 numbers)
+        (2) pose(3x4 matrix in terms of 12 numbers)
+
+    Args:
+        file_name (str): txt file path
+
+    Returns:
+        a tuple containing
+            - **keys** (list): frame indexes (float) if given in the file; otherwise line indexes (int)
+            - **poses** (array, [Nx4x4]): poses
+    """
+    data = np.loadtxt(file_name, dtype=np.float64, ndmin=2)
+    assert data.shape[1] in [12, 13], \
+        "Wrong KITTI trajectory format [{}]: {} columns".format(file_name, data.shape[1])
+    with_idx = data.shape[1] == 13
+    keys = data[:, 0].tolist() if with_idx else list(range(len(data)))
+    poses = np.tile(np.eye(4), (len(data), 1, 1))
+    poses[:, :3, :] = data[:, with_idx:].reshape(-1, 3, 4)
+    return keys, poses
+
+
+def read_tum_traj(file_name):
+    """Read a trajectory in TUM format; lines starting with # are skipped
+    Each line in the file should follow the following structure
+        timestamp tx ty tz qx qy qz qw
+
+    Args:
+        file_name (str): txt file path
+
+    Returns:
+        a tuple containing
+            - **keys** (list): timestamps
+            - **poses** (array, [Nx4x4]): poses
+    """
+    data = np.loadtxt(file_name, dtype=np.float64, comments='#', ndmin=2)
+    assert data.shape[1] == 8, \
+        "Wrong TUM trajectory format [{}]: {} columns".format(file_name, data.shape[1])
+    poses = np.tile(np.eye(4), (len(data), 1, 1))
+    poses[:, :3, :3] = quat_to_rot(data[:, [7, 4, 5, 6]])
+    poses[:, :3, 3] = data[:, 1:4]
+    return data[:, 0].tolist(), poses
+
+
+def read_binary_traj(file_name):
+    """Read a trajectory in binary format
+        - .npz: **timestamps** [N] and **poses** [Nx4x4]
+        - .npy: poses [Nx4x4]; keys are the frame indexes
+
+    Args:
+        file_name (str): npz/npy file path
+
+    Returns:
+        a tuple containing
+            - **keys** (list): timestamps / frame indexes
+            - **poses** (array, [Nx4x4]): poses
+    """
+    if file_name.endswith('.npy'):
+        poses = np.load(file_name)
+        return list(range(len(poses))), poses
+    with np.load(file_name) as data:
+        return data['timestamps'].tolist(), data['poses']
+
+
+def write_kitti_traj(file_name, keys, poses):
+    """Write a trajectory in KITTI format (idx pose)
+
+    Args:
+        file_name (str): txt file path
+        keys (list): frame indexes / timestamps
+        poses (array, [Nx4x4]): poses
+    """
+    rows = np.asarray(poses, dtype=np.float64).reshape(-1, 16)[:, :12].tolist()
+    row_fmt = " ".join([POSE_FMT] * 12)
+    lines = ["{} {}\n".format(key, row_fmt % tuple(row)) for key, row in zip(keys, rows)]
+    with open(file_name, 'w') as f:
+        f.writelines(lines)
+
+
+def write_tum_traj(file_name, keys, poses):
+    """Write a trajectory in TUM format (timestamp tx ty tz qx qy qz qw)
+
+    Args:
+        file_name (str): txt file path
+        keys (list): timestamps
+        poses (array, [Nx4x4]): poses
+    """
+    poses = np.asarray(poses, dtype=np.float64).reshape(-1, 4, 4)
+    quats = rot_to_quat(poses[:, :3, :3])
+    rows = np.concatenate([poses[:, :3, 3], quats[:, [1, 2, 3, 0]]], axis=1).tolist()
+    row_fmt = " ".join([POSE_FMT] * 7)
+    lines = ["{} {}\n".format(key, row_fmt % tuple(row)) for key, row in zip(keys, rows)]
+    with open(file_name, 'w') as f:
+        f.writelines(lines)
+
+
+def write_binary_traj(file_name, keys, poses):
+    """Write a trajectory in binary format (see read_binary_traj)
+
+    Args:
+        file_name (str): npz/npy file path
+        keys (list): timestamps / frame indexes
+        poses (array, [Nx4x4]): poses
+    """
+    poses = np.asarray(poses, dtype=np.float64).reshape(-1, 4, 4)
+    if file_name.endswith('.npy'):
+        np.save(file_name, poses)
+    else:
+        np.savez(file_name, timestamps=np.asarray(keys), poses=poses)
+
+
+def load_traj(file_name, format='kitti'):
+    """Load a trajectory; binary files are detected by extension
+
+    Args:
+        file_name (str): trajectory file path
+        format (str): text format [kitti, tum]
+
+    Returns:
+        a tuple containing
+            - **keys** (list): frame indexes / timestamps
+            - **poses** (array, [Nx4x4]): poses
+    """
+    if is_binary_traj(file_name):
+        return read_binary_traj(file_name)
+    elif format == 'kitti':
+        return read_kitti_traj(file_name)
+    elif format == 'tum':
+        return read_tum_traj(file_name)
+    else:
+        assert False, "Wrong trajectory format [{}]".format(format)
+
+
+def save_traj(file_name, keys, poses, format='kitti'):
+    """Save a trajectory; binary files are detected by extension
+
+    Args:
+        file_name (str): trajectory file path
+        keys (list): frame indexes / timestamps
+        poses (array, [Nx4x4]): poses
+        format (str): text format [kitti, tum]
+    """
+    if is_binary_traj(file_name):
+        write_binary_traj(file_name, keys, poses)
+    elif format == 'kitti':
+        write_kitti_traj(file_name, keys, poses)
+    elif format == 'tum':
+        write_tum_traj(file_name, keys, poses)
+    else:
+        assert False, "Wrong trajectory format [{}]".format(format)
+
+
+def poses_to_arr(poses):
+    """Convert a pose dictionary to keys and a pose array
+
+    Args:
+        poses (dict): poses, each pose is a [4x4] array
+
+    Returns:
+        a tuple containing
+            - **keys** (list): dictionary keys, in insertion order
+            - **poses** (array, [Nx4x4]): poses
+    """
+    keys = list(poses.keys())
+    if len(keys) == 0:
+        return keys, np.zeros((0, 4, 4))
+    return keys, np.stack([np.asarray(poses[k], dtype=np.float64) for k in keys])
+
+
+def arr_to_poses(keys, poses):
+    """Convert keys and a pose array to a pose dictionary
+
+    Args:
+        keys (list): frame indexes / timestamps
+        poses (array, [Nx4x4]): poses
+
+    Returns:
+        poses (dict): poses, each pose is a [4x4] array
+    """
+    return dict(zip(keys, poses))
@@ -9,14 +9,13 @@
 '''
 
 import cv2
-from glob import glob
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
-from tools.evaluation.tum_tool.pose_evaluation_utils import quat2mat, rot2quat
+from .buffer_pool import buffer_pool
 
-from .kitti_raw_utils import generate_pose
+from .kitti_raw_utils import load_oxts_poses
+from . import trajectory_io
 
 
 def mkdir_if_not_exists(path):
@@ -29,8 +28,53 @@ def mkdir_if_not_exists(path):
         os.makedirs(path)
 
 
+# full decoded sizes of the image files, {(directory, extension): (height, width)}
+_image_sizes = {}
+
+# reduced-size decoding; JPEG is decoded at 1/2, 1/4 or 1/8 scale by libjpeg.
+# Other formats (e.g. PNG) are fully decoded and subsampled by OpenCV, so they are decoded and resized.
+REDUCED_DECODE_EXTS = ['.jpg', '.jpeg']
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+
+def get_decode_flag(path, h, w, crop=None):
+    """Choose the largest decode reduction which keeps the (cropped) image at least as large as the final size.
+    The full size is known after the first image of a directory is decoded.
+
+    Args:
+        path (str): image path
+        h (int): final image height
+        w (int): final image width
+        crop (array, [2x2]): [[y_crop_0, y_crop_1],[x_crop_0, x_crop_1]]
+
+    Returns:
+        a tuple containing
+            - **flag** (int): cv2.imread flag
+            - **factor** (int): reduction factor
+    """
+    dirname, ext = os.path.split(path)[0], os.path.splitext(path)[1].lower()
+    size = _image_sizes.get((dirname, ext))
+    if size is None or ext not in REDUCED_DECODE_EXTS:
+        return cv2.IMREAD_COLOR, 1
+
+    img_h, img_w = size
+    if crop is not None:
+        img_h = img_h * (crop[0][1] - crop[0][0])
+        img_w = img_w * (crop[1][1] - crop[1][0])
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if img_h / factor >= h and img_w / factor >= w:
+            return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+
 def read_image(path, h, w, crop=None):
-    """read image data and convert to RGB
+    """read image data and convert to RGB.
+    The image is decoded at a reduced size when the final size allows it,
+    and it is cropped and resized before the colour conversion.
 
     Args:
         path (str): image path
@@ -41,14 +85,19 @@ def read_image(path, h, w, crop=None):
     Returns:
         img (array, [HxWx3]): image data
     """
-    img = cv2.imread(path, 1)
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    flag, factor = get_decode_flag(path, h, w, crop)
+    img = cv2.imread(path, flag)
+    if factor == 1:
+        _image_sizes[(os.path.split(path)[0], os.path.splitext(path)[1].lower())] = img.shape[:2]
+
     if crop is not None:
         img_h, img_w, _ = img.shape
         y0, y1 = int(img_h * crop[0][0]), int(img_h * crop[0][1])
         x0, x1 = int(img_w * crop[1][0]), int(img_w * crop[1][1])
         img = img[y0:y1, x0:x1]
-    img = cv2.resize(img, (w, h))
+    if img.shape[:2] != (h, w):
+        img = cv2.resize(img, (w, h))
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     return img
 
 
@@ -63,7 +112,8 @@ def read_depth(path, scale, target_size=None):
     Returns:
         depth (array, [HxW]): depth map
     """
-    depth = cv2.imread(path, -1) / scale
+    depth = cv2.imread(path, -1).astype(np.float32)
+    depth /= scale
     if target_size is not None:
         img_h, img_w = target_size
         depth = cv2.resize(depth,
@@ -97,23 +147,42 @@ def preprocess_depth(depth, crop, depth_range):
     Returns:
         depth (array, [HxW]): processed depth map
     """
-    # set cropping region
+    # set cropping region; the mask is built once per resolution
     min_depth, max_depth = depth_range
     h, w = depth.shape
-    y0, y1 = int(h*crop[0][0]), int(h*crop[0][1])
-    x0, x1 = int(w*crop[1][0]), int(w*crop[1][1])
-    depth_mask = np.zeros((h, w))
-    depth_mask[y0:y1, x0:x1] = 1
+    depth_mask = get_crop_mask(h, w, crop)
 
     # set range mask
-    depth_range_mask = (depth < max_depth) * (depth > min_depth)
+    valid_mask = depth < max_depth
+    valid_mask &= depth > min_depth
     
-    # set invalid pixel to zero depth
-    valid_mask = depth_mask * depth_range_mask
+    # set invalid pixel to zero depth; dtype of depth is kept
+    valid_mask &= depth_mask
     depth = depth * valid_mask
     return depth
 
 
+def get_crop_mask(h, w, crop):
+    """Get the mask of a normalized crop region; built once per resolution and read-only
+
+    Args:
+        h (int): image height
+        w (int): image width
+        crop (list): normalized crop regions [[y0, y1], [x0, x1]]
+    
+    Returns:
+        mask (array, [HxW]): True inside the crop region
+    """
+    y0, y1 = int(h*crop[0][0]), int(h*crop[0][1])
+    x0, x1 = int(w*crop[1][0]), int(w*crop[1][1])
+
+    def build_mask():
+        mask = np.zeros((h, w), dtype=bool)
+        mask[y0:y1, x0:x1] = True
+        return mask
+    return buffer_pool.constant(('crop_mask', h, w, y0, y1, x0, x1), build_mask)
+
+
 def image_shape(img):
     """return image shape
 
@@ -152,6 +221,7 @@ def load_poses_from_txt(file_name):
     Each line in the file should follow one of the following structures
         (1) idx pose(3x4 matrix in terms of 12 numbers)
         (2) pose(3x4 matrix in terms of 12 numbers)
+    Binary trajectory files (.npz/.npy) are also accepted.
 
     Args:
         file_name (str): txt file path
@@ -159,49 +229,32 @@ def load_poses_from_txt(file_name):
     Returns:
         poses (dict): dictionary of poses, each pose is a [4x4] array
     """
-    f = open(file_name, 'r')
-    s = f.readlines()
-    f.close()
-    poses = {}
-    for cnt, line in enumerate(s):
-        P = np.eye(4)
-        line_split = [float(i) for i in line.split(" ")]
-        withIdx = int(len(line_split) == 13)
-        for row in range(3):
-            for col in range(4):
-                P[row, col] = line_split[row*4 + col + withIdx]
-        if withIdx:
-            frame_idx = line_split[0]
-        else:
-            frame_idx = cnt
-        poses[frame_idx] = P
-    return poses
-
-
-def load_poses_from_oxts(oxts_dir):
-    """ Load absolute camera poses from oxts files
+    keys, poses = trajectory_io.load_traj(file_name, format='kitti')
+    return trajectory_io.arr_to_poses(keys, poses)
+
+
+def load_poses_from_oxts(oxts_dir, use_cache=True, num_workers=8):
+    """ Load absolute camera poses from oxts files.
+    The poses are cached next to the oxts data directory (see load_oxts_poses).
     
     Args:
         oxts_dir (str): directory stores oxts data
+        use_cache (bool): read/write the pose cache
+        num_workers (int): number of reading threads
 
     Returns:
         poses (dict): dictionary of poses, each pose is a [4x4] array
     """
-    poses = {}
-    len_seq = len(glob(os.path.join(oxts_dir, "*.txt")))
-
-    # check if directory is correct
-    assert len_seq != 0, "Wrong path is given: [{}]".format(oxts_dir)
-
-    for i in range(len_seq):
-        poses[i] = generate_pose(oxts_dir, i, do_flip=False)
-    return poses
+    poses = load_oxts_poses(oxts_dir, use_cache, num_workers)
+    return trajectory_io.arr_to_poses(range(len(poses)), poses)
 
 
 def load_poses_from_txt_tum(file_name):
     """ Load absolute camera poses from text file (tum format)
     Each line in the file should follow the following structure
         timestamp tx ty tz qx qy qz qw
+    Binary trajectory files (.npz/.npy) are also accepted.
+    The poses are expressed relative to the first pose.
 
     Args:
         file_name (str): txt file path
@@ -209,32 +262,10 @@ def load_poses_from_txt_tum(file_name):
     Returns:
         poses (dict): dictionary of poses, each pose is a [4x4] array
     """
-    f = open(file_name, 'r')
-    s = f.readlines()
-    f.close()
-    poses = {}
-    for cnt, line in enumerate(s):
-        line_split = line.split(" ")
-
-        # Comments
-        if line_split[0] == "#":
-            continue
-        
-        # Get raw data
-        line_split = [float(i) for i in line.split(" ")]
-        P = np.eye(4)
-        timestamp, tx, ty, tz, qx, qy, qz, qw = line_split
-
-        # quat -> Rotation matrix
-        P[:3, :3] = quat2mat([qw, qx, qy, qz])
-        P[:3, 3] = np.asarray([tx, ty, tz])
-        
-        poses[timestamp] = P
-    
-    pose_0 = poses[list(poses.keys())[0]]
-    for timestamp in poses:
-        poses[timestamp] = np.linalg.inv(pose_0) @ poses[timestamp]
-    return poses
+    keys, poses = trajectory_io.load_traj(file_name, format='tum')
+    if len(poses) > 0:
+        poses = np.linalg.inv(poses[0]) @ poses
+    return trajectory_io.arr_to_poses(keys, poses)
 
 
 def load_kitti_odom_intrinsics(file_name, new_h, new_w):
@@ -297,13 +328,14 @@ def image_grid(h, w):
         w (int): image width
     
     Returns:
-        grid (array, [HxWx2]): regular image grid contains [x,y]
+        grid (array, [HxWx2]): regular image grid contains [x,y]; float32, built once per resolution and read-only
     """
-    x = np.linspace(0, w-1, w)
-    y = np.linspace(0, h-1, h)
-    xv, yv = np.meshgrid(x, y)
-    grid = np.transpose(np.stack([xv, yv]), (1, 2, 0))
-    return grid
+    def build_grid():
+        x = np.linspace(0, w-1, w, dtype=np.float32)
+        y = np.linspace(0, h-1, h, dtype=np.float32)
+        xv, yv = np.meshgrid(x, y)
+        return np.ascontiguousarray(np.transpose(np.stack([xv, yv]), (1, 2, 0)))
+    return buffer_pool.constant(('image_grid', h, w), build_grid)
 
 
 def convert_SE3_to_arr(SE3_dict, timestamps=None):
@@ -330,26 +362,12 @@ def save_traj(txt, poses, format='kitti'):
     """Save trajectory (absolute poses) as KITTI odometry file format
 
     Args:
-        txt (str): pose text file path
+        txt (str): pose text file path; .npz/.npy for binary format
         poses (dict): poses, each pose is a [4x4] array
         format (str): trajectory format [kitti, tum]. 
             - **kitti**: timestamp [12 parameters]; 
             - **tum**: timestamp tx ty tz qx qy qz qw
     """
-    with open(txt, 'w') as f:
-        for i in poses:
-            pose = poses[i]
-            if format == 'kitti':
-                pose = pose.flatten()[:12]
-                line_to_write = str(i) + " "
-                line_to_write += " ".join([str(j) for j in pose])
-            elif format == 'tum':
-                qw, qx, qy, qz = rot2quat(pose[:3, :3])
-                tx, ty, tz = pose[:3, 3]
-                line_to_write = " ".join([
-                                    str(i), 
-                                    str(tx), str(ty), str(tz),
-                                    str(qx), str(qy), str(qz), str(qw)]
-                                    )
-            f.writelines(line_to_write+"\n")
+    keys, poses_arr = trajectory_io.poses_to_arr(poses)
+    trajectory_io.save_traj(txt, keys, poses_arr, format=format)
     print("Trajectory saved.")
@@ -42,6 +42,26 @@ class Backprojection(nn.Module):
         self.xy = torch.cat([self.xy, self.ones], 1)
         self.xy = nn.Parameter(self.xy, requires_grad=False)
 
+        # rays (inv_K @ xy) of the last intrinsics, reused while the same inv_K tensor is given
+        self.cached_inv_K = None
+        self.cached_version = None
+        self.rays = None
+
+    def get_rays(self, inv_K):
+        """Get the pixel rays, which are recomputed only if a different (or modified) inv_K is given
+
+        Args:
+            inv_K (tensor, [Nx4x4]): inverse camera intrinsics
+
+        Returns:
+            rays (tensor, [Nx3x(HxW)]): pixel rays with unit depth
+        """
+        if inv_K is not self.cached_inv_K or inv_K._version != self.cached_version:
+            self.rays = torch.matmul(inv_K[:, :3, :3], self.xy)
+            self.cached_inv_K = inv_K
+            self.cached_version = inv_K._version
+        return self.rays
+
     def forward(self, depth, inv_K, img_like_out=False):
         """Forward pass
 
@@ -55,11 +75,9 @@ class Backprojection(nn.Module):
         """
         depth = depth.contiguous()
 
-        xy = self.xy.repeat(depth.shape[0], 1, 1)
-        ones = self.ones.repeat(depth.shape[0],1,1)
-        
-        points = torch.matmul(inv_K[:, :3, :3], xy)
-        points = depth.view(depth.shape[0], 1, -1) * points
+        # rays and ones are broadcasted over the batch
+        points = depth.view(depth.shape[0], 1, -1) * self.get_rays(inv_K)
+        ones = self.ones.expand(depth.shape[0], -1, -1)
         points = torch.cat([points, ones], 1)
 
         if img_like_out:
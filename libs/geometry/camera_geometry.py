@@ -0,0 +1,166 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: CameraGeometry precomputes the pixel rays of a camera and provides fused
+    backprojection, reprojection and rigid flow with NumPy (CPU) and PyTorch backends
+'''
+
+import numpy as np
+import torch
+
+
+class CameraGeometry():
+    """CameraGeometry keeps the pixel rays (inv_K @ [x, y, 1]) of a pinhole camera, computed once per (K, H, W).
+    The rays have unit depth (z=1), so that the 3D points are depth * rays.
+
+    Rigid flow and depth warping are fused as depth * (K R rays) + K t followed by the perspective division,
+    which avoids homogeneous coordinates and repeated grids.
+    Each operation takes arrays (NumPy backend) or tensors (PyTorch backend, on the device of the inputs).
+    """
+    def __init__(self, K, height, width, eps=1e-7):
+        """
+        Args:
+            K (array, [3x3] or [4x4]): camera intrinsics
+            height (int): image height
+            width (int): image width
+            eps (float): small number to prevent division of zero
+        """
+        self.K = np.asarray(K, dtype=np.float64)[:3, :3].copy()
+        self.inv_K = np.linalg.inv(self.K)
+        self.height = height
+        self.width = width
+        self.eps = eps
+
+        # homogeneous pixel coordinates and rays, [3x(HxW)]
+        meshgrid = np.meshgrid(range(self.width), range(self.height), indexing='xy')
+        xy = np.stack([meshgrid[0].reshape(-1), meshgrid[1].reshape(-1), np.ones(height * width)], 0)
+        self.grid = xy[:2].reshape(2, height, width).astype(np.float32)
+        self.rays = (self.inv_K @ xy).astype(np.float32)
+
+        # device copies of the rays, grid and intrinsics
+        self.tensors = {}
+
+    def get_tensors(self, device):
+        """Get the rays, grid and intrinsics on a device; copied once per device
+
+        Args:
+            device (torch.device): device
+
+        Returns:
+            a dictionary containing
+                - **rays** (tensor, [1x3x(HxW)]): pixel rays
+                - **grid** (tensor, [1x2xHxW]): pixel coordinates
+                - **K** (tensor, [1x3x3]): camera intrinsics
+        """
+        device = torch.device(device)
+        if device not in self.tensors:
+            self.tensors[device] = {
+                'rays': torch.from_numpy(self.rays).unsqueeze(0).to(device),
+                'grid': torch.from_numpy(self.grid).unsqueeze(0).to(device),
+                'K': torch.from_numpy(self.K).float().unsqueeze(0).to(device),
+            }
+        return self.tensors[device]
+
+    def backproject(self, depth):
+        """Backproject a depth map
+
+        Args:
+            depth (array/tensor, [HxW] or [Nx1xHxW]): depth map
+
+        Returns:
+            points (array/tensor, [3x(HxW)] or [Nx3x(HxW)]): 3D points
+        """
+        if isinstance(depth, np.ndarray):
+            return depth.reshape(1, -1) * self.rays
+        rays = self.get_tensors(depth.device)['rays']
+        return depth.reshape(depth.shape[0], 1, -1) * rays
+
+    def project_transformed(self, depth, T):
+        """Fused backprojection, transformation and projection, in homogeneous image coordinates
+
+        Args:
+            depth (array/tensor, [HxW] or [Nx1xHxW]): depth map
+            T (array/tensor, [4x4] or [Nx4x4]): transformation matrice
+
+        Returns:
+            points2d (array/tensor, [3x(HxW)] or [Nx3x(HxW)]): projected points before the perspective division
+        """
+        if isinstance(depth, np.ndarray):
+            KT = self.K @ np.asarray(T, dtype=np.float64)[:3, :]
+            KR_rays = (KT[:, :3] @ self.rays).astype(np.float32)
+            return depth.reshape(1, -1) * KR_rays + KT[:, 3:].astype(np.float32)
+
+        tensors = self.get_tensors(depth.device)
+        KT = torch.matmul(tensors['K'], T[:, :3, :])
+        KR_rays = torch.matmul(KT[:, :, :3], tensors['rays'])
+        return depth.reshape(depth.shape[0], 1, -1) * KR_rays + KT[:, :, 3:]
+
+    def reproject(self, depth, T, normalized=True):
+        """Transform pixel coordinates from one view to another view given depth and transformation
+
+        Args:
+            depth (array/tensor, [HxW] or [Nx1xHxW]): depth map
+            T (array/tensor, [4x4] or [Nx4x4]): transformation matrice
+            normalized (bool):
+
+                - True: normalized to [-1, 1]
+                - False: [0, W-1] and [0, H-1]
+
+        Returns:
+            xy (array/tensor, [HxWx2] or [NxHxWx2]): pixel coordinates
+        """
+        points2d = self.project_transformed(depth, T)
+        if isinstance(points2d, np.ndarray):
+            xy = points2d[:2] / (points2d[2:3] + self.eps)
+            xy = xy.reshape(2, self.height, self.width).transpose(1, 2, 0)
+        else:
+            xy = points2d[:, :2] / (points2d[:, 2:3] + self.eps)
+            xy = xy.view(-1, 2, self.height, self.width).permute(0, 2, 3, 1)
+
+        if normalized:
+            scale = np.array([self.width - 1, self.height - 1], dtype=np.float32)
+            if not isinstance(xy, np.ndarray):
+                scale = xy.new_tensor(scale)
+            xy = (xy / scale - 0.5) * 2
+        return xy
+
+    def rigid_flow(self, depth, T):
+        """Rigid flow given depth and camera motion
+
+        Args:
+            depth (array/tensor, [HxW] or [Nx1xHxW]): depth map
+            T (array/tensor, [4x4] or [Nx4x4]): transformation matrice
+
+        Returns:
+            flow (array/tensor, [2xHxW] or [Nx2xHxW]): rigid flow
+        """
+        points2d = self.project_transformed(depth, T)
+        if isinstance(points2d, np.ndarray):
+            xy = points2d[:2] / (points2d[2:3] + self.eps)
+            return xy.reshape(2, self.height, self.width) - self.grid
+
+        xy = points2d[:, :2] / (points2d[:, 2:3] + self.eps)
+        grid = self.get_tensors(depth.device)['grid']
+        return xy.view(-1, 2, self.height, self.width) - grid
+
+
+# geometry shared by the layers and trackers, {(K, height, width): CameraGeometry}
+_camera_geometries = {}
+
+
+def get_camera_geometry(K, height, width):
+    """Get the shared CameraGeometry of a camera; created on first use
+
+    Args:
+        K (array, [3x3] or [4x4]): camera intrinsics
+        height (int): image height
+        width (int): image width
+
+    Returns:
+        geometry (CameraGeometry): camera geometry
+    """
+    K = np.asarray(K, dtype=np.float64)[:3, :3]
+    key = (K.tobytes(), height, width)
+    if key not in _camera_geometries:
+        _camera_geometries[key] = CameraGeometry(K, height, width)
+    return _camera_geometries[key]
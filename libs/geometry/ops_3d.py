@@ -12,7 +12,7 @@ import cv2
 import numpy as np
 
 
-def convert_sparse3D_to_depth(kp, XYZ, height, width):
+def convert_sparse3D_to_depth(kp, XYZ, height, width, out=None):
     """Convert sparse 3D keypoint to depth map
 
     Args:
@@ -20,12 +20,13 @@ def convert_sparse3D_to_depth(kp, XYZ, height, width):
         XYZ (array, [3xN]): 3D coorindates for the keypoints
         height (int): image height
         width (int): image width
+        out (array, [HxW]): zero-filled output buffer; allocated if None
     
     Returns:
         depth (array, [HxW]): depth map
     """
     # initialize depth map
-    depth = np.zeros((height, width))
+    depth = np.zeros((height, width)) if out is None else out
     kp_int = kp.astype(np.int)
 
     # remove out of region keypoints
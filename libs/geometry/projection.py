@@ -44,10 +44,24 @@ class Projection(nn.Module):
         """
         # projection
         points2d = torch.matmul(K[:, :3, :], points3d)
+        return self.to_pixels(points2d, normalized)
 
+    def to_pixels(self, points2d, normalized=True):
+        """Convert projected points from homogeneous coordinates to pixel coordinates
+
+        Args:
+            points2d (tensor, [Nx3x(HxW)]): projected points in homogeneous coordinates
+            normalized (bool): 
+                
+                - True: normalized to [-1, 1]
+                - False: [0, W-1] and [0, H-1]
+        
+        Returns:
+            xy (tensor, [NxHxWx2]): pixel coordinates
+        """
         # convert from homogeneous coordinates
         xy = points2d[:, :2, :] / (points2d[:, 2:3, :] + self.eps)
-        xy = xy.view(points3d.shape[0], 2, self.height, self.width)
+        xy = xy.view(points2d.shape[0], 2, self.height, self.width)
         xy = xy.permute(0, 2, 3, 1)
 
         # normalization
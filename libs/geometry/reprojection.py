@@ -50,7 +50,10 @@ class Reprojection(nn.Module):
         Returns:
             xy (NxHxWx2): pixel coordinates
         """
-        points3d = self.backproj(depth, inv_K)
-        points3d_trans = self.transform(points3d, T)
-        xy = self.project(points3d_trans, K, normalized) 
+        # fused as depth * (K R rays) + K t, without homogeneous 3D points
+        rays = self.backproj.get_rays(inv_K)
+        KT = torch.matmul(K[:, :3, :3], T[:, :3, :])
+        points2d = torch.matmul(KT[:, :, :3], rays)
+        points2d = depth.reshape(depth.shape[0], 1, -1) * points2d + KT[:, :, 3:]
+        xy = self.project.to_pixels(points2d, normalized)
         return xy
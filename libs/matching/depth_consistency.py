@@ -8,12 +8,10 @@
 @Description: DepthConsistency computes depth consistency between depth maps
 '''
 
-import numpy as np
 import torch
 import torch.nn.functional as nnFunc
 
-from libs.geometry.backprojection import Backprojection
-from libs.geometry.reprojection import Reprojection
+from libs.geometry.camera_geometry import get_camera_geometry
 
 class DepthConsistency():
     """DepthConsistency computes depth consistency between depth maps
@@ -23,46 +21,36 @@ class DepthConsistency():
         self.cfg = cfg
         self.cam_intrinsics = cam_intrinsics
 
-        # Deep layers
+        # Camera geometry (pixel rays), shared with the trackers
         h, w = self.cfg.image.height, self.cfg.image.width
-        self.backproj = Backprojection(h, w).cuda()
-        self.reproj = Reprojection(h, w).cuda()
+        self.geometry = get_camera_geometry(self.cam_intrinsics.mat, h, w)
 
     def prepare_depth_consistency_data(self, cur_data, ref_data):
         """Prepare data for computing depth consistency
         
         Returns:
             a dictionary containing
-                - **inv_K** (tensor, [1x4x4]): inverse camera intrinsics
-                - **K** (tensor, [1x4x4]): camera intrinsics
                 - **depth** (tensor, 1x1xHxW): depth map
                 - **pose_T** (tensor, [1x4x4]): relative pose
                 - **cur_id** (int): index of current frame
                 - **ref_id** (int): index of reference frame
+                - **tensors** (FrameTensors): device tensors of reference frame
         """
         data = {}
-
-        # camera intrinsics
-        data[('inv_K')] = np.eye(4)
-        data[('inv_K')][:3, :3] = self.cam_intrinsics.inv_mat
-        data[('inv_K')] = torch.from_numpy(data[('inv_K')]).unsqueeze(0).float().cuda()
-
-        data[('K')] = np.eye(4)
-        data[('K')][:3, :3] = self.cam_intrinsics.mat
-        data[('K')] = torch.from_numpy(data[('K')]).unsqueeze(0).float().cuda()
+        data['tensors'] = ref_data['tensors']
 
         # current depth
-        data[('depth', cur_data['id'])] = torch.from_numpy(cur_data['raw_depth']).unsqueeze(0).unsqueeze(0).float().cuda()
+        data[('depth', cur_data['id'])] = cur_data['tensors'].get('raw_depth', cur_data['raw_depth'])[None, None]
 
         # id
         data['cur_id'] = cur_data['id']
         data['ref_id'] = ref_data['id']
 
         # reference depth
-        data[('depth', data['ref_id'])] = torch.from_numpy(ref_data['raw_depth']).unsqueeze(0).unsqueeze(0).float().cuda()
+        data[('depth', data['ref_id'])] = ref_data['tensors'].get('raw_depth', ref_data['raw_depth'])[None, None]
 
         # pose
-        data[('pose_T', cur_data['id'], data['ref_id'])] = torch.from_numpy(ref_data['deep_pose']).unsqueeze(0).float().cuda()
+        data[('pose_T', cur_data['id'], data['ref_id'])] = ref_data['tensors'].get('deep_pose', ref_data['deep_pose'])[None]
         
         return data
 
@@ -74,8 +62,6 @@ class DepthConsistency():
         Args:
             inputs (dict): a dictionary containing
 
-                - **inv_K** (tensor, [1x4x4]): inverse camera intrinsics
-                - **K** (tensor, [1x4x4]): camera intrinsics
                 - **depth** (tensor, 1x1xHxW): depth map
                 - **pose_T** (tensor, [1x4x4]): relative pose
                 - **cur_id** (int): index of current frame
@@ -87,12 +73,10 @@ class DepthConsistency():
                 - **('reproj_depth', cur_id, ref_id)** (tensor, [1x1xHxW]): transformed current depth map
         """
         outputs = {}
-        K = inputs['K']
-        inv_K = inputs['inv_K']
 
         # Get depth and 3D points of frame_0
         cur_depth = inputs[('depth', inputs['cur_id'])]
-        cam_points = self.backproj(cur_depth, inv_K)
+        cam_points = self.geometry.backproject(cur_depth)
 
 
         n, _, h, w = cur_depth.shape
@@ -100,7 +84,7 @@ class DepthConsistency():
         T = inputs[("pose_T", inputs['cur_id'], inputs['ref_id'])]
 
         # reprojection
-        reproj_xy = self.reproj(cur_depth, T, K, inv_K)
+        reproj_xy = self.geometry.reproject(cur_depth, T)
 
         # Warp src depth to tgt ref view
         outputs[('warp_depth', inputs['cur_id'], inputs['ref_id'])] = nnFunc.grid_sample(
@@ -109,9 +93,9 @@ class DepthConsistency():
             padding_mode="border")
             
         # Reproject cur_depth
-        transformed_cam_points = torch.matmul(T[:, :3, :], cam_points)
-        transformed_cam_points = transformed_cam_points.view(n, 3, h, w)
-        proj_depth = transformed_cam_points[:, 2:, :, :]
+        # only the depth (z) of the transformed points is needed
+        proj_depth = torch.matmul(T[:, 2:3, :3], cam_points) + T[:, 2:3, 3:]
+        proj_depth = proj_depth.view(n, 1, h, w)
         outputs[('reproj_depth', inputs['cur_id'], inputs['ref_id'])] = proj_depth
         return outputs
 
@@ -128,6 +112,7 @@ class DepthConsistency():
             
                 - **cur_id** (int): index of current frame
                 - **ref_id** (int): index of reference frame
+                - **tensors** (FrameTensors): device tensors of reference frame
         
         Returns:
             outputs (dict), a dictionary containing
@@ -141,11 +126,10 @@ class DepthConsistency():
         method = "depth_ratio"
         if method == "sc":
             depth_sum = (warp_depth + reproj_depth).abs()
-            depth_diff = (depth_diff / depth_sum).clamp(0, 1).cpu().numpy()[0,0]
+            depth_diff = (depth_diff / depth_sum).clamp(0, 1)
         elif method == "depth_ratio":
-            depth_diff = (depth_diff / reproj_depth).clamp(0, 1).cpu().numpy()[0,0]
-        else:
-            depth_diff = depth_diff.cpu().numpy()[0,0]
+            depth_diff = (depth_diff / reproj_depth).clamp(0, 1)
+        depth_diff = inputs['tensors'].to_numpy(depth_diff, 'depth_diff')[0, 0]
 
         outputs[('depth_diff', inputs['cur_id'], inputs['ref_id'])] = depth_diff
         return outputs
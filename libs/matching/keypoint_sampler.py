@@ -9,21 +9,26 @@
 '''
 
 
+import cv2
 import numpy as np
 
 from .kp_selection import *
+from libs.general.buffer_pool import buffer_pool
+from libs.general.profiler import profile_scope, profiled
 from libs.general.utils import image_grid
 from libs.geometry.camera_modules import SE3
 
 class KeypointSampler():
     """KeypointSampler is an interface for keypoint sampling 
     """
-    def __init__(self, cfg):
+    def __init__(self, cfg, timers=None):
         """
         Args:
             cfg (edict): configuration dictionary
+            timers (Profiler): profiler
         """
         self.cfg = cfg
+        self.timers = timers
         self.kps = {}
 
         # generate uniform kp list
@@ -101,44 +106,49 @@ class KeypointSampler():
         kp1 = image_grid(h, w)
         kp1 = np.expand_dims(kp1, 0)
         tmp_flow_data = np.transpose(np.expand_dims(ref_data['flow'], 0), (0, 2, 3, 1))
-        kp2 = kp1 + tmp_flow_data
-
-        """ best-N selection """
-        if self.cfg.kp_selection.local_bestN.enable:
-            kp_sel_method = local_bestN
-            outputs.update(
-                kp_sel_method(
-                    kp1=kp1,
-                    kp2=kp2,
-                    ref_data=ref_data,
-                    cfg=self.cfg,
-                    outputs=outputs
+        # dense keypoint map from the buffer pool; selected keypoints are copies
+        with buffer_pool.buffer(kp1.shape, np.float32) as kp2:
+            np.add(kp1, tmp_flow_data, out=kp2)
+
+            """ best-N selection """
+            if self.cfg.kp_selection.local_bestN.enable:
+                kp_sel_method = local_bestN
+                with profile_scope(self.timers, 'local_bestN'):
+                    outputs.update(
+                        kp_sel_method(
+                            kp1=kp1,
+                            kp2=kp2,
+                            ref_data=ref_data,
+                            cfg=self.cfg,
+                            outputs=outputs
+                            )
                     )
-            )
-        elif self.cfg.kp_selection.bestN.enable:
-            kp_sel_method = bestN_flow_kp
-            outputs.update(
-                kp_sel_method(
-                    kp1=kp1,
-                    kp2=kp2,
-                    ref_data=ref_data,
-                    cfg=self.cfg,
-                    outputs=outputs
+            elif self.cfg.kp_selection.bestN.enable:
+                kp_sel_method = bestN_flow_kp
+                with profile_scope(self.timers, 'bestN'):
+                    outputs.update(
+                        kp_sel_method(
+                            kp1=kp1,
+                            kp2=kp2,
+                            ref_data=ref_data,
+                            cfg=self.cfg,
+                            outputs=outputs
+                            )
                     )
-            )
 
-        """ sampled kp selection """
-        if self.cfg.kp_selection.sampled_kp.enable:
-            outputs.update(
-                sampled_kp(
-                    kp1=kp1,
-                    kp2=kp2,
-                    ref_data=ref_data,
-                    kp_list=self.kps['uniform'],
-                    cfg=self.cfg,
-                    outputs=outputs
-                    )
-        )  
+            """ sampled kp selection """
+            if self.cfg.kp_selection.sampled_kp.enable:
+                with profile_scope(self.timers, 'sampled_kp'):
+                    outputs.update(
+                        sampled_kp(
+                            kp1=kp1,
+                            kp2=kp2,
+                            ref_data=ref_data,
+                            kp_list=self.kps['uniform'],
+                            cfg=self.cfg,
+                            outputs=outputs
+                            )
+                )  
 
         return outputs
 
@@ -161,4 +171,34 @@ class KeypointSampler():
         if self.cfg.kp_selection.sampled_kp.enable:
             ref_data['kp_list'] = kp_sel_outputs['kp1_list'][0]
             cur_data['kp_list'] = kp_sel_outputs['kp2_list'][0]
-        
\ No newline at end of file
+        
+    @profiled('kp_refinement')
+    def refine_kp(self, cur_data, ref_data):
+        """Refine the selected keypoints of the current view with pyramidal Lucas-Kanade.
+        It recovers sub-pixel accuracy lost when flows are predicted at a reduced scale.
+
+        Args:
+            cur_data (dict): data of current frame
+            ref_data (dict): data of reference frame
+        """
+        refine_cfg = self.cfg.deep_flow.kp_refinement
+        
+        # refinements larger than 2 pixels at the flow inference scale are rejected
+        max_shift = 2. / self.cfg.deep_flow.inference_scale
+
+        ref_gray = cv2.cvtColor(ref_data['img'], cv2.COLOR_RGB2GRAY)
+        cur_gray = cv2.cvtColor(cur_data['img'], cv2.COLOR_RGB2GRAY)
+        kp_names = []
+        if self.cfg.kp_selection.local_bestN.enable or self.cfg.kp_selection.bestN.enable:
+            kp_names.append('kp_best')
+        if self.cfg.kp_selection.sampled_kp.enable:
+            kp_names.append('kp_list')
+
+        for kp_name in kp_names:
+            cur_data[kp_name] = refine_kp_lk(
+                                    ref_gray, cur_gray,
+                                    ref_data[kp_name], cur_data[kp_name],
+                                    window_size=refine_cfg.window_size,
+                                    max_level=refine_cfg.max_level,
+                                    max_shift=max_shift
+                                    )
@@ -8,6 +8,7 @@
 @Description: this file contains different correspondence selection methods
 '''
 
+import cv2
 import math
 import numpy as np
 
@@ -376,3 +377,35 @@ def sampled_kp(kp1, kp2, ref_data, kp_list, cfg, outputs):
     outputs['kp1_list'] = kp1_list
     outputs['kp2_list'] = kp2_list
     return outputs
+
+
+def refine_kp_lk(img1, img2, kp1, kp2, window_size, max_level, max_shift):
+    """Refine keypoint correspondences with pyramidal Lucas-Kanade,
+    using the flow-based correspondences as initialization
+
+    Args:
+        img1 (array, [HxW]): gray image of view-1
+        img2 (array, [HxW]): gray image of view-2
+        kp1 (array, [Nx2]): keypoints on view-1
+        kp2 (array, [Nx2]): keypoints on view-2 (initialization)
+        window_size (int): search window size
+        max_level (int): number of pyramid levels
+        max_shift (float): refinements moving a keypoint further than max_shift (pixel) are rejected
+
+    Returns:
+        kp2 (array, [Nx2]): refined keypoints on view-2
+    """
+    init_kp2 = kp2.reshape(-1, 1, 2).astype(np.float32)
+    refined_kp2, status, _ = cv2.calcOpticalFlowPyrLK(
+                                img1, img2,
+                                kp1.reshape(-1, 1, 2).astype(np.float32),
+                                init_kp2.copy(),
+                                winSize=(window_size, window_size),
+                                maxLevel=max_level,
+                                flags=cv2.OPTFLOW_USE_INITIAL_FLOW)
+
+    # keep the initialization if tracking fails or drifts
+    shift = np.linalg.norm(refined_kp2 - init_kp2, axis=2)
+    valid = (status == 1) & (shift < max_shift)
+    refined_kp2 = np.where(valid[..., None], refined_kp2, init_kp2)
+    return refined_kp2.reshape(-1, 2).astype(kp2.dtype)
@@ -12,14 +12,15 @@ import cv2
 import copy
 import multiprocessing as mp
 import numpy as np
-from sklearn import linear_model
 import torch
 
 
 from .gric import *
+from libs.geometry.camera_geometry import get_camera_geometry
 from libs.geometry.camera_modules import SE3
 from libs.geometry.ops_3d import *
-from libs.geometry.rigid_flow import RigidFlow
+from libs.general.buffer_pool import buffer_pool
+from libs.general.profiler import profiled
 from libs.general.utils import image_shape, image_grid
 from libs.matching.kp_selection import opt_rigid_flow_kp
 
@@ -127,7 +128,7 @@ class EssTracker():
         Args:
             cfg (edict): configuration dictionary
             cam_intrinsics (Intrinsics): camera intrinsics
-            timers (Timer): timers
+            timers (Profiler): profiler
         """
         self.cfg = cfg
         self.prev_scale = 0
@@ -138,17 +139,11 @@ class EssTracker():
         # if self.cfg.use_multiprocessing:
         #     self.p = mp.Pool(2)
         
-        # Rigid flow data
+        # camera geometry (pixel rays) is shared with other modules; computed on GPU if available
         if self.cfg.kp_selection.rigid_flow_kp.enable:
-            self.K = np.eye(4)
-            self.inv_K = np.eye(4)
-            self.K[:3, :3] = cam_intrinsics.mat
-            self.inv_K[:3, :3] = cam_intrinsics.inv_mat
-            self.K = torch.from_numpy(self.K).float().unsqueeze(0).cuda()
-            self.inv_K = torch.from_numpy(self.inv_K).float().unsqueeze(0).cuda()
-            self.rigid_flow_layer = RigidFlow(self.cfg.image.height, self.cfg.image.width).cuda()
+            self.geometry = get_camera_geometry(cam_intrinsics.mat, self.cfg.image.height, self.cfg.image.width)
+            self.geometry_device = torch.device('cuda') if torch.cuda.is_available() else None
         
-        # FIXME: For debug
         self.timers = timers
 
     def compute_pose_2d2d(self, kp_ref, kp_cur, is_iterative):
@@ -194,8 +189,8 @@ class EssTracker():
                         )
         elif valid_cfg.method == "GRIC":
             if kp_cur.shape[0] > 10:
-                self.timers.start('GRIC-H', 'E-tracker')
-                self.timers.start('find H', 'E-tracker')
+                self.timers.start('GRIC-H')
+                self.timers.start('find H')
                 H, H_inliers = cv2.findHomography(
                             kp_cur,
                             kp_ref,
@@ -219,7 +214,7 @@ class EssTracker():
         
         if valid_case:
             num_valid_case = 0
-            self.timers.start('find-Ess (full)', 'E-tracker')
+            self.timers.start('find-Ess (full)')
             for i in range(max_ransac_iter): # repeat ransac for several times for stable result
                 # shuffle kp_cur and kp_ref (only useful when random seed is fixed)	
                 new_list = np.arange(0, kp_cur.shape[0], 1)	
@@ -227,7 +222,7 @@ class EssTracker():
                 new_kp_cur = kp_cur.copy()[new_list]
                 new_kp_ref = kp_ref.copy()[new_list]
 
-                self.timers.start('find-Ess', 'E-tracker')
+                self.timers.start('find-Ess')
                 E, inliers = cv2.findEssentialMat(
                             new_kp_cur,
                             new_kp_ref,
@@ -256,7 +251,7 @@ class EssTracker():
                     # inlier check
                     inlier_check = inliers.sum() > best_inlier_cnt and cheirality_cnt > kp_cur.shape[0]*0.05               
                 elif valid_cfg.method == "GRIC":
-                    self.timers.start('GRIC-E', 'E-tracker')
+                    self.timers.start('GRIC-E')
                     # get F from E
                     K = self.cam_intrinsics.mat
                     F = np.linalg.inv(K.T) @ E @ np.linalg.inv(K)
@@ -288,7 +283,7 @@ class EssTracker():
             self.timers.end('find-Ess (full)')
             major_valid = num_valid_case > (max_ransac_iter/2)
             if major_valid:
-                self.timers.start('recover pose', 'E-tracker')
+                self.timers.start('recover pose')
                 cheirality_cnt, R, t, _ = cv2.recoverPose(best_E, kp_cur, kp_ref,
                                         focal=self.cam_intrinsics.fx,
                                         pp=principal_points,
@@ -347,8 +342,8 @@ class EssTracker():
     #                     )
 
     #     elif valid_cfg.method == "GRIC":
-    #         self.timers.start('GRIC-H', 'E-tracker')
-    #         self.timers.start('find H', 'E-tracker')
+    #         self.timers.start('GRIC-H')
+    #         self.timers.start('find H')
     #         H, H_inliers = cv2.findHomography(
     #                     kp_cur,
     #                     kp_ref,
@@ -419,6 +414,7 @@ class EssTracker():
     #     outputs = {"pose": pose, "inliers": best_inliers[:, 0]==1}
     #     return outputs
 
+    @profiled('rigid_flow_kp')
     def compute_rigid_flow_kp(self, cur_data, ref_data, pose):
         """compute keypoints from optical-rigid flow consistency
 
@@ -594,27 +590,29 @@ class EssTracker():
         kp2_norm[:, 1] = \
             (kp2[:, 1] - self.cam_intrinsics.cy) / self.cam_intrinsics.fy
 
-        self.timers.start('triangulation', 'scale_recovery')
+        self.timers.start('triangulation')
         _, _, X2_tri = triangulation(kp1_norm, kp2_norm, np.eye(4), T_21)
 
-        # Triangulation outlier removal
-        depth2_tri = convert_sparse3D_to_depth(kp2, X2_tri, img_h, img_w)
-        depth2_tri[depth2_tri < 0] = 0
-        self.timers.end('triangulation')
+        # Triangulation outlier removal; the dense depth map is from the buffer pool
+        with buffer_pool.buffer((img_h, img_w), np.float64, zero=True) as depth2_tri:
+            convert_sparse3D_to_depth(kp2, X2_tri, img_h, img_w, out=depth2_tri)
+            depth2_tri[depth2_tri < 0] = 0
+            self.timers.end('triangulation')
 
-        # common mask filtering
-        non_zero_mask_pred2 = (depth2 > 0)
-        non_zero_mask_tri2 = (depth2_tri > 0)
-        valid_mask2 = non_zero_mask_pred2 * non_zero_mask_tri2
+            # common mask filtering
+            non_zero_mask_pred2 = (depth2 > 0)
+            non_zero_mask_tri2 = (depth2_tri > 0)
+            valid_mask2 = non_zero_mask_pred2 * non_zero_mask_tri2
 
-        depth_pred_non_zero = np.concatenate([depth2[valid_mask2]])
-        depth_tri_non_zero = np.concatenate([depth2_tri[valid_mask2]])
-        depth_ratio = depth_tri_non_zero / depth_pred_non_zero
+            depth_pred_non_zero = np.concatenate([depth2[valid_mask2]])
+            depth_tri_non_zero = np.concatenate([depth2_tri[valid_mask2]])
+            depth_ratio = depth_tri_non_zero / depth_pred_non_zero
         
         # Estimate scale (ransac)
         if valid_mask2.sum() > 10:
             # RANSAC scaling solver
-            self.timers.start('scale ransac', 'scale_recovery')
+            self.timers.start('scale ransac')
+            from sklearn import linear_model  # deferred, sklearn import is slow
             ransac = linear_model.RANSACRegressor(
                         base_estimator=linear_model.LinearRegression(
                             fit_intercept=False),
@@ -642,6 +640,7 @@ class EssTracker():
        
         return scale
 
+    @profiled('kp_good_depth')
     def kp_selection_good_depth(self, cur_data, ref_data, rigid_kp_score_method):
         """Choose valid kp from a series of operations
 
@@ -665,41 +664,42 @@ class EssTracker():
         kp1 = image_grid(h, w)
         kp1 = np.expand_dims(kp1, 0)
         tmp_flow_data = np.transpose(np.expand_dims(ref_data['flow'], 0), (0, 2, 3, 1))
-        kp2 = kp1 + tmp_flow_data
-
-        """ opt-rigid flow consistent kp selection """
-        if self.cfg.kp_selection.rigid_flow_kp.enable:
-            # compute rigid flow
-            rigid_flow_pose = ref_data['rigid_flow_pose'].pose
-
-            # Compute rigid flow
-            pose_tensor = torch.from_numpy(rigid_flow_pose).float().unsqueeze(0).cuda()
-            depth = torch.from_numpy(ref_data['raw_depth']).float().unsqueeze(0).unsqueeze(0).cuda()
-            rigid_flow_tensor = self.rigid_flow_layer(
-                                depth,
-                                pose_tensor,
-                                self.K,
-                                self.inv_K,
-                                normalized=False,
-            )
-            rigid_flow = rigid_flow_tensor.detach().cpu().numpy()[0]
-
-            # compute optical-rigid flow difference
-            rigid_flow_diff = np.linalg.norm(
-                                rigid_flow - ref_data['flow'],
-                                axis=0)
-            ref_data['rigid_flow_diff'] = np.expand_dims(rigid_flow_diff, 2)
-
-            # get depth-flow consistent kp
-            outputs.update(
-                    opt_rigid_flow_kp(
-                        kp1=kp1,
-                        kp2=kp2,
-                        ref_data=ref_data,
-                        cfg=self.cfg,
-                        outputs=outputs,
-                        score_method=rigid_kp_score_method
-                        )
-                )
+        # dense keypoint map from the buffer pool; selected keypoints are copies
+        with buffer_pool.buffer(kp1.shape, np.float32) as kp2:
+            np.add(kp1, tmp_flow_data, out=kp2)
+
+            """ opt-rigid flow consistent kp selection """
+            if self.cfg.kp_selection.rigid_flow_kp.enable:
+                # compute rigid flow
+                rigid_flow_pose = ref_data['rigid_flow_pose'].pose
+
+                # Compute rigid flow and optical-rigid flow difference (written into the frame buffer);
+                # on the device with the frame tensors if GPU is available, otherwise with the NumPy backend
+                rigid_flow_diff = ref_data.get_buffer('rigid_flow_diff', (h, w, 1))
+                if self.geometry_device is not None:
+                    frame_tensors = ref_data['tensors']
+                    pose_tensor = frame_tensors.get('rigid_flow_pose', rigid_flow_pose)[None]
+                    depth = frame_tensors.get('raw_depth', ref_data['raw_depth'])[None, None]
+                    flow = frame_tensors.get('flow', ref_data['flow'])
+                    rigid_flow = self.geometry.rigid_flow(depth, pose_tensor)[0]
+                    frame_tensors.to_numpy(torch.norm(rigid_flow - flow, dim=0), 'rigid_flow_diff',
+                                           out=rigid_flow_diff[:, :, 0])
+                else:
+                    rigid_flow = self.geometry.rigid_flow(ref_data['raw_depth'], rigid_flow_pose)
+                    flow_err = rigid_flow - ref_data['flow']
+                    np.hypot(flow_err[0], flow_err[1], out=rigid_flow_diff[:, :, 0])
+                ref_data['rigid_flow_diff'] = rigid_flow_diff
+
+                # get depth-flow consistent kp
+                outputs.update(
+                        opt_rigid_flow_kp(
+                            kp1=kp1,
+                            kp2=kp2,
+                            ref_data=ref_data,
+                            cfg=self.cfg,
+                            outputs=outputs,
+                            score_method=rigid_kp_score_method
+                            )
+                    )
 
         return outputs
@@ -0,0 +1,169 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: KeyframeSelector decides whether a frame is fully processed based on a cheap parallax estimate
+'''
+
+import copy
+import cv2
+import numpy as np
+
+from libs.geometry.camera_modules import SE3
+
+
+def interpolate_pose(pose1, pose2, ratio):
+    """Interpolate between two poses; rotation is spherically interpolated and translation is linearly interpolated
+
+    Args:
+        pose1 (SE3): pose at ratio=0
+        pose2 (SE3): pose at ratio=1
+        ratio (float): interpolation ratio
+
+    Returns:
+        pose (SE3): interpolated pose
+    """
+    rel_rot = cv2.Rodrigues(pose1.R.T @ pose2.R)[0]
+    pose = SE3()
+    pose.R = pose1.R @ cv2.Rodrigues(rel_rot * ratio)[0]
+    pose.t = pose1.t + (pose2.t - pose1.t) * ratio
+    return pose
+
+
+class KeyframeSelector():
+    """KeyframeSelector estimates the parallax between the current frame and the last keyframe cheaply.
+    Frames with small parallax are not keyframes; they skip deep inference and tracking,
+    and their poses are interpolated between the neighbouring keyframes.
+
+    Parallax estimation methods
+
+        - lk: median sparse LK flow between the downscaled keyframe and current images
+        - motion: parallax per frame of the last tracked keyframe pair (median optical flow), times the frame gap
+    """
+    def __init__(self, cfg):
+        """
+        Args:
+            cfg (edict): keyframe configuration
+        """
+        self.cfg = cfg
+        self.keyframe = None
+        self.skipped = []
+
+        # lk: keyframe image and keypoints at the downscaled resolution
+        self.ref_gray = None
+        self.ref_pts = None
+
+        # motion: parallax per frame of the last keyframe pair
+        self.parallax_rate = None
+
+    def downscale_gray(self, img):
+        """Convert image to downscaled grayscale image
+
+        Args:
+            img (array, [HxWx3]): RGB image
+
+        Returns:
+            gray (array, [hxw]): downscaled grayscale image
+        """
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(gray, None, fx=self.cfg.scale, fy=self.cfg.scale, interpolation=cv2.INTER_AREA)
+
+    def set_keyframe(self, img, img_id, timestamp, pose):
+        """Set a processed frame as the reference keyframe
+
+        Args:
+            img (array, [HxWx3]): RGB image
+            img_id (int): frame index
+            timestamp (float): frame timestamp
+            pose (SE3): global pose of the frame
+        """
+        self.keyframe = {'id': img_id, 'timestamp': timestamp, 'pose': copy.deepcopy(pose)}
+        if self.cfg.enable and self.cfg.method == 'lk':
+            self.ref_gray = self.downscale_gray(img)
+            self.ref_pts = cv2.goodFeaturesToTrack(self.ref_gray, maxCorners=200, qualityLevel=0.01, minDistance=7)
+
+    def update_motion(self, flow, num_frames):
+        """Update the parallax per frame with the optical flow of the last tracked keyframe pair
+
+        Args:
+            flow (array, [2xHxW]): optical flow between the keyframes
+            num_frames (int): number of frames between the keyframes
+        """
+        if flow is not None:
+            magnitude = np.linalg.norm(flow[:, ::8, ::8], axis=0)
+            self.parallax_rate = np.median(magnitude) / max(num_frames, 1)
+
+    def estimate_parallax(self, img, img_id):
+        """Estimate parallax between the keyframe and the current frame
+
+        Args:
+            img (array, [HxWx3]): RGB image
+            img_id (int): frame index
+
+        Returns:
+            parallax (float): median parallax in pixel (image resolution); inf if it cannot be estimated
+        """
+        if self.cfg.method == 'lk':
+            if self.ref_pts is None or len(self.ref_pts) < self.cfg.min_points:
+                return np.inf
+            cur_gray = self.downscale_gray(img)
+            cur_pts, status, _ = cv2.calcOpticalFlowPyrLK(self.ref_gray, cur_gray, self.ref_pts, None)
+            valid = status[:, 0] == 1
+            if valid.sum() < self.cfg.min_points:
+                return np.inf
+            displacement = np.linalg.norm(cur_pts[valid] - self.ref_pts[valid], axis=-1)
+            return np.median(displacement) / self.cfg.scale
+        elif self.cfg.method == 'motion':
+            if self.parallax_rate is None:
+                return np.inf
+            return self.parallax_rate * (img_id - self.keyframe['id'])
+        else:
+            assert False, "Wrong keyframe parallax method [{}] is used.".format(self.cfg.method)
+
+    def is_keyframe(self, img, img_id, is_last=False):
+        """Decide if the current frame is a keyframe
+
+        Args:
+            img (array, [HxWx3]): RGB image
+            img_id (int): frame index
+            is_last (bool): the frame is the last frame of the sequence, which is always a keyframe
+
+        Returns:
+            is_keyframe (bool): True if the frame should be fully processed
+        """
+        if not self.cfg.enable or self.keyframe is None or is_last:
+            return True
+        if len(self.skipped) >= self.cfg.max_skip:
+            return True
+        return self.estimate_parallax(img, img_id) >= self.cfg.min_parallax
+
+    def skip(self, img_id, timestamp):
+        """Record a non-keyframe, whose pose is interpolated after the next keyframe is tracked
+
+        Args:
+            img_id (int): frame index
+            timestamp (float): frame timestamp
+        """
+        self.skipped.append({'id': img_id, 'timestamp': timestamp})
+
+    def interpolate_skipped_poses(self, pose, img_id, timestamp):
+        """Interpolate the poses of the skipped frames between the keyframe and the current keyframe,
+        according to the timestamps (frame indexes if the timestamps are identical)
+
+        Args:
+            pose (SE3): global pose of the current keyframe
+            img_id (int): frame index of the current keyframe
+            timestamp (float): timestamp of the current keyframe
+
+        Returns:
+            poses (dict): interpolated global poses of the skipped frames, each element is **frame index** (SE3)
+        """
+        poses = {}
+        for frame in self.skipped:
+            duration = timestamp - self.keyframe['timestamp']
+            if duration != 0:
+                ratio = (frame['timestamp'] - self.keyframe['timestamp']) / duration
+            else:
+                ratio = (frame['id'] - self.keyframe['id']) / (img_id - self.keyframe['id'])
+            poses[frame['id']] = interpolate_pose(self.keyframe['pose'], pose, ratio)
+        self.skipped = []
+        return poses
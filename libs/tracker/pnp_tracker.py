@@ -13,9 +13,11 @@ import copy
 import numpy as np
 import torch
 
+from libs.geometry.camera_geometry import get_camera_geometry
 from libs.geometry.camera_modules import SE3
 from libs.geometry.ops_3d import unprojection_kp
-from libs.geometry.rigid_flow import RigidFlow
+from libs.general.buffer_pool import buffer_pool
+from libs.general.profiler import profiled
 from libs.general.utils import image_grid
 from libs.matching.kp_selection import opt_rigid_flow_kp
 
@@ -23,25 +25,23 @@ from libs.matching.kp_selection import opt_rigid_flow_kp
 class PnpTracker():
     """ PnP Tracker to estimate camera motion from given 3D-2D correspondences 
     """
-    def __init__(self, cfg, cam_intrinsics):
+    def __init__(self, cfg, cam_intrinsics, timers=None):
         """ 
         Args:
             cfg (edict): configuration dictionary
             cam_intrinsics (Intrinsics): camera intrinsics
+            timers (Profiler): profiler
         """
         self.cfg = cfg
         self.cam_intrinsics = cam_intrinsics
+        self.timers = timers
 
-        # Rigid flow data
+        # camera geometry (pixel rays) is shared with other modules; computed on GPU if available
         if self.cfg.kp_selection.rigid_flow_kp.enable:
-            self.K = np.eye(4)
-            self.inv_K = np.eye(4)
-            self.K[:3, :3] = cam_intrinsics.mat
-            self.inv_K[:3, :3] = cam_intrinsics.inv_mat
-            self.K = torch.from_numpy(self.K).float().unsqueeze(0).cuda()
-            self.inv_K = torch.from_numpy(self.inv_K).float().unsqueeze(0).cuda()
-            self.rigid_flow_layer = RigidFlow(self.cfg.image.height, self.cfg.image.width).cuda()
+            self.geometry = get_camera_geometry(cam_intrinsics.mat, self.cfg.image.height, self.cfg.image.width)
+            self.geometry_device = torch.device('cuda') if torch.cuda.is_available() else None
 
+    @profiled('solve PnP')
     def compute_pose_3d2d(self, kp1, kp2, depth_1, is_iterative):
         """Compute pose from 3d-2d correspondences
 
@@ -124,6 +124,7 @@ class PnpTracker():
 
         return outputs
     
+    @profiled('rigid_flow_kp')
     def compute_rigid_flow_kp(self, cur_data, ref_data, pose):
         """compute keypoints from optical-rigid flow consistency
 
@@ -145,6 +146,7 @@ class PnpTracker():
         cur_data['rigid_flow_mask'] = kp_sel_outputs['rigid_flow_mask']
 
 
+    @profiled('kp_good_depth')
     def kp_selection_good_depth(self, cur_data, ref_data, rigid_kp_score_method):
         """Choose valid kp from a series of operations
 
@@ -171,42 +173,42 @@ class PnpTracker():
         kp1 = image_grid(h, w)
         kp1 = np.expand_dims(kp1, 0)
         tmp_flow_data = np.transpose(np.expand_dims(ref_data['flow'], 0), (0, 2, 3, 1))
-        kp2 = kp1 + tmp_flow_data
-
-        """ opt-rigid flow consistent kp selection """
-        if self.cfg.kp_selection.rigid_flow_kp.enable:
-            ref_data['rigid_flow_diff'] = {}
-            # compute rigid flow
-            rigid_flow_pose = ref_data['rigid_flow_pose'].pose
-
-            # Compute rigid flow
-            pose_tensor = torch.from_numpy(rigid_flow_pose).float().unsqueeze(0).cuda()
-            depth = torch.from_numpy(ref_data['raw_depth']).float().unsqueeze(0).unsqueeze(0).cuda()
-            rigid_flow_tensor = self.rigid_flow_layer(
-                                depth,
-                                pose_tensor,
-                                self.K,
-                                self.inv_K,
-                                normalized=False,
-            )
-            rigid_flow = rigid_flow_tensor.detach().cpu().numpy()[0]
-
-            # compute optical-rigid flow difference
-            rigid_flow_diff = np.linalg.norm(
-                                rigid_flow - ref_data['flow'],
-                                axis=0)
-            ref_data['rigid_flow_diff'] = np.expand_dims(rigid_flow_diff, 2)
-
-            # get depth-flow consistent kp
-            outputs.update(
-                    opt_rigid_flow_kp(
-                        kp1=kp1,
-                        kp2=kp2,
-                        ref_data=ref_data,
-                        cfg=self.cfg,
-                        outputs=outputs,
-                        score_method=rigid_kp_score_method
-                        )
-                )
+        # dense keypoint map from the buffer pool; selected keypoints are copies
+        with buffer_pool.buffer(kp1.shape, np.float32) as kp2:
+            np.add(kp1, tmp_flow_data, out=kp2)
+
+            """ opt-rigid flow consistent kp selection """
+            if self.cfg.kp_selection.rigid_flow_kp.enable:
+                # compute rigid flow
+                rigid_flow_pose = ref_data['rigid_flow_pose'].pose
+
+                # Compute rigid flow and optical-rigid flow difference (written into the frame buffer);
+                # on the device with the frame tensors if GPU is available, otherwise with the NumPy backend
+                rigid_flow_diff = ref_data.get_buffer('rigid_flow_diff', (h, w, 1))
+                if self.geometry_device is not None:
+                    frame_tensors = ref_data['tensors']
+                    pose_tensor = frame_tensors.get('rigid_flow_pose', rigid_flow_pose)[None]
+                    depth = frame_tensors.get('raw_depth', ref_data['raw_depth'])[None, None]
+                    flow = frame_tensors.get('flow', ref_data['flow'])
+                    rigid_flow = self.geometry.rigid_flow(depth, pose_tensor)[0]
+                    frame_tensors.to_numpy(torch.norm(rigid_flow - flow, dim=0), 'rigid_flow_diff',
+                                           out=rigid_flow_diff[:, :, 0])
+                else:
+                    rigid_flow = self.geometry.rigid_flow(ref_data['raw_depth'], rigid_flow_pose)
+                    flow_err = rigid_flow - ref_data['flow']
+                    np.hypot(flow_err[0], flow_err[1], out=rigid_flow_diff[:, :, 0])
+                ref_data['rigid_flow_diff'] = rigid_flow_diff
+
+                # get depth-flow consistent kp
+                outputs.update(
+                        opt_rigid_flow_kp(
+                            kp1=kp1,
+                            kp2=kp2,
+                            ref_data=ref_data,
+                            cfg=self.cfg,
+                            outputs=outputs,
+                            score_method=rigid_kp_score_method
+                            )
+                    )
 
         return outputs
@@ -11,12 +11,8 @@ import sys
 sys.path.append('../')
 
 import argparse
-import numpy as np
 import os
-import random
-import torch
 
-from libs.dfvo import DFVO
 from libs.general.utils import mkdir_if_not_exists
 from libs.general.configuration import ConfigLoader
 
@@ -77,6 +73,11 @@ if __name__ == '__main__':
     # Read config
     args, cfg = read_cfgs()
 
+    # heavy modules (torch, networks, datasets) are imported after argument parsing
+    import numpy as np
+    import torch
+    from libs.dfvo import DFVO
+
     # Set random seed
     SEED = cfg.seed
     np.random.seed(SEED)
@@ -0,0 +1,74 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+import torch.nn as nn
+import torch.nn.functional as F
+
+from libs.deep_models.compiled_model import (CompiledModel, DepthInferenceGraph,
+                                             FlowInferenceGraph, export_model,
+                                             get_compiled_model_path)
+
+
+class TinyDepth():
+    """Minimal DeepDepth-like interface: resize, conv net, resize back"""
+    def __init__(self):
+        self.model = nn.Sequential(nn.Conv2d(3, 8, 3, padding=1), nn.ReLU(), nn.Conv2d(8, 1, 3, padding=1))
+
+    def inference(self, img):
+        h, w = img.shape[2:]
+        x = F.interpolate(img, (32, 48), mode='bilinear', align_corners=False)
+        depth = F.interpolate(torch.sigmoid(self.model(x)), (h, w), mode='bilinear', align_corners=False)
+        return {'depth': {0: depth}}
+
+
+class TinyFlow():
+    """Minimal DeepFlow-like interface returning (flows, flow)"""
+    def __init__(self):
+        self.model = nn.Sequential(nn.Conv2d(6, 8, 3, padding=1), nn.ReLU(), nn.Conv2d(8, 2, 3, padding=1))
+
+    def inference(self, img1, img2):
+        flow = self.model(torch.cat([img1, img2], 1))
+        return {1: flow}, flow
+
+
+def get_backends():
+    backends = ['torchscript']
+    try:
+        import onnx
+        import onnxruntime
+        backends.append('onnx')
+    except ImportError:
+        pass
+    return backends
+
+
+@pytest.mark.parametrize("backend", get_backends())
+def test_depth_export_matches_eager(tmp_path, backend):
+    torch.manual_seed(0)
+    graph = DepthInferenceGraph(TinyDepth()).eval()
+    img = torch.rand(1, 3, 64, 96)
+    path = get_compiled_model_path(str(tmp_path), "tiny_depth", 64, 96, backend)
+    export_model(graph, (img,), ['img'], ['depth'], path, backend)
+
+    compiled = CompiledModel(path, backend, torch.device('cpu'))
+    batch = torch.rand(2, 3, 64, 96)
+    with torch.no_grad():
+        expected = graph(batch)
+    output = compiled(batch)
+    assert output.shape == expected.shape
+    assert torch.allclose(output, expected, atol=1e-4, rtol=1e-4)
+
+
+@pytest.mark.parametrize("backend", get_backends())
+def test_flow_export_matches_eager(tmp_path, backend):
+    torch.manual_seed(0)
+    graph = FlowInferenceGraph(TinyFlow()).eval()
+    img1, img2 = torch.rand(1, 3, 32, 48), torch.rand(1, 3, 32, 48)
+    path = get_compiled_model_path(str(tmp_path), "tiny_flow", 32, 48, backend)
+    export_model(graph, (img1, img2), ['img1', 'img2'], ['flow'], path, backend)
+
+    compiled = CompiledModel(path, backend, torch.device('cpu'))
+    with torch.no_grad():
+        expected = graph(img1, img2)
+    output = compiled(img1, img2)
+    assert torch.allclose(output, expected, atol=1e-4, rtol=1e-4)
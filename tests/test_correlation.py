@@ -0,0 +1,46 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from libs.deep_models.flow.correlation import backends, is_cupy_available
+
+
+# (channels, height, width, stride, max_displacement)
+PARITY_SETUPS = [
+    (32, 24, 40, 2, 3),
+    (64, 12, 20, 1, 3),
+    (32, 12, 20, 1, 4),
+]
+
+
+@pytest.mark.parametrize("stride, max_disp", [(1, 3), (2, 3), (1, 4)])
+def test_torch_backend_gradcheck(stride, max_disp):
+    torch.manual_seed(0)
+    first = torch.randn(1, 4, 7, 9, dtype=torch.float64, requires_grad=True)
+    second = torch.randn(1, 4, 7, 9, dtype=torch.float64, requires_grad=True)
+    assert torch.autograd.gradcheck(
+        lambda a, b: backends['torch'](a, b, stride, max_disp), (first, second))
+
+
+@pytest.mark.parametrize("c, h, w, stride, max_disp", PARITY_SETUPS)
+def test_cupy_torch_parity(c, h, w, stride, max_disp):
+    pytest.importorskip("cupy")
+    if not torch.cuda.is_available() or not is_cupy_available():
+        pytest.skip("CUDA/CuPy backend is not available")
+
+    torch.manual_seed(0)
+    first = torch.randn(2, c, h, w, device="cuda")
+    second = torch.randn(2, c, h, w, device="cuda")
+
+    results = {}
+    for name in ['cupy', 'torch']:
+        f = first.clone().requires_grad_(True)
+        s = second.clone().requires_grad_(True)
+        out = backends[name](f, s, stride, max_disp)
+        grad_out = torch.linspace(-1, 1, out.numel(), device=out.device).view_as(out)
+        out.backward(grad_out)
+        results[name] = [out.detach(), f.grad, s.grad]
+
+    for cupy_res, torch_res in zip(results['cupy'], results['torch']):
+        assert cupy_res.shape == torch_res.shape
+        assert torch.allclose(cupy_res, torch_res, atol=1e-5, rtol=1e-4)
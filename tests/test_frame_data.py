@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from libs.general.frame_data import FrameData
+
+
+def test_buffer_reused_across_frames():
+    ref_data, cur_data = FrameData(), FrameData()
+
+    cur_data['depth'] = np.ones((4, 6), dtype=np.float64)
+    buf_a = cur_data['depth']
+    assert buf_a.dtype == np.float32
+    cur_data.transfer(ref_data)
+    assert ref_data['depth'] is buf_a and cur_data['depth'] is None
+
+    # second frame gets a new buffer, the third reuses the buffer of the first
+    cur_data['depth'] = np.full((4, 6), 2.)
+    buf_b = cur_data['depth']
+    assert buf_b is not buf_a
+    cur_data.transfer(ref_data)
+
+    cur_data['depth'] = np.full((4, 6), 3.)
+    assert cur_data['depth'] is buf_a
+    assert np.all(ref_data['depth'] == 2.) and np.all(cur_data['depth'] == 3.)
+
+
+def test_buffer_reallocated_on_shape_change():
+    data = FrameData()
+    data['flow'] = np.zeros((2, 4, 6), dtype=np.float32)
+    buf = data['flow']
+    data['flow'] = np.zeros((2, 8, 12), dtype=np.float32)
+    assert data['flow'] is not buf and data['flow'].shape == (2, 8, 12)
+
+
+def test_image_not_copied():
+    data = FrameData()
+    img = np.zeros((4, 6, 3), dtype=np.uint8)
+    data['img'] = img
+    assert data['img'] is img
+
+
+def test_get_buffer_as_output():
+    data = FrameData()
+    buf = data.get_buffer('rigid_flow_diff', (4, 6, 1))
+    assert 'rigid_flow_diff' not in data
+    np.hypot(np.full((4, 6), 3.), np.full((4, 6), 4.), out=buf[:, :, 0])
+    data['rigid_flow_diff'] = buf
+    assert data['rigid_flow_diff'] is buf and np.all(buf == 5.)
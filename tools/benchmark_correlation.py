@@ -0,0 +1,113 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This program benchmarks the latency of the correlation backends
+    (numerical parity is tested in tests/test_correlation.py)
+'''
+
+import argparse
+import torch
+from time import time
+
+from libs.deep_models.flow.correlation import backends, is_cupy_available
+
+
+# (name, channels, height, width, stride, max_displacement)
+CORRELATION_SETUPS = [
+    ("liteflow-l2", 32, 96, 320, 2, 3),
+    ("liteflow-l3", 64, 48, 160, 1, 3),
+    ("liteflow-l6", 192, 6, 20, 1, 3),
+    ("hd3-l0", 128, 12, 40, 1, 4),
+    ("hd3-l4", 32, 96, 320, 1, 4),
+]
+
+
+def argument_parsing():
+    """Argument parsing
+
+    Returns:
+        args (args): arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark correlation backends')
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu",
+                        help="device to run the benchmark [cpu, cuda]")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="batch size")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="number of timed iterations")
+    args = parser.parse_args()
+    return args
+
+
+def synchronize(device):
+    """Wait for pending kernels so that timings are accurate
+
+    Args:
+        device (str): device name
+    """
+    if "cuda" in device:
+        torch.cuda.synchronize()
+
+
+def time_backend(fn, first, second, stride, max_disp, repeat, device):
+    """Measure forward and forward+backward latency of a correlation backend
+
+    Args:
+        fn (function): correlation function
+        first (tensor, [NxCxHxW]): feature map 1
+        second (tensor, [NxCxHxW]): feature map 2
+        stride (int): stride
+        max_disp (int): maximum displacement
+        repeat (int): number of iterations
+        device (str): device name
+
+    Returns:
+        a tuple containing
+            - **fwd** (float) : average forward time (ms)
+            - **fwd_bwd** (float) : average forward+backward time (ms)
+    """
+    # warm up (kernel compilation, allocator)
+    with torch.no_grad():
+        fn(first, second, stride, max_disp)
+    synchronize(device)
+
+    start = time()
+    with torch.no_grad():
+        for _ in range(repeat):
+            fn(first, second, stride, max_disp)
+    synchronize(device)
+    fwd = (time() - start) / repeat * 1000
+
+    first = first.clone().requires_grad_(True)
+    second = second.clone().requires_grad_(True)
+    start = time()
+    for _ in range(repeat):
+        fn(first, second, stride, max_disp).sum().backward()
+    synchronize(device)
+    fwd_bwd = (time() - start) / repeat * 1000
+    return fwd, fwd_bwd
+
+
+if __name__ == '__main__':
+    args = argument_parsing()
+    torch.manual_seed(0)
+
+    run_cupy = "cuda" in args.device and is_cupy_available()
+    if not run_cupy:
+        print("==> CuPy backend is not available on [{}], only PyTorch backend is benchmarked.".format(args.device))
+
+    print("{:<14} {:>8} {:>14} {:>14} {:>14} {:>14}".format(
+        "setup", "shape", "torch fwd(ms)", "torch f+b(ms)", "cupy fwd(ms)", "cupy f+b(ms)"))
+    for name, c, h, w, stride, max_disp in CORRELATION_SETUPS:
+        first = torch.randn(args.batch, c, h, w, device=args.device)
+        second = torch.randn(args.batch, c, h, w, device=args.device)
+
+        torch_fwd, torch_fwd_bwd = time_backend(backends['torch'], first, second, stride, max_disp, args.repeat, args.device)
+        if run_cupy:
+            cupy_fwd, cupy_fwd_bwd = time_backend(backends['cupy'], first, second, stride, max_disp, args.repeat, args.device)
+            cupy_fwd, cupy_fwd_bwd = "{:.3f}".format(cupy_fwd), "{:.3f}".format(cupy_fwd_bwd)
+        else:
+            cupy_fwd, cupy_fwd_bwd = "-", "-"
+
+        print("{:<14} {:>8} {:>14.3f} {:>14.3f} {:>14} {:>14}".format(
+            name, "{}x{}".format(h, w), torch_fwd, torch_fwd_bwd, cupy_fwd, cupy_fwd_bwd))
@@ -0,0 +1,176 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This program benchmarks the startup of DF-VO, including
+    the latency of run.py --help, the slowest imports of libs.dfvo and the time to first frame
+'''
+
+import argparse
+import json
+import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
+from time import time
+
+
+# prefix of the result line printed by the first frame worker
+RESULT_PREFIX = "STARTUP_RESULT "
+
+
+def argument_parsing():
+    """Argument parsing
+
+    Returns:
+        args (args): arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark DF-VO startup time')
+    parser.add_argument("-d", "--default_configuration", type=str,
+                        default="options/examples/default_configuration.yml",
+                        help="default configuration files")
+    parser.add_argument("-c", "--configuration", type=str,
+                        default=None,
+                        help="custom configuration file")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of runs of each measurement")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of slowest imports to be reported")
+    parser.add_argument("--skip_first_frame", action="store_true",
+                        help="only measure run.py --help and the imports")
+    parser.add_argument("--first_frame_worker", type=float, default=None,
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    return args
+
+
+def time_help(repeat):
+    """Measure the latency of run.py --help in fresh processes
+
+    Args:
+        repeat (int): number of runs
+
+    Returns:
+        durations (list): durations (s)
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time()
+        subprocess.run([sys.executable, "run.py", "--help"], check=True, stdout=subprocess.DEVNULL)
+        durations.append(time() - start)
+    return durations
+
+
+def slowest_imports(module, top):
+    """Find the slowest imports of a module with python -X importtime
+
+    Args:
+        module (str): module name
+        top (int): number of imports
+
+    Returns:
+        imports (list): each element is (cumulative time (s), package); sorted by time
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+                          check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        package = package.rstrip()
+        # only top-level packages, nested imports are included in the cumulative time
+        if package.startswith(" ") and not package.startswith("  "):
+            imports.append((int(cumulative) / 1e6, package.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def first_frame_worker(args):
+    """Run DF-VO up to the first tracked frame and print the elapsed times since process launch.
+    This runs in a fresh process started by time_first_frame.
+
+    Args:
+        args (args): arguments; args.first_frame_worker is the launch time
+    """
+    launch = args.first_frame_worker
+    timings = {'launch': time() - launch}
+
+    from libs.general.configuration import ConfigLoader
+    import torch
+    from libs.dfvo import DFVO
+    timings['import'] = time() - launch
+
+    cfg = ConfigLoader().merge_cfg([args.default_configuration, args.configuration])
+    cfg.seq = str(cfg.seq)
+    cfg.no_confirm = True
+    cfg.directory.result_dir = tempfile.mkdtemp()
+    np.random.seed(cfg.seed)
+    torch.manual_seed(cfg.seed)
+
+    vo = DFVO(cfg)
+    timings['setup'] = time() - launch
+
+    # the first frame initializes the reference data; the second one is the first tracked frame
+    vo.process_frame(0)
+    timings['frame_0'] = time() - launch
+    vo.process_frame(cfg.frame_step)
+    timings['frame_1'] = time() - launch
+    print(RESULT_PREFIX + json.dumps(timings))
+
+
+def time_first_frame(args):
+    """Measure the time to first frame in fresh processes
+
+    Args:
+        args (args): arguments
+
+    Returns:
+        timings (dict): stage name -> list of elapsed times since process launch (s)
+    """
+    timings = {}
+    for _ in range(args.repeat):
+        cmd = [sys.executable, os.path.abspath(__file__),
+               "-d", args.default_configuration,
+               "--first_frame_worker", str(time())]
+        if args.configuration is not None:
+            cmd += ["-c", args.configuration]
+        proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+        for line in proc.stdout.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                for key, value in json.loads(line[len(RESULT_PREFIX):]).items():
+                    timings.setdefault(key, []).append(value)
+    return timings
+
+
+if __name__ == '__main__':
+    args = argument_parsing()
+    if args.first_frame_worker is not None:
+        first_frame_worker(args)
+        sys.exit()
+
+    # run.py --help
+    durations = np.asarray(time_help(args.repeat)) * 1000
+    print("{:<28} {:>10} {:>10}".format("stage", "mean(ms)", "min(ms)"))
+    print("{:<28} {:>10.1f} {:>10.1f}".format("run.py --help", durations.mean(), durations.min()))
+
+    # time to first frame
+    if not args.skip_first_frame:
+        stages = {
+            'launch': "interpreter launch",
+            'import': "import libs.dfvo",
+            'setup': "DFVO setup",
+            'frame_0': "first frame",
+            'frame_1': "first tracked frame",
+        }
+        timings = time_first_frame(args)
+        for key, name in stages.items():
+            durations = np.asarray(timings[key]) * 1000
+            print("{:<28} {:>10.1f} {:>10.1f}".format(name, durations.mean(), durations.min()))
+
+    # slowest imports
+    print("\nSlowest imports of libs.dfvo")
+    print("{:<40} {:>14}".format("package", "cumulative(ms)"))
+    for duration, package in slowest_imports("libs.dfvo", args.top):
+        print("{:<40} {:>14.1f}".format(package, duration * 1000))
@@ -0,0 +1,101 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This program runs DF-VO with different flow inference scales (with/without keypoint refinement)
+    and reports an accuracy-versus-speed table
+'''
+
+import argparse
+import numpy as np
+import os
+import torch
+
+from libs.dfvo import DFVO
+from libs.general.configuration import ConfigLoader
+from tools.evaluate_precision import read_eval_result, latency_stats
+from tools.evaluation.odometry.kitti_odometry import KittiEvalOdom
+
+
+def argument_parsing():
+    """Argument parsing
+
+    Returns:
+        args (args): arguments
+    """
+    parser = argparse.ArgumentParser(description='Evaluate DF-VO with different flow inference scales')
+    parser.add_argument("-d", "--default_configuration", type=str,
+                        default="options/examples/default_configuration.yml",
+                        help="default configuration files")
+    parser.add_argument("-c", "--configuration", type=str,
+                        default=None,
+                        help="custom configuration file")
+    parser.add_argument("--scales", type=float, nargs="+",
+                        default=[1.0, 0.75, 0.5],
+                        help="flow inference scales to be evaluated")
+    parser.add_argument("--result", type=str, required=True,
+                        help="result directory, RESULT/SETUP will be created")
+    parser.add_argument('--gt', type=str,
+                        default="dataset/kitti_odom/gt_poses/",
+                        help="GT Pose directory containing gt pose txt files")
+    parser.add_argument('--align', type=str,
+                        choices=['scale', 'scale_7dof', '7dof', '6dof'],
+                        default=None,
+                        help="alignment type")
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = argument_parsing()
+    config_loader = ConfigLoader()
+
+    # (scale, keypoint refinement); refinement is only evaluated for reduced scales
+    setups = []
+    for scale in args.scales:
+        setups.append((scale, False))
+        if scale < 1:
+            setups.append((scale, True))
+
+    results = {}
+    for scale, refine in setups:
+        name = "scale_{}{}".format(scale, "_refine" if refine else "")
+
+        # configuration
+        cfg = config_loader.merge_cfg([args.default_configuration, args.configuration])
+        cfg.seq = str(cfg.seq)
+        cfg.deep_flow.inference_scale = scale
+        cfg.deep_flow.kp_refinement.enable = refine
+        cfg.directory.result_dir = os.path.join(args.result, name)
+        cfg.no_confirm = True
+        cfg.profiler.enable = True
+        os.makedirs(cfg.directory.result_dir, exist_ok=True)
+
+        np.random.seed(cfg.seed)
+        torch.cuda.manual_seed(cfg.seed)
+        torch.manual_seed(cfg.seed)
+
+        # run DF-VO
+        vo = DFVO(cfg)
+        vo.main()
+
+        # evaluation
+        KittiEvalOdom().eval(args.gt, cfg.directory.result_dir, alignment=args.align, seqs=[cfg.seq])
+        results[name] = {
+            'errs': read_eval_result(os.path.join(cfg.directory.result_dir, "result.txt")),
+            'flow': latency_stats(vo.timers.durations('flow_cnn')),
+            'kp_sel': latency_stats(vo.timers.durations('kp_sel')),
+            'frame': latency_stats(vo.timers.durations('DF-VO')),
+        }
+
+    # report
+    print("{:<20} {:>10} {:>12} {:>9} {:>16} {:>16} {:>16}".format(
+        "setup", "t_err(%)", "r_err(deg)", "ATE(m)", "flow mean/p95", "kp_sel mean/p95", "frame mean/p95"))
+    for name, result in results.items():
+        print("{:<20} {:>10.3f} {:>12.3f} {:>9.3f} {:>16} {:>16} {:>16}".format(
+            name,
+            result['errs']["Trans. err. (%)"],
+            result['errs']["Rot. err. (deg/100m)"],
+            result['errs']["ATE (m)"],
+            "{:.1f}/{:.1f}ms".format(*result['flow']),
+            "{:.1f}/{:.1f}ms".format(*result['kp_sel']),
+            "{:.1f}/{:.1f}ms".format(*result['frame'])))
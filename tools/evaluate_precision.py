@@ -0,0 +1,124 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This program runs DF-VO with different inference precisions and
+    reports trajectory error (KittiEvalOdom) and per-frame latency against fp32
+'''
+
+import argparse
+import numpy as np
+import os
+import torch
+
+from libs.dfvo import DFVO
+from libs.general.configuration import ConfigLoader
+from tools.evaluation.odometry.kitti_odometry import KittiEvalOdom
+
+
+def argument_parsing():
+    """Argument parsing
+
+    Returns:
+        args (args): arguments
+    """
+    parser = argparse.ArgumentParser(description='Evaluate DF-VO with reduced-precision inference')
+    parser.add_argument("-d", "--default_configuration", type=str,
+                        default="options/examples/default_configuration.yml",
+                        help="default configuration files")
+    parser.add_argument("-c", "--configuration", type=str,
+                        default=None,
+                        help="custom configuration file")
+    parser.add_argument("--precisions", type=str, nargs="+",
+                        default=["fp32", "fp16", "int8_static"],
+                        help="precisions to be evaluated")
+    parser.add_argument("--result", type=str, required=True,
+                        help="result directory, RESULT/PRECISION will be created")
+    parser.add_argument('--gt', type=str,
+                        default="dataset/kitti_odom/gt_poses/",
+                        help="GT Pose directory containing gt pose txt files")
+    parser.add_argument('--align', type=str,
+                        choices=['scale', 'scale_7dof', '7dof', '6dof'],
+                        default=None,
+                        help="alignment type")
+    args = parser.parse_args()
+    return args
+
+
+def read_eval_result(result_txt):
+    """Read the result summary written by KittiEvalOdom
+
+    Args:
+        result_txt (str): result.txt path
+
+    Returns:
+        errs (dict): error name and value
+    """
+    errs = {}
+    with open(result_txt, 'r') as f:
+        for line in f.readlines():
+            if ":" in line and not line.startswith("Sequence"):
+                name, value = line.split(":")
+                errs[name.strip()] = float(value)
+    return errs
+
+
+def latency_stats(durations):
+    """Latency statistics of a timer item
+
+    Args:
+        durations (list): durations (s)
+
+    Returns:
+        a tuple containing
+            - **mean** (float) : mean latency (ms)
+            - **p95** (float) : 95th percentile latency (ms)
+    """
+    durations = np.asarray(durations) * 1000
+    return durations.mean(), np.percentile(durations, 95)
+
+
+if __name__ == '__main__':
+    args = argument_parsing()
+    config_loader = ConfigLoader()
+
+    results = {}
+    for precision in args.precisions:
+        # configuration
+        cfg = config_loader.merge_cfg([args.default_configuration, args.configuration])
+        cfg.seq = str(cfg.seq)
+        cfg.deep_runtime.precision = precision
+        cfg.directory.result_dir = os.path.join(args.result, precision)
+        cfg.no_confirm = True
+        cfg.profiler.enable = True
+        os.makedirs(cfg.directory.result_dir, exist_ok=True)
+
+        np.random.seed(cfg.seed)
+        torch.cuda.manual_seed(cfg.seed)
+        torch.manual_seed(cfg.seed)
+
+        # run DF-VO
+        vo = DFVO(cfg)
+        vo.main()
+
+        # evaluation
+        KittiEvalOdom().eval(args.gt, cfg.directory.result_dir, alignment=args.align, seqs=[cfg.seq])
+        results[precision] = {
+            'errs': read_eval_result(os.path.join(cfg.directory.result_dir, "result.txt")),
+            'frame': latency_stats(vo.timers.durations('DF-VO')),
+            'deep_inference': latency_stats(vo.timers.durations('deep_inference')),
+        }
+
+    # report
+    print("{:<14} {:>10} {:>12} {:>9} {:>16} {:>16} {:>12}".format(
+        "precision", "t_err(%)", "r_err(deg)", "ATE(m)", "deep mean/p95", "frame mean/p95", "speedup"))
+    ref = results.get('fp32', None)
+    for precision, result in results.items():
+        speedup = "-" if ref is None else "{:.2f}x".format(ref['deep_inference'][0] / result['deep_inference'][0])
+        print("{:<14} {:>10.3f} {:>12.3f} {:>9.3f} {:>16} {:>16} {:>12}".format(
+            precision,
+            result['errs']["Trans. err. (%)"],
+            result['errs']["Rot. err. (deg/100m)"],
+            result['errs']["ATE (m)"],
+            "{:.1f}/{:.1f}ms".format(*result['deep_inference']),
+            "{:.1f}/{:.1f}ms".format(*result['frame']),
+            speedup))
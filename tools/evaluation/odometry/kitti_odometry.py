@@ -15,6 +15,8 @@ import numpy as np
 import os
 from glob import glob
 
+from libs.general.trajectory_io import arr_to_poses, load_traj
+
 
 def scale_lse_solver(X, Y):
     """Least-sqaure-error solver
@@ -93,6 +95,7 @@ class KittiEvalOdom():
         Each line in the file should follow one of the following structures
             (1) idx pose(3x4 matrix in terms of 12 numbers)
             (2) pose(3x4 matrix in terms of 12 numbers)
+        Binary trajectory files (.npz/.npy) are also accepted.
 
         Args:
             file_name (str): txt file path
@@ -100,23 +103,8 @@ class KittiEvalOdom():
         Returns:
             poses (dict): {idx: [4x4] array}
         """
-        f = open(file_name, 'r')
-        s = f.readlines()
-        f.close()
-        poses = {}
-        for cnt, line in enumerate(s):
-            P = np.eye(4)
-            line_split = [float(i) for i in line.split(" ") if i!=""]
-            withIdx = len(line_split) == 13
-            for row in range(3):
-                for col in range(4):
-                    P[row, col] = line_split[row*4 + col + withIdx]
-            if withIdx:
-                frame_idx = line_split[0]
-            else:
-                frame_idx = cnt
-            poses[frame_idx] = P
-        return poses
+        keys, poses = load_traj(file_name, format='kitti')
+        return arr_to_poses(keys, poses)
 
     def trajectory_distances(self, poses):
         """Compute distance for each pose w.r.t frame-0
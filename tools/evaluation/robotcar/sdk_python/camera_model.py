@@ -14,9 +14,8 @@
 
 import re
 import os
+import cv2
 import numpy as np
-import scipy.interpolate as interp
-from scipy.ndimage import map_coordinates
 
 
 class CameraModel:
@@ -30,6 +29,7 @@ class CameraModel:
         G_camera_image (:obj: `numpy.matrixlib.defmatrix.matrix`): Transform from image frame to camera frame.
         bilinear_lut (:obj: `numpy.ndarray`): Look-up table for undistortion of images, mapping pixels in an undistorted
             image to pixels in the distorted image
+        undistort_maps (dict): OpenCV remap maps built from the LUT, keyed by (image size, crop, output size)
 
     """
 
@@ -47,6 +47,7 @@ class CameraModel:
         self.principal_point = None
         self.G_camera_image = None
         self.bilinear_lut = None
+        self.undistort_maps = {}
 
         self.__load_intrinsics(models_dir, images_dir)
         self.__load_lut(models_dir, images_dir)
@@ -83,32 +84,71 @@ class CameraModel:
 
         return uv[:, in_img], np.ravel(xyzw[2, in_img])
 
-    def undistort(self, image):
-        """Undistorts an image.
+    def get_undistort_maps(self, image_size, crop=None, size=None):
+        """Gets OpenCV remap maps for undistortion, built once from the LUT.
+
+        The crop and resize of the undistorted image are fused into the maps: the maps are cropped and then
+        resized (bilinear) to the output size, so one remap produces the final image.
 
         Args:
-            image (:obj: `numpy.ndarray`): A distorted image. Must be demosaiced - ie. must be a 3-channel RGB image.
+            image_size (tuple[int]): (height, width) of the distorted image.
+            crop (list): (optional) normalized crop region of the undistorted image, [[y0, y1], [x0, x1]].
+            size (tuple[int]): (optional) (height, width) of the output image.
 
         Returns:
-            numpy.ndarray: Undistorted version of image.
+            tuple: fixed-point maps (map1, map2) for cv2.remap.
 
         Raises:
             ValueError: if image size does not match camera model.
-            ValueError: if image only has a single channel.
 
         """
-        if image.shape[0] * image.shape[1] != self.bilinear_lut.shape[0]:
+        height, width = image_size[:2]
+        crop_key = None if crop is None else tuple(tuple(float(v) for v in c) for c in crop)
+        size_key = None if size is None else tuple(int(v) for v in size)
+        key = (height, width, crop_key, size_key)
+        if key in self.undistort_maps:
+            return self.undistort_maps[key]
+
+        if height * width != self.bilinear_lut.shape[0]:
             raise ValueError('Incorrect image size for camera model')
 
-        lut = self.bilinear_lut[:, 1::-1].T.reshape((2, image.shape[0], image.shape[1]))
+        # LUT columns are (x, y) in the distorted image for each undistorted pixel
+        map_x = self.bilinear_lut[:, 0].reshape((height, width)).astype(np.float32)
+        map_y = self.bilinear_lut[:, 1].reshape((height, width)).astype(np.float32)
 
-        if len(image.shape) == 1:
-            raise ValueError('Undistortion function only works with multi-channel images')
+        if crop_key is not None:
+            y0, y1 = int(height * crop_key[0][0]), int(height * crop_key[0][1])
+            x0, x1 = int(width * crop_key[1][0]), int(width * crop_key[1][1])
+            map_x, map_y = map_x[y0:y1, x0:x1], map_y[y0:y1, x0:x1]
+
+        if size_key is not None and map_x.shape != size_key:
+            map_x = cv2.resize(map_x, (size_key[1], size_key[0]), interpolation=cv2.INTER_LINEAR)
+            map_y = cv2.resize(map_y, (size_key[1], size_key[0]), interpolation=cv2.INTER_LINEAR)
+
+        self.undistort_maps[key] = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        return self.undistort_maps[key]
+
+    def undistort(self, image, crop=None, size=None):
+        """Undistorts an image, with optional crop and resize fused into the remap.
+
+        Args:
+            image (:obj: `numpy.ndarray`): A distorted image. Must be demosaiced - ie. must be a 3-channel RGB image.
+            crop (list): (optional) normalized crop region of the undistorted image, [[y0, y1], [x0, x1]].
+            size (tuple[int]): (optional) (height, width) of the output image.
+
+        Returns:
+            numpy.ndarray: Undistorted version of image.
+
+        Raises:
+            ValueError: if image size does not match camera model.
+            ValueError: if image only has a single channel.
 
-        undistorted = np.rollaxis(np.array([map_coordinates(image[:, :, channel], lut, order=1)
-                                for channel in range(0, image.shape[2])]), 0, 3)
+        """
+        if len(image.shape) != 3:
+            raise ValueError('Undistortion function only works with multi-channel images')
 
-        return undistorted.astype(image.dtype)
+        map1, map2 = self.get_undistort_maps(image.shape, crop, size)
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
 
     def __get_model_name(self, images_dir):
         self.camera = re.search('(stereo|mono_(left|right|rear))', images_dir).group(0)
@@ -21,12 +21,14 @@ BAYER_STEREO = 'gbrg'
 BAYER_MONO = 'rggb'
 
 
-def load_image(image_path, model=None):
+def load_image(image_path, model=None, crop=None, size=None):
     """Loads and rectifies an image from file.
 
     Args:
         image_path (str): path to an image from the dataset.
         model (camera_model.CameraModel): if supplied, model will be used to undistort image.
+        crop (list): (optional) normalized crop region of the undistorted image, [[y0, y1], [x0, x1]].
+        size (tuple[int]): (optional) (height, width) of the undistorted image.
 
     Returns:
         numpy.ndarray: demosaiced and optionally undistorted image
@@ -42,9 +44,9 @@ def load_image(image_path, model=None):
         pattern = BAYER_MONO
 
     img = Image.open(image_path)
-    img = demosaic(img, pattern)
+    img = np.clip(np.rint(demosaic(img, pattern)), 0, 255).astype(np.uint8)
     if model:
-        img = model.undistort(img)
+        img = model.undistort(img, crop, size)
 
-    return np.array(img).astype(np.uint8)
+    return img
 
@@ -81,21 +81,42 @@ def associate(first_list, second_list,offset,max_difference):
 
     Output:
     matches -- list of matched tuples ((stamp1,data1),(stamp2,data2))
+
+    Candidates are found by binary search on the sorted timestamps and matched greedily
+    from the smallest difference, which is O((N+M)logM + K logK) for K candidates.
     
     """
-    first_keys = list(first_list.keys())
-    second_keys = list(second_list.keys())
-    potential_matches = [(abs(a - (b + offset)), a, b) 
-                         for a in first_keys 
-                         for b in second_keys 
-                         if abs(a - (b + offset)) < max_difference]
-    potential_matches.sort()
+    first_keys = numpy.sort(numpy.array(list(first_list.keys()), dtype=numpy.float64))
+    second_keys = numpy.sort(numpy.array(list(second_list.keys()), dtype=numpy.float64))
+    if len(first_keys) == 0 or len(second_keys) == 0:
+        return []
+
+    # candidate pairs: for every a, the window of sorted b within the search radius,
+    # found by binary search (the window is widened by a few ulps and filtered exactly below)
+    shifted_keys = second_keys + offset
+    tol = 4 * numpy.spacing(numpy.abs(first_keys) + max_difference)
+    lo = numpy.searchsorted(shifted_keys, first_keys - max_difference - tol, side='left')
+    hi = numpy.searchsorted(shifted_keys, first_keys + max_difference + tol, side='right')
+    counts = hi - lo
+    first_idx = numpy.repeat(numpy.arange(len(first_keys)), counts)
+    second_idx = numpy.repeat(lo - (numpy.cumsum(counts) - counts), counts) + numpy.arange(counts.sum())
+
+    diffs = numpy.abs(first_keys[first_idx] - (second_keys[second_idx] + offset))
+    valid = diffs < max_difference
+    first_idx, second_idx, diffs = first_idx[valid], second_idx[valid], diffs[valid]
+
+    # greedy matching in the order of (diff, a, b), as sorting the candidate tuples
+    order = numpy.lexsort((second_idx, first_idx, diffs))
+    first_used = numpy.zeros(len(first_keys), dtype=bool)
+    second_used = numpy.zeros(len(second_keys), dtype=bool)
+    first_values = first_keys.tolist()
+    second_values = second_keys.tolist()
     matches = []
-    for diff, a, b in potential_matches:
-        if a in first_keys and b in second_keys:
-            first_keys.remove(a)
-            second_keys.remove(b)
-            matches.append((a, b))
+    for a, b in zip(first_idx[order].tolist(), second_idx[order].tolist()):
+        if not first_used[a] and not second_used[b]:
+            first_used[a] = True
+            second_used[b] = True
+            matches.append((first_values[a], second_values[b]))
     
     matches.sort()
     return matches
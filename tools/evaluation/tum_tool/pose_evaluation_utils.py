@@ -4,6 +4,8 @@
 import math
 import numpy as np
 
+from tools.evaluation.tum_tool.associate import associate as sorted_associate, read_file_list
+
 def compute_ate(gtruth_file, pred_file):
     gtruth_list = read_file_list(gtruth_file)
     pred_list = read_file_list(pred_file)
@@ -26,28 +28,6 @@ def compute_ate(gtruth_file, pred_file):
     rmse = np.sqrt(np.sum(alignment_error ** 2))/len(matches)
     return rmse, scale
 
-def read_file_list(filename):
-    """
-    Reads a trajectory from a text file. 
-    
-    File format:
-    The file format is "stamp d1 d2 d3 ...", where stamp denotes the time stamp (to be matched)
-    and "d1 d2 d3.." is arbitary data (e.g., a 3D position and 3D orientation) associated to this timestamp. 
-    
-    Input:
-    filename -- File name
-    
-    Output:
-    dict -- dictionary of (stamp,data) tuples
-    
-    """
-    file = open(filename)
-    data = file.read()
-    lines = data.replace(","," ").replace("\t"," ").split("\n") 
-    list = [[v.strip() for v in line.split(" ") if v.strip()!=""] for line in lines if len(line)>0 and line[0]!="#"]
-    list = [(float(l[0]),l[1:]) for l in list if len(l)>1]
-    return dict(list)
-
 def associate(first_list, second_list,offset,max_difference):
     """
     Associate two dictionaries of (stamp,data). As the time stamps never match exactly, we aim 
@@ -63,22 +43,7 @@ def associate(first_list, second_list,offset,max_difference):
     matches -- list of matched tuples ((stamp1,data1),(stamp2,data2))
     
     """
-    first_keys = list(first_list.keys())
-    second_keys = list(second_list.keys())
-    potential_matches = [(abs(a - (b + offset)), a, b) 
-                         for a in first_keys 
-                         for b in second_keys 
-                         if abs(a - (b + offset)) < max_difference]
-    potential_matches.sort()
-    matches = []
-    for diff, a, b in potential_matches:
-        if a in first_keys and b in second_keys:
-            first_keys.remove(a)
-            second_keys.remove(b)
-            matches.append((a, b))
-    
-    matches.sort()
-    return matches
+    return sorted_associate(first_list, second_list, offset, max_difference)
 
 def rot2quat(R):
     rz, ry, rx = mat2euler(R)
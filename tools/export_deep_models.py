@@ -0,0 +1,158 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This program exports the configured depth/flow networks to TorchScript/ONNX,
+    and reports the parity and latency of the compiled models against the eager models
+'''
+
+import argparse
+import torch
+from time import time
+
+from libs.deep_models.compiled_model import FlowInferenceGraph, DepthInferenceGraph, \
+                                            CompiledModel, export_model, get_compiled_model_path
+from libs.deep_models.deep_models import DeepModel
+from libs.general.configuration import ConfigLoader
+
+
+def argument_parsing():
+    """Argument parsing
+
+    Returns:
+        args (args): arguments
+    """
+    parser = argparse.ArgumentParser(description='Export deep models to TorchScript/ONNX')
+    parser.add_argument("-d", "--default_configuration", type=str,
+                        default="options/examples/default_configuration.yml",
+                        help="default configuration files")
+    parser.add_argument("-c", "--configuration", type=str,
+                        default=None,
+                        help="custom configuration file")
+    parser.add_argument("--backends", type=str, nargs="+",
+                        default=["torchscript", "onnx"],
+                        help="export backends [torchscript, onnx]")
+    parser.add_argument("--model_dir", type=str, default=None,
+                        help="output directory; deep_runtime.model_dir is used if not set")
+    parser.add_argument("--opset", type=int, default=16,
+                        help="ONNX opset version")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="number of timed iterations")
+    parser.add_argument("--atol", type=float, default=1e-2,
+                        help="absolute tolerance for the parity check")
+    args = parser.parse_args()
+    return args
+
+
+def synchronize(device):
+    """Wait for pending kernels so that timings are accurate
+
+    Args:
+        device (torch.device): device
+    """
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+
+
+@torch.no_grad()
+def time_model(fn, inputs, repeat, device):
+    """Measure the average latency of a model
+
+    Args:
+        fn (function): model
+        inputs (list): input tensors
+        repeat (int): number of iterations
+        device (torch.device): device where the model runs
+
+    Returns:
+        latency (float): average latency (ms)
+    """
+    # warm up (cudnn autotune, ORT graph optimization)
+    fn(*inputs)
+    synchronize(device)
+
+    start = time()
+    for _ in range(repeat):
+        fn(*inputs)
+    synchronize(device)
+    return (time() - start) / repeat * 1000
+
+
+def get_export_setups(deep_model, cfg):
+    """Get the inference graphs of the configured networks
+
+    Args:
+        deep_model (DeepModel): DeepModel
+        cfg (edict): configuration dictionary
+
+    Returns:
+        setups (list): each element is (name, graph, example_inputs, input_names, output_names)
+    """
+    device = deep_model.device
+    setups = []
+
+    # flow network at the flow inference size
+    h, w = deep_model.flow.height, deep_model.flow.width
+    setups.append((
+        cfg.deep_flow.network,
+        FlowInferenceGraph(deep_model.flow),
+        (torch.rand(1, 3, h, w, device=device), torch.rand(1, 3, h, w, device=device)),
+        ['img1', 'img2'],
+        ['flow']
+    ))
+
+    # depth network at its input size
+    if cfg.depth.depth_src is None:
+        h, w = deep_model.depth.feed_height, deep_model.depth.feed_width
+        setups.append((
+            cfg.depth.deep_depth.network,
+            DepthInferenceGraph(deep_model.depth),
+            (torch.rand(1, 3, h, w, device=device),),
+            ['img'],
+            ['depth']
+        ))
+    return setups
+
+
+if __name__ == '__main__':
+    args = argument_parsing()
+    torch.manual_seed(0)
+
+    # read configuration; export in inference mode
+    cfg = ConfigLoader().merge_cfg([args.default_configuration, args.configuration])
+    cfg.online_finetune.enable = False
+    model_dir = cfg.deep_runtime.model_dir if args.model_dir is None else args.model_dir
+    cfg.deep_runtime.backend = 'eager'
+
+    # networks are built when they are accessed in get_export_setups
+    deep_model = DeepModel(cfg)
+    deep_model.initialize_models()
+
+    print("{:<12} {:>10} {:>12} {:>8} {:>14} {:>12} {:>12}".format(
+        "network", "size", "runtime", "device", "latency(ms)", "max err", "mean err"))
+    for name, graph, inputs, input_names, output_names in get_export_setups(deep_model, cfg):
+        _, _, h, w = inputs[0].shape
+        size = "{}x{}".format(h, w)
+
+        # eager reference
+        with torch.no_grad():
+            ref_output = graph(*inputs)
+        latency = time_model(graph, inputs, args.repeat, deep_model.device)
+        print("{:<12} {:>10} {:>12} {:>8} {:>14.2f} {:>12} {:>12}".format(
+            name, size, "eager", deep_model.device.type, latency, "-", "-"))
+
+        for backend in args.backends:
+            # export and reload
+            path = get_compiled_model_path(model_dir, name, h, w, backend)
+            export_model(graph, inputs, input_names, output_names, path, backend, args.opset)
+            device = torch.device('cpu') if backend == 'onnx' else deep_model.device
+            compiled = CompiledModel(path, backend, device)
+            backend_inputs = [x.to(device) for x in inputs]
+
+            # parity and latency
+            output = compiled(*backend_inputs).to(ref_output.device)
+            err = (output - ref_output).abs()
+            latency = time_model(compiled, backend_inputs, args.repeat, device)
+            print("{:<12} {:>10} {:>12} {:>8} {:>14.2f} {:>12.2e} {:>12.2e}".format(
+                name, size, backend, device.type, latency, err.max().item(), err.mean().item()))
+            assert err.max().item() < args.atol, \
+                "Compiled model [{}] does not match the eager model".format(path)
@@ -14,10 +14,10 @@ from glob import glob
 import numpy as np
 import os
 import scipy.misc
-import torch
 from tqdm import tqdm
 
 from libs.deep_models.flow.lite_flow_net.lite_flow import LiteFlow
+from libs.deep_models.image_tensor import upload_images, normalize_images
 from libs.general.utils import *
 
 
@@ -141,29 +141,23 @@ if __name__ == '__main__':
         img2 = read_image(img2_path)
         h, w, _ = img1.shape
         
-        # resize image
-        img1 = cv2.resize(img1, (ref_w, ref_h))
-        img2 = cv2.resize(img2, (ref_w, ref_h))
-
-        cur_imgs = [np.transpose((img1)/255, (2, 0, 1))]
-        ref_imgs = [np.transpose((img2)/255, (2, 0, 1))]
-        ref_imgs = np.asarray(ref_imgs)
-        cur_imgs = np.asarray(cur_imgs)
+        # upload uint8 images and resize them on the device
+        cur_imgs = normalize_images(upload_images(img1), ref_h, ref_w)
+        ref_imgs = normalize_images(upload_images(img2), ref_h, ref_w)
 
         ''' prediction '''
         flows = {}
         # Flow inference
         batch_flows = flow_net.inference_flow(
-                                img1=cur_imgs[0:1],
-                                img2=ref_imgs[0:1],
-                                flow_dir=None,
+                                img1=cur_imgs,
+                                img2=ref_imgs,
                                 forward_backward=True,
                                 dataset="kitti")
             
         flows = batch_flows['forward']
 
         # resie flows back to original size
-        flows = flow_net.resize_dense_flow(torch.from_numpy(flows), h, w)
+        flows = flow_net.resize_dense_flow(flows, h, w)
         flows = flows.detach().cpu().numpy()[0]
 
         ''' Save result '''
@@ -171,7 +165,7 @@ if __name__ == '__main__':
         flows3 = np.ones((h, w, 3))
         
         if args.flow_mask_thre is not None:
-            resized_mask = cv2.resize(batch_flows['flow_diff'][0,:,:,0], (w, h))
+            resized_mask = cv2.resize(batch_flows['flow_diff'][0,:,:,0].detach().cpu().numpy(), (w, h))
             flow_mask = (resized_mask < args.flow_mask_thre) * 1
             flows3[:, :, 0] = flow_mask
         flows3[:, :, 2] = flows[0] * 64 + 2**15
@@ -32,6 +32,11 @@ def argument_parsing():
                         nargs="+",
                         help="sequences to be processed",
                         default=None)
+    parser.add_argument('--workers', type=int, 
+                        default=8,
+                        help="number of threads reading oxts files")
+    parser.add_argument('--no_cache', action="store_true",
+                        help="do not read/write the oxts pose cache")
     args = parser.parse_args()
     return args
 
@@ -50,8 +55,9 @@ if __name__ == '__main__':
                     )
         
         # load poses
-        gt_poses = load_poses_from_oxts(gps_info_dir)
+        gt_poses = load_poses_from_oxts(gps_info_dir, not(args.no_cache), args.workers)
 
         # save poses
+        mkdir_if_not_exists(args.result_dir)
         traj_txt = os.path.join(args.result_dir, "{}.txt".format(seq))
         save_traj(traj_txt, gt_poses, format="kitti")
@@ -0,0 +1,99 @@
+''''''
+'''
+@Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
+@Description: This program packs the images of a sequence, resized to image.height x image.width,
+    into a memory-mapped uint8 array (PackedSequence). The conversion is parallel and resumable.
+'''
+
+import argparse
+from multiprocessing import Pool
+import os
+from tqdm import tqdm
+
+import libs.datasets as Dataset
+from libs.datasets.packed_sequence import PackedSequence, get_packed_seq_dir
+from libs.general.configuration import ConfigLoader
+
+
+# dataset and packed sequence of a worker process
+worker = {}
+
+
+def argument_parsing():
+    """Argument parsing
+
+    Returns:
+        args (args): arguments
+    """
+    parser = argparse.ArgumentParser(description='Pack image sequence into a memory-mapped array')
+    parser.add_argument("-d", "--default_configuration", type=str,
+                        default="options/examples/default_configuration.yml",
+                        help="default configuration files")
+    parser.add_argument("-c", "--configuration", type=str,
+                        default=None,
+                        help="custom configuration file")
+    parser.add_argument("--packed_dir", type=str, required=True,
+                        help="packed image directory (directory.packed_img_dir)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of worker processes")
+    parser.add_argument("--chunk", type=int, default=16,
+                        help="number of frames per task")
+    args = parser.parse_args()
+    return args
+
+
+def init_worker(cfg, seq_dir):
+    """Initialize a worker process with its own dataset loader and writable packed sequence
+
+    Args:
+        cfg (edict): configuration
+        seq_dir (str): packed sequence directory
+    """
+    worker['dataset'] = Dataset.datasets[cfg.dataset](cfg)
+    worker['packed'] = PackedSequence(seq_dir, mode='r+')
+
+
+def pack_frames(indexes):
+    """Decode and write frames; the frames are flushed at the end of the task
+
+    Args:
+        indexes (list): frame indexes
+
+    Returns:
+        num_frames (int): number of written frames
+    """
+    dataset, packed = worker['dataset'], worker['packed']
+    for i in indexes:
+        img = dataset.get_image(packed.timestamps[i].item())
+        packed.write(i, img)
+    packed.flush()
+    return len(indexes)
+
+
+if __name__ == '__main__':
+    args = argument_parsing()
+
+    # configuration; images are decoded from the image files
+    cfg = ConfigLoader().merge_cfg([args.default_configuration, args.configuration])
+    cfg.seq = str(cfg.seq)
+    cfg.directory.packed_img_dir = args.packed_dir
+    seq_dir = get_packed_seq_dir(cfg)
+    cfg.directory.packed_img_dir = None
+
+    # create the packed sequence, or resume an existing one
+    dataset = Dataset.datasets[cfg.dataset](cfg)
+    timestamps = dataset.get_timestamps()
+    PackedSequence.create(seq_dir, timestamps, cfg.image.height, cfg.image.width)
+    packed = PackedSequence(seq_dir)
+    pending = [i for i in range(len(packed)) if not packed.done[i]]
+    print("==> Packing [{}]: {} frames, {} pending".format(seq_dir, len(packed), len(pending)))
+
+    chunks = [pending[i:i+args.chunk] for i in range(0, len(pending), args.chunk)]
+    with Pool(args.workers, initializer=init_worker, initargs=(cfg, seq_dir)) as pool:
+        with tqdm(total=len(pending)) as pbar:
+            for num_frames in pool.imap_unordered(pack_frames, chunks):
+                pbar.update(num_frames)
+
+    packed = PackedSequence(seq_dir)
+    assert packed.is_complete(), "Packed sequence [{}] is incomplete.".format(seq_dir)
+    print("==> Finish! Set directory.packed_img_dir to [{}] to use the packed images.".format(args.packed_dir))
@@ -4,15 +4,24 @@
 @Copyright: Copyright (C) Huangying Zhan 2020. All rights reserved. Please refer to the license file.
 @LastEditTime: 2020-07-02
 @LastEditors: Huangying Zhan
-@Description: This tool undistort Oxford Robotcar sequences
+@Description: This tool undistort Oxford Robotcar sequences.
+    The images are undistorted in parallel with precomputed remap maps; optionally cropped and resized in the same remap.
 '''
 
 import argparse
+import cv2
+from multiprocessing import Pool
+import os
+from tqdm import tqdm
 
 from tools.evaluation.robotcar.sdk_python.image import load_image
 from tools.evaluation.robotcar.sdk_python.camera_model import CameraModel
+from libs.general.utils import mkdir_if_not_exists
 
 
+# camera model and undistortion options of a worker process
+worker = {}
+
 
 def argument_parsing():
     """Argument parsing
@@ -20,35 +29,98 @@ def argument_parsing():
     Returns:
         args (args): arguments
     """
-    parser = argparse.ArgumentParser(description='KITTI Odometry evaluation')
+    parser = argparse.ArgumentParser(description='Oxford Robotcar undistortion')
     parser.add_argument('--data_dir', type=str,
                         default="dataset/robotcar/raw_data/",
-                        help="GT Pose directory containing gt pose txt files")
-    parser.add_argument('--result', type=str, required=True,
-                        default="dataset/robotcar/"
-                        help="Result directory")
-    parser.add_argument('--seqs', 
+                        help="Raw data directory containing the sequences")
+    parser.add_argument('--models_dir', type=str,
+                        default=None,
+                        help="Camera model directory; DATA_DIR/robotcar-dataset-sdk/models if not given")
+    parser.add_argument('--result', type=str,
+                        default="dataset/robotcar/",
+                        help="Result directory; images are saved in RESULT/SEQ/undistorted_stereo/centre")
+    parser.add_argument('--seqs',
                         nargs="+",
                         help="sequences to be undistorted",
                         default=None)
+    parser.add_argument('--crop', type=float, nargs=4,
+                        default=None,
+                        help="(optional) normalized crop region y0 y1 x0 x1 of the undistorted image")
+    parser.add_argument('--height', type=int,
+                        default=None,
+                        help="(optional) output image height; requires --width")
+    parser.add_argument('--width', type=int,
+                        default=None,
+                        help="(optional) output image width; requires --height")
+    parser.add_argument('--ext', type=str,
+                        default="jpg",
+                        help="output image extension")
+    parser.add_argument('--workers', type=int,
+                        default=4,
+                        help="number of worker processes")
     args = parser.parse_args()
-    
+
     return args
 
 
+def init_worker(models_dir, img_dir, crop, size):
+    """Initialize a worker process with its own camera model
+
+    Args:
+        models_dir (str): camera model directory
+        img_dir (str): raw image directory
+        crop (list): normalized crop region [[y0, y1], [x0, x1]] or None
+        size (tuple): output (height, width) or None
+    """
+    worker['model'] = CameraModel(models_dir, img_dir)
+    worker['crop'] = crop
+    worker['size'] = size
+
+
+def undistort_image(paths):
+    """Undistort an image and save it; the image is written to a temporary file
+    which is renamed when complete, so that an interrupted run never leaves a partial result
+
+    Args:
+        paths (tuple): (raw image path, result image path)
+    """
+    src_path, dst_path = paths
+    img = load_image(src_path, worker['model'], worker['crop'], worker['size'])
+    root, ext = os.path.splitext(dst_path)
+    tmp_path = "{}.tmp{}".format(root, ext)
+    assert cv2.imwrite(tmp_path, cv2.cvtColor(img, cv2.COLOR_RGB2BGR)), \
+        "Failed to write image [{}]".format(tmp_path)
+    os.replace(tmp_path, dst_path)
+
+
 if __name__ == '__main__':
     # argument parsing
     args = argument_parsing()
+    assert (args.height is None) == (args.width is None), "Both --height and --width should be given."
+
+    models_dir = args.models_dir
+    if models_dir is None:
+        models_dir = os.path.join(args.data_dir, "robotcar-dataset-sdk", "models")
+    crop = None if args.crop is None else [args.crop[:2], args.crop[2:]]
+    size = None if args.height is None else (args.height, args.width)
+
+    for seq in args.seqs:
+        img_dir = os.path.join(args.data_dir, seq, "stereo", "centre")
+        result_dir = os.path.join(args.result, seq, "undistorted_stereo", "centre")
+        mkdir_if_not_exists(result_dir)
+
+        # images listed in the timestamp file; existing results are skipped
+        timestamp_txt = os.path.join(args.data_dir, seq, "stereo.timestamps")
+        with open(timestamp_txt, 'r') as f:
+            timestamps = [line.split()[0] for line in f if line.strip()]
+        jobs = []
+        for timestamp in timestamps:
+            src_path = os.path.join(img_dir, timestamp + ".png")
+            dst_path = os.path.join(result_dir, "{}.{}".format(timestamp, args.ext))
+            if os.path.isfile(src_path) and not os.path.isfile(dst_path):
+                jobs.append((src_path, dst_path))
+        print("==> Undistorting [{}]: {} images, {} pending".format(seq, len(timestamps), len(jobs)))
 
-    # initialize evaluation tool
-    eval_tool = KittiEvalOdom() 
-
-    continue_flag = input("Evaluate result in [{}]? [y/n]".format(args.result))
-    if continue_flag == "y":
-        eval_tool.eval(
-            args.gt,
-            args.result,
-            alignment=args.align,
-            seqs=args.seqs,
-            )
-    else:
\ No newline at end of file
+        with Pool(args.workers, initializer=init_worker, initargs=(models_dir, img_dir, crop, size)) as pool:
+            for _ in tqdm(pool.imap_unordered(undistort_image, jobs, chunksize=8), total=len(jobs)):
+                pass